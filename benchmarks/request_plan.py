@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Microbenchmark of the per-call overhead of browse requests.
+
+The HTTP call itself is replaced with a function returning a canned
+response, so the numbers only show the work done on our side:
+building the URL, headers and query params, and parsing a tiny body.
+
+Usage:
+
+    python benchmarks/request_plan.py [number of calls]
+"""
+
+import sys
+import timeit
+
+import requests
+
+from skyscanner.skyscanner import FlightsCache, Transport
+
+
+class CannedResponse(object):
+
+    status_code = 200
+    content = b'{}'
+    headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {}
+
+
+def canned_get(url, **kwargs):
+    return CannedResponse()
+
+
+def main(number=100000):
+    requests.get = canned_get
+    params = dict(market='GB', currency='GBP', locale='en-GB',
+                  originplace='SIN', destinationplace='KUL',
+                  outbounddate='2017-05', inbounddate='2017-06')
+    flights_cache_service = FlightsCache('<Your API Key>')
+
+    def make_request():
+        # The way browse calls were built before request plans.
+        query = dict(params)
+        service_url = "{url}/{params_path}".format(
+            url=FlightsCache.BROWSE_QUOTES_SERVICE_URL,
+            params_path=Transport._construct_params(
+                query, FlightsCache._REQ_PARAMS, FlightsCache._OPT_PARAMS)
+        )
+        return flights_cache_service.make_request(
+            service_url,
+            headers=flights_cache_service._headers(),
+            **query
+        )
+
+    def get_cheapest_quotes():
+        return flights_cache_service.get_cheapest_quotes(**params)
+
+    plan = flights_cache_service.prepare(
+        FlightsCache.BROWSE_QUOTES_SERVICE_URL,
+        FlightsCache._REQ_PARAMS, FlightsCache._OPT_PARAMS,
+        callback=lambda resp: resp)
+
+    def prepared_plan():
+        return plan(**params)
+
+    for name, func in (('make_request', make_request),
+                       ('get_cheapest_quotes', get_cheapest_quotes),
+                       ('prepared plan, no parsing', prepared_plan)):
+        seconds = min(timeit.repeat(func, number=number, repeat=3))
+        print('{0:<28} {1:8.2f} us/call'.format(
+            name, seconds / number * 1e6))
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -1,7 +1,24 @@
 import unittest
 
 testmodules = [
-    'tests.test_skyscanner'
+    'tests.test_skyscanner',
+    'tests.test_loadtest',
+    'tests.test_cache',
+    'tests.test_autosuggest',
+    'tests.test_interning',
+    'tests.test_export',
+    'tests.test_history',
+    'tests.test_scheduler',
+    'tests.test_filters',
+    'tests.test_streaming',
+    'tests.test_keypool',
+    'tests.test_backends',
+    'tests.test_retry',
+    'tests.test_sniffing',
+    'tests.test_responses',
+    'tests.test_pricecalendar',
+    'tests.test_multileg',
+    'tests.test_concurrency',
 ]
 
 suite = unittest.TestSuite()
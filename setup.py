@@ -20,7 +20,9 @@ requirements = [
     'requests'
 ]
 extras_requirements = {
-    'Faster XML processing': ["lxml"]
+    'Faster XML processing': ["lxml"],
+    'Binary export': ["msgpack", "pyarrow"],
+    'HTTP/2': ["httpx[http2]"]
 }
 test_requirements = [
     # TODO: put package test requirements here
@@ -0,0 +1,234 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import bisect
+import heapq
+import json
+import re
+import threading
+import unicodedata
+import zlib
+
+from .skyscanner import CarHire, Hotels
+
+# Sections of the responses the index learns from, with the fields
+# holding the id and the name of an item.
+SECTIONS = {
+    'Countries': ('code', 'name'),
+    'Places': ('placeid', 'placename'),
+    'results': ('individualid', 'displayname'),
+}
+_WORDS = re.compile(r'\w+', re.UNICODE)
+# Rankings of the queries up to this length match a large part of
+# the index, they are kept until the index changes, up to SHORT_LIMIT
+# items each.
+SHORT_QUERY = 2
+SHORT_LIMIT = 50
+
+
+def normalize(text):
+    """
+    Lower case text without accents.
+    """
+    if not isinstance(text, type(u'')):
+        text = text.decode('utf-8')
+    text = unicodedata.normalize('NFKD', text.lower())
+    return u''.join(c for c in text if not unicodedata.combining(c))
+
+
+class AutosuggestIndex(object):
+
+    """
+    Sorted prefix index for offline location autosuggest.
+
+    Learns places from 'get_markets' and 'location_autosuggest' responses
+    and answers prefix queries locally, ranking exact matches first,
+    then matches at the start of the name, then items seen more often.
+
+    Usage:
+
+        index = AutosuggestIndex()
+        index.add_response(flights_service.get_markets('en-GB').parsed)
+        index.add_response(flights_service.location_autosuggest(
+            market='UK', currency='GBP', locale='en-GB', query='KUL').parsed)
+        index.save('autosuggest.idx')
+        ...
+        index = AutosuggestIndex.load('autosuggest.idx')
+        places = index.suggest('kua', section='Places')
+    """
+
+    def __init__(self):
+        # (section, id) -> [weight, item, length of the name]
+        self._items = {}
+        # sorted (term, rank, section, id), rank 0 for the terms
+        # the whole name or id starts with, 1 for the other words
+        self._terms = []
+        self._pending = []
+        # (query, section) -> ranking of a short query
+        self._short = {}
+        self._lock = threading.Lock()
+
+    def add(self, section, item, weight=1):
+        """
+        Add an item or increase its weight if it is already in the index.
+
+        :param section - response section the item comes from,
+                         see SECTIONS
+        :param item - response item, a dict or an XML element
+        :param weight - weight to add to the item's ranking
+        """
+        if not isinstance(item, dict):
+            item = dict((child.tag, child.text) for child in item)
+        fields = dict((k.lower().replace('_', ''), v)
+                      for k, v in item.items())
+        id_field, name_field = SECTIONS[section]
+        item_id, name = fields.get(id_field), fields.get(name_field)
+        if item_id is None or not name:
+            return
+        item_id = str(item_id)
+        key = (section, item_id)
+        with self._lock:
+            self._short.clear()
+            entry = self._items.get(key)
+            if entry is not None:
+                entry[0] += weight
+                entry[1] = item
+                return
+            self._items[key] = [weight, item, len(name)]
+            self._pending.extend(self._index_terms(section, item_id, name))
+
+    def add_response(self, parsed, weight=1):
+        """
+        Add all items of a parsed markets or autosuggest response.
+        """
+        for section in SECTIONS:
+            if isinstance(parsed, dict):
+                items = parsed.get(section) or []
+            else:
+                items = parsed.findall('./%s/*' % section.capitalize())
+            for item in items:
+                self.add(section, item, weight)
+
+    def suggest(self, query, section=None, limit=10):
+        """
+        Items matching the query, best first.
+
+        :param query - query text, matched against the beginning of
+                       the item names, name words and ids
+        :param section - only return items of this section
+        :param limit - maximum number of items to return
+        """
+        query = normalize(query).strip()
+        if not query:
+            return []
+        with self._lock:
+            self._merge()
+            if len(query) > SHORT_QUERY or limit > SHORT_LIMIT:
+                ranked = self._rank(query, section, limit)
+            else:
+                ranked = self._short.get((query, section))
+                if ranked is None:
+                    ranked = self._short[query, section] = self._rank(
+                        query, section, SHORT_LIMIT)
+            return [self._items[score[-1]][1] for score in ranked[:limit]]
+
+    def lookup(self, service, min_results=1, limit=10, **params):
+        """
+        Suggest from the index, falling back to the service's
+        'location_autosuggest' if fewer than 'min_results' items match.
+        Items returned by the service are added to the index.
+
+        :param service - service to ask, e.g. Flights or Hotels
+        :param min_results - minimum number of local matches
+        :param limit - maximum number of items to return
+        :param params - 'location_autosuggest' params
+        """
+        section = 'results' if isinstance(service, (Hotels, CarHire)) \
+            else 'Places'
+        items = self.suggest(params['query'], section=section, limit=limit)
+        if len(items) >= min_results:
+            return items
+        resp = service.location_autosuggest(**params)
+        if getattr(resp, 'parsed', None) is None:
+            return items
+        self.add_response(resp.parsed)
+        return self.suggest(params['query'], section=section, limit=limit)
+
+    def dumps(self):
+        """
+        Serialize the index into compressed bytes.
+        """
+        with self._lock:
+            data = [[section, weight, item] for (section, item_id),
+                    (weight, item, length) in sorted(self._items.items())]
+        return zlib.compress(json.dumps(
+            data, separators=(',', ':')).encode('utf-8'), 9)
+
+    @classmethod
+    def loads(cls, data):
+        index = cls()
+        for section, weight, item in json.loads(
+                zlib.decompress(data).decode('utf-8')):
+            index.add(section, item, weight)
+        return index
+
+    def save(self, path):
+        with open(path, 'wb') as f:
+            f.write(self.dumps())
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            return cls.loads(f.read())
+
+    def __len__(self):
+        return len(self._items)
+
+    @staticmethod
+    def _index_terms(section, item_id, name):
+        name = normalize(name)
+        terms = set([(name, 0), (normalize(item_id.split('-')[0]), 0)])
+        terms.update((word, 1) for word in _WORDS.findall(name)[1:])
+        return [(term, rank, section, item_id) for term, rank in terms]
+
+    def _rank(self, query, section, limit):
+        # Called with the lock held.
+        terms = self._terms
+        items = self._items
+        start = bisect.bisect_left(terms, (query,))
+        matches = {}
+        for n in range(start, len(terms)):
+            term, rank, term_section, item_id = terms[n]
+            if not term.startswith(query):
+                break
+            if section is not None and term_section != section:
+                continue
+            key = (term_section, item_id)
+            score = (term != query, rank)
+            if key not in matches or score < matches[key]:
+                matches[key] = score
+        return heapq.nsmallest(limit, (
+            score + (-items[key][0], items[key][2], key)
+            for key, score in matches.items()))
+
+    def _merge(self):
+        # Called with the lock held.
+        if self._pending:
+            # Only the new terms are sorted, the index already is.
+            self._pending.sort()
+            self._terms = list(heapq.merge(self._terms, self._pending))
+            self._pending = []
@@ -0,0 +1,288 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+HTTP backends the requests of the services are sent through.
+
+Every backend returns 'requests.Response' objects and raises
+'requests.Timeout' and 'requests.ConnectionError', so that responses
+and errors are handled the same way whatever the backend:
+
+ * RequestsBackend - 'requests', the default
+ * HttpxBackend - 'httpx', multiplexing requests over HTTP/2
+                  connections, requires 'httpx[http2]'
+ * StubBackend - in-process handler, e.g. skyscanner.fakeapi's,
+                 without any network
+"""
+
+import io
+import threading
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+try:
+    from http.client import responses
+except ImportError:
+    from httplib import responses
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+REQUESTS, HTTPX, STUB = 'requests', 'httpx', 'stub'
+BACKENDS = (REQUESTS, HTTPX, STUB)
+
+
+class Backend(object):
+
+    """
+    Interface of the HTTP backends.
+    """
+
+    def request(self, method, url, headers=None, data=None, params=None,
+                timeout=None, stream=False, pool=None):
+        """
+        Send a request and return the requests.Response.
+
+        :param method - request method, lower case
+        :param url - request URL
+        :param headers - request headers
+        :param data - form data
+        :param params - query parameters
+        :param timeout - seconds or a (connect, read) tuple,
+                         None for no timeout
+        :param stream - whether the content is read as it arrives,
+                        see 'Response.iter_content'
+        :param pool - connection pool returned by 'pool',
+                      None to use the shared one
+        """
+        raise NotImplementedError('Should be implemented by a sub-class.')
+
+    def pool(self):
+        """
+        New connection pool for the requests of a single search,
+        closed when the search is cancelled. None when the backend
+        only has a shared pool.
+        """
+        return None
+
+    def close(self):
+        """
+        Close the shared connections of the backend.
+        """
+        pass
+
+
+class RequestsBackend(Backend):
+
+    """
+    Backend sending the requests with 'requests'.
+
+    Requests of a search go through its pool, the others open
+    a connection each, unless 'per_thread' is set.
+    """
+
+    def __init__(self, per_thread=False):
+        """
+        :param per_thread - whether requests outside of a search reuse
+                            the connections of a session of their thread,
+                            'requests.Session' not being thread-safe
+        """
+        self.per_thread = per_thread
+        self._local = threading.local()
+        self._sessions = []
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, data=None, params=None,
+                timeout=None, stream=False, pool=None):
+        if pool is None and self.per_thread:
+            pool = self._thread_session()
+        # Looked up on every request, so that 'requests' can be patched.
+        send = getattr(requests if pool is None else pool, method)
+        return send(url, headers=headers, data=data, params=params,
+                    timeout=timeout, stream=stream)
+
+    def pool(self):
+        return requests.Session()
+
+    def close(self):
+        with self._lock:
+            sessions, self._sessions = self._sessions, []
+        for session in sessions:
+            session.close()
+        self._local = threading.local()
+
+    def _thread_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            with self._lock:
+                self._sessions.append(session)
+        return session
+
+
+class HttpxBackend(Backend):
+
+    """
+    Backend sending the requests with 'httpx', over HTTP/2 by default,
+    so that concurrent requests to the API share a few connections.
+
+    Requests of all the searches share the client's connections, so a
+    cancelled search can not close them, its outstanding requests run
+    to completion and their responses are discarded.
+    """
+
+    def __init__(self, http2=True, **client_options):
+        """
+        :param http2 - whether to negotiate HTTP/2
+        :param client_options - additional 'httpx.Client' arguments,
+                                e.g. 'limits'
+        """
+        if httpx is None:
+            raise ImportError('httpx is required for this backend, '
+                              'install it with: pip install httpx[http2]')
+        self.client = httpx.Client(http2=http2, **client_options)
+
+    def request(self, method, url, headers=None, data=None, params=None,
+                timeout=None, stream=False, pool=None):
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(timeout)
+        try:
+            request = self.client.build_request(
+                method.upper(), url, headers=headers, data=data,
+                params=params, timeout=timeout)
+            response = self.client.send(request, stream=stream)
+            if stream:
+                raw, content = _IteratorReader(response), None
+            else:
+                raw, content = None, response.content
+        except httpx.TimeoutException as e:
+            raise requests.Timeout(e)
+        except httpx.TransportError as e:
+            raise requests.ConnectionError(e)
+        return _response(str(response.url), response.status_code,
+                         response.headers.multi_items(), content, raw,
+                         response.reason_phrase)
+
+    def close(self):
+        self.client.close()
+
+
+class StubBackend(Backend):
+
+    """
+    Backend handing the requests to an in-process handler,
+    to test and benchmark without any network.
+
+    Usage:
+
+        api = FakeSkyscannerAPI(polls_to_complete=2)
+        flights_service = Flights('<Your API Key>', api_host='http://stub',
+                                  backend=StubBackend(api.handle))
+    """
+
+    def __init__(self, handler=None):
+        """
+        :param handler - function(method, url, headers, body) returning
+                         a (status code, headers, body) tuple, like
+                         'skyscanner.fakeapi.FakeSkyscannerAPI.handle',
+                         default is the one of a new FakeSkyscannerAPI
+        """
+        if handler is None:
+            from .fakeapi import FakeSkyscannerAPI
+            handler = FakeSkyscannerAPI().handle
+        self.handler = handler
+
+    def request(self, method, url, headers=None, data=None, params=None,
+                timeout=None, stream=False, pool=None):
+        prepared = requests.Request(method.upper(), url, headers=headers,
+                                    data=data, params=params).prepare()
+        status, response_headers, body = self.handler(
+            prepared.method, prepared.url, prepared.headers, prepared.body)
+        return _response(prepared.url, status,
+                         response_headers.items(), body, request=prepared)
+
+
+class _IteratorReader(object):
+
+    """
+    File-like reader of a streamed httpx response,
+    the 'raw' attribute 'requests.Response.iter_content' reads from.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.buffer = b''
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += next(self.chunks)
+            except StopIteration:
+                break
+            except httpx.TimeoutException as e:
+                raise requests.Timeout(e)
+            except httpx.TransportError as e:
+                raise requests.ConnectionError(e)
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+    def close(self):
+        self.response.close()
+
+
+def create(name, **options):
+    """
+    Create a backend by its name, one of BACKENDS.
+    """
+    backends = {REQUESTS: RequestsBackend, HTTPX: HttpxBackend,
+                STUB: StubBackend}
+    if name not in backends:
+        raise ValueError('Unknown backend: %s, possible values are: %s'
+                         % (name, ', '.join(BACKENDS)))
+    return backends[name](**options)
+
+
+def _response(url, status, headers, content=None, raw=None,
+              reason=None, request=None):
+    response = requests.Response()
+    response.status_code = status
+    response.headers = CaseInsensitiveDict()
+    for name, value in headers:
+        if name in response.headers:
+            value = '%s, %s' % (response.headers[name], value)
+        response.headers[name] = value
+    response.url = url
+    response.reason = reason or responses.get(status, '')
+    response.request = request
+    response.encoding = requests.utils.get_encoding_from_headers(
+        response.headers)
+    if raw is None:
+        response.raw = io.BytesIO(content or b'')
+        response._content = content or b''
+        response._content_consumed = True
+    else:
+        response.raw = raw
+    return response
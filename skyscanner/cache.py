@@ -0,0 +1,352 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import heapq
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class ResponseCache(object):
+
+    """
+    In-memory cache of responses with a time to live and an optional
+    stale-while-revalidate policy.
+
+    An expired response that is not older than 'ttl + max_staleness'
+    is returned immediately, while a single background request refreshes
+    it. Older responses are never returned, the request is performed
+    in place instead.
+
+    Can be shared between services, e.g.:
+
+        cache = ResponseCache(ttl=300, max_staleness=3600)
+        flights_cache_service = FlightsCache('<Your API Key>', cache=cache)
+    """
+
+    def __init__(self, ttl=300, max_staleness=0, max_size=10000,
+                 clock=time.time):
+        """
+        :param ttl - seconds a cached response is fresh for
+        :param max_staleness - seconds after expiry during which a response
+                               is still returned while being refreshed,
+                               0 disables stale-while-revalidate
+        :param max_size - maximum number of cached responses,
+                          least recently used ones are evicted first
+        :param clock - function returning current time in seconds
+        """
+        self.ttl = ttl
+        self.max_staleness = max_staleness
+        self.max_size = max_size
+        self.clock = clock
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.refresh_errors = 0
+        self._entries = OrderedDict()
+        self._refreshing = {}
+        self._requests = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts, **params):
+        """
+        Build a cache key from request parts and params.
+        """
+        return parts + tuple(sorted(params.items()))
+
+    def get(self, key, fetch):
+        """
+        Get the cached response or fetch it.
+
+        :param key - cache key, see 'key' method
+        :param fetch - function performing the request
+        """
+        now = self.clock()
+        keys = getattr(self._local, 'keys', None)
+        if keys is not None:
+            keys.append(key)
+        with self._lock:
+            self._observe(key, fetch)
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, value = entry
+                age = now - created
+                if age < self.ttl:
+                    self.hits += 1
+                    self._entries[key] = self._entries.pop(key)
+                    return value
+                if age < self.ttl + self.max_staleness:
+                    self.stale_hits += 1
+                    self._entries[key] = self._entries.pop(key)
+                    self._revalidate(key, fetch)
+                    return value
+            self.misses += 1
+
+        return self._fetch(key, fetch)
+
+    def set(self, key, value):
+        if not self.cacheable(value):
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (self.clock(), value)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def refresh(self, key, fetch=None):
+        """
+        Fetch the response again and cache it.
+
+        :param key - cache key
+        :param fetch - function performing the request, by default the one
+                       the key was last requested with
+        """
+        if fetch is None:
+            with self._lock:
+                fetch = self._requests[key][1]
+        return self._fetch(key, fetch)
+
+    def expires_in(self, key):
+        """
+        Seconds until the cached response expires, negative when it has
+        already expired, None when nothing is cached for the key.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry[0] + self.ttl - self.clock()
+
+    def hot(self, n):
+        """
+        The n most requested keys.
+        """
+        with self._lock:
+            counts = [(count, key) for key, (count, fetch)
+                      in self._requests.items()]
+        return [key for count, key in heapq.nlargest(
+            n, counts, key=lambda c: c[0])]
+
+    def keys_of(self, func):
+        """
+        Call the function and return its result together with the keys
+        it requested from this cache.
+        """
+        self._local.keys = keys = []
+        try:
+            return func(), keys
+        finally:
+            self._local.keys = None
+
+    def invalidate(self, key=None):
+        """
+        Remove the response cached for the key, or all of them.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def join(self, timeout=None):
+        """
+        Wait for background refreshes to finish.
+        """
+        with self._lock:
+            threads = list(self._refreshing.values())
+        for thread in threads:
+            thread.join(timeout)
+
+    @staticmethod
+    def cacheable(value):
+        """
+        Only successfully parsed responses are cached,
+        e.g. not the ones ignored in 'graceful' errors handling mode.
+        Lazy responses not parsed yet are cached on their status,
+        without being parsed.
+        """
+        if getattr(value, 'is_parsed', True) is False:
+            return value.status_code < 400 and bool(value.content)
+        return getattr(value, 'parsed', None) is not None
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _observe(self, key, fetch):
+        # Called with the lock held.
+        count = self._requests.get(key, (0, None))[0]
+        self._requests[key] = (count + 1, fetch)
+        if len(self._requests) > 2 * self.max_size:
+            for count, key in heapq.nsmallest(
+                    self.max_size, [(c, k) for k, (c, f)
+                                    in self._requests.items()],
+                    key=lambda c: c[0]):
+                del self._requests[key]
+
+    def _fetch(self, key, fetch):
+        value = fetch()
+        self.set(key, value)
+        return value
+
+    def _revalidate(self, key, fetch):
+        # Called with the lock held.
+        if key in self._refreshing:
+            return
+        thread = threading.Thread(target=self._refresh, args=(key, fetch))
+        thread.daemon = True
+        self._refreshing[key] = thread
+        thread.start()
+
+    def _refresh(self, key, fetch):
+        try:
+            self._fetch(key, fetch)
+        except Exception as e:
+            log.warning('Failed to refresh cached response: %s', e)
+            with self._lock:
+                self.refresh_errors += 1
+        finally:
+            with self._lock:
+                self._refreshing.pop(key, None)
+
+
+class CacheWarmer(object):
+
+    """
+    Keeps popular responses in a ResponseCache fresh in the background,
+    so that requests for them never miss.
+
+    Warms the given queries and, optionally, the most requested keys
+    the cache has seen, refreshing a response once it is about to expire.
+    Refreshes are limited to 'rate' requests per second.
+
+    Usage:
+
+        from functools import partial
+
+        warmer = CacheWarmer(cache, queries=[
+            partial(flights_cache_service.get_cheapest_quotes,
+                    market='UK', currency='GBP', locale='en-GB',
+                    originplace='LHR', destinationplace='KUL',
+                    outbounddate='2017-05'),
+            partial(flights_cache_service.get_markets, 'en-GB'),
+        ], learn=100, rate=2)
+        warmer.start()
+    """
+
+    def __init__(self, cache, queries=(), learn=0, rate=1.0, lead=None,
+                 interval=1.0, clock=time.time):
+        """
+        :param cache - ResponseCache to warm
+        :param queries - functions performing the cached requests to warm,
+                         e.g. functools.partial of service methods
+        :param learn - number of the most requested keys to warm as well
+        :param rate - maximum number of refreshes per second
+        :param lead - seconds before expiry when a response is refreshed,
+                      a tenth of the cache TTL by default
+        :param interval - seconds between the checks in the background
+        :param clock - function returning current time in seconds
+        """
+        self.cache = cache
+        self.queries = list(queries)
+        self.learn = learn
+        self.rate = rate
+        self.lead = cache.ttl / 10.0 if lead is None else lead
+        self.interval = interval
+        self.clock = clock
+        self.refreshes = 0
+        self.errors = 0
+        self._keys = {}
+        self._tokens = max(1.0, float(rate))
+        self._updated = clock()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def run_once(self):
+        """
+        Refresh everything that is about to expire, within the rate budget.
+        Returns the number of refreshed responses.
+        """
+        refreshed = 0
+        keys = []
+        for n, query in enumerate(self.queries):
+            if n not in self._keys:
+                if not self._take():
+                    self.refreshes += refreshed
+                    return refreshed
+                try:
+                    self._keys[n] = self.cache.keys_of(query)[1]
+                    refreshed += 1
+                except Exception as e:
+                    self._failed(e)
+                    continue
+            keys.extend(self._keys[n])
+        if self.learn:
+            keys.extend(self.cache.hot(self.learn))
+
+        seen = set()
+        for key in keys:
+            if key in seen:
+                continue
+            seen.add(key)
+            expires_in = self.cache.expires_in(key)
+            if expires_in is not None and expires_in > self.lead:
+                continue
+            if not self._take():
+                break
+            try:
+                self.cache.refresh(key)
+                refreshed += 1
+            except Exception as e:
+                self._failed(e)
+        self.refreshes += refreshed
+        return refreshed
+
+    def start(self):
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        self.run_once()
+        while not self._stopped.wait(self.interval):
+            self.run_once()
+
+    def _take(self):
+        now = self.clock()
+        self._tokens = min(max(1.0, float(self.rate)),
+                           self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        return True
+
+    def _failed(self, error):
+        self.errors += 1
+        log.warning('Failed to warm cached response: %s', error)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Compact binary export and import of parsed JSON results.
+
+Two formats are supported, both need an optional dependency:
+
+ * msgpack - the parsed result as is, requires 'msgpack'
+ * arrow - every list section of the result (Itineraries, Legs, Quotes,
+           hotels, cars, ...) as an Arrow IPC stream, so that consumers
+           can read numeric columns without copying, requires 'pyarrow'
+"""
+
+import json
+import struct
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+MSGPACK, ARROW = 'msgpack', 'arrow'
+FORMATS = (MSGPACK, ARROW)
+
+_ARROW_MAGIC = b'SKYARROW'
+_HEADER = struct.Struct('<8sI')
+_ALIGNMENT = 8
+
+
+def dumps(parsed, format=MSGPACK):
+    """
+    Export a parsed JSON result into bytes.
+
+    :param parsed - 'parsed' attribute of a JSON response
+    :param format - 'msgpack' or 'arrow'
+    """
+    if not isinstance(parsed, dict):
+        raise TypeError('Only parsed JSON results can be exported.')
+    if format == MSGPACK:
+        return _require(msgpack, 'msgpack').packb(parsed, use_bin_type=True)
+    if format == ARROW:
+        return _dumps_arrow(parsed)
+    raise ValueError('Unknown export format: %s, supported formats are: %s'
+                     % (format, ', '.join(FORMATS)))
+
+
+def loads(data, format=MSGPACK):
+    """
+    Import a result exported by 'dumps'.
+
+    For 'msgpack' format returns the parsed result. For 'arrow' format
+    returns a dict with a pyarrow.Table for every list section and
+    the other values as they were; tables reference 'data' without
+    copying it, so it can be e.g. a memory-mapped pyarrow.Buffer,
+    see 'read_arrow'.
+    """
+    if format == MSGPACK:
+        return _require(msgpack, 'msgpack').unpackb(data, raw=False)
+    if format == ARROW:
+        return _loads_arrow(data)
+    raise ValueError('Unknown export format: %s, supported formats are: %s'
+                     % (format, ', '.join(FORMATS)))
+
+
+def write_arrow(path, parsed):
+    """
+    Export a parsed JSON result into a file in 'arrow' format.
+    """
+    with open(path, 'wb') as f:
+        f.write(dumps(parsed, ARROW))
+
+
+def read_arrow(path):
+    """
+    Memory-map a file written by 'write_arrow' and import it.
+    """
+    source = _require(pyarrow, 'pyarrow').memory_map(path, 'r')
+    return _loads_arrow(source.read_buffer())
+
+
+def _dumps_arrow(parsed):
+    pa = _require(pyarrow, 'pyarrow')
+    values, streams = {}, []
+    for name, value in parsed.items():
+        table = None
+        if isinstance(value, (list, tuple)) and value and \
+                all(isinstance(item, dict) for item in value):
+            try:
+                table = pa.Table.from_pylist(list(value))
+            except (pa.ArrowInvalid, pa.ArrowTypeError):
+                pass
+        if table is None:
+            values[name] = value
+            continue
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        streams.append((name, sink.getvalue()))
+
+    sections, offset = [], 0
+    for name, stream in streams:
+        sections.append([name, offset, stream.size])
+        offset += _aligned(stream.size)
+    header = json.dumps({'values': values, 'sections': sections},
+                        separators=(',', ':')).encode('utf-8')
+    padding = _aligned(_HEADER.size + len(header)) - _HEADER.size
+    header += b' ' * (padding - len(header))
+    chunks = [_HEADER.pack(_ARROW_MAGIC, len(header)), header]
+    for name, stream in streams:
+        chunks.append(stream.to_pybytes())
+        chunks.append(b'\0' * (_aligned(stream.size) - stream.size))
+    return b''.join(chunks)
+
+
+def _loads_arrow(data):
+    pa = _require(pyarrow, 'pyarrow')
+    buf = data if isinstance(data, pa.Buffer) else pa.py_buffer(data)
+    magic, header_size = _HEADER.unpack(buf.slice(0, _HEADER.size)
+                                        .to_pybytes())
+    if magic != _ARROW_MAGIC:
+        raise ValueError('Not an exported arrow result.')
+    header = json.loads(buf.slice(_HEADER.size, header_size)
+                        .to_pybytes().decode('utf-8'))
+    start = _HEADER.size + header_size
+    result = header['values']
+    for name, offset, size in header['sections']:
+        result[name] = pa.ipc.open_stream(
+            buf.slice(start + offset, size)).read_all()
+    return result
+
+
+def _aligned(size):
+    return (size + _ALIGNMENT - 1) // _ALIGNMENT * _ALIGNMENT
+
+
+def _require(module, name):
+    if module is None:
+        raise ImportError('%s is required for this export format, '
+                          'install it with: pip install %s' % (name, name))
+    return module
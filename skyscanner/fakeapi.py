@@ -0,0 +1,634 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Local stand-in for the Skyscanner partners API.
+
+Mimics the parts of the API the SDK talks to: live pricing sessions for
+Flights, Hotels and CarHire (the 'location' header of session creation
+and the polling progression), booking details, the browse cache,
+markets and autosuggest, 400 'ValidationErrors' and 429 throttling.
+Responses are JSON only and generated deterministically from the request.
+
+Usage:
+
+    from skyscanner.fakeapi import FakeServer
+    from skyscanner.skyscanner import Flights
+
+    with FakeServer(latency=0.05, throttle_rate=0.01) as server:
+        flights_service = Flights('<Any API Key>', api_host=server.url)
+        ...
+"""
+
+import json
+import random
+import threading
+import time
+import uuid
+import zlib
+
+try:
+    from urllib.parse import parse_qsl, urlsplit, unquote
+except ImportError:
+    from urllib import unquote
+    from urlparse import parse_qsl, urlsplit
+
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+    from socketserver import ThreadingMixIn
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+    from SocketServer import ThreadingMixIn
+
+
+CARRIERS = (
+    ('BA', 'British Airways'), ('SQ', 'Singapore Airlines'),
+    ('MH', 'Malaysia Airlines'), ('AK', 'AirAsia'), ('LH', 'Lufthansa'),
+    ('AF', 'Air France'), ('KL', 'KLM'), ('EK', 'Emirates'),
+    ('QR', 'Qatar Airways'), ('TR', 'Scoot'),
+)
+HUBS = ('DXB', 'DOH', 'FRA', 'AMS', 'CDG', 'HKG', 'BKK')
+AGENTS = ('Skyscanner Travel', 'Trip Agent', 'Fly Cheap', 'Book Direct')
+COUNTRIES = (
+    ('GB', 'United Kingdom'), ('DE', 'Germany'), ('FR', 'France'),
+    ('MY', 'Malaysia'), ('SG', 'Singapore'), ('US', 'United States'),
+    ('TH', 'Thailand'), ('AE', 'United Arab Emirates'),
+)
+PLACES = (
+    ('LHR', 'London Heathrow', 'London', 'United Kingdom'),
+    ('LGW', 'London Gatwick', 'London', 'United Kingdom'),
+    ('EDI', 'Edinburgh', 'Edinburgh', 'United Kingdom'),
+    ('TXL', 'Berlin Tegel', 'Berlin', 'Germany'),
+    ('BER', 'Berlin Brandenburg', 'Berlin', 'Germany'),
+    ('FRA', 'Frankfurt am Main', 'Frankfurt', 'Germany'),
+    ('CDG', 'Paris Charles de Gaulle', 'Paris', 'France'),
+    ('KUL', 'Kuala Lumpur International', 'Kuala Lumpur', 'Malaysia'),
+    ('SIN', 'Singapore Changi', 'Singapore', 'Singapore'),
+    ('BKK', 'Bangkok Suvarnabhumi', 'Bangkok', 'Thailand'),
+    ('DXB', 'Dubai', 'Dubai', 'United Arab Emirates'),
+    ('JFK', 'New York John F. Kennedy', 'New York', 'United States'),
+)
+
+FLIGHTS_SESSION_PARAMS = ('country', 'currency', 'locale', 'originplace',
+                          'destinationplace', 'outbounddate', 'adults')
+BROWSE_SERVICES = ('browsequotes', 'browseroutes', 'browsedates',
+                   'browsegrid')
+
+
+class FakeSkyscannerAPI(object):
+
+    """
+    Request handler of the fake API, independent of any HTTP server.
+
+    :param polls_to_complete - number of polls after which a live pricing
+                               session reports that it is complete
+    :param itineraries - number of results in a complete session
+    :param latency - seconds to wait before every response, either a number
+                     or a (min, max) tuple to pick from uniformly
+    :param error_rate - share of requests answered with 500
+    :param throttle_rate - share of requests answered with 429
+    :param seed - seed of the random generator used for error injection
+    :param throttled_keys - API keys whose requests are answered with 429
+
+    Sessions can only be polled with the API key that created them,
+    other keys are answered with 403.
+    """
+
+    def __init__(self, polls_to_complete=3, itineraries=20, latency=0,
+                 error_rate=0, throttle_rate=0, seed=None,
+                 throttled_keys=()):
+        self.polls_to_complete = max(1, polls_to_complete)
+        self.itineraries = itineraries
+        self.latency = latency
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.throttled_keys = set(throttled_keys)
+        self.requests = 0
+        self.requests_by_key = {}
+        self._random = random.Random(seed)
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def handle(self, method, url, headers=None, body=None):
+        """
+        Handle a request.
+
+        :param method - request method
+        :param url - request URL, absolute or just the path and query
+        :param headers - request headers
+        :param body - form encoded request body
+        :return (status code, response headers, response body) tuple
+        """
+        parts = urlsplit(url)
+        query = dict(parse_qsl(parts.query))
+        if body:
+            if isinstance(body, bytes):
+                body = body.decode('utf-8')
+            query.update(parse_qsl(body))
+        path = [unquote(p) for p in parts.path.strip('/').split('/')]
+        host = '%s://%s' % (parts.scheme, parts.netloc) \
+            if parts.netloc else ''
+
+        with self._lock:
+            self.requests += 1
+            roll = self._random.random()
+        self._sleep()
+
+        if roll < self.throttle_rate:
+            return 429, {}, b''
+        if roll < self.throttle_rate + self.error_rate:
+            return 500, {}, b''
+        if not query.get('apiKey'):
+            return self._validation_errors('apiKey', 'ApiKey is required')
+        api_key = query['apiKey']
+        with self._lock:
+            self.requests_by_key[api_key] = \
+                self.requests_by_key.get(api_key, 0) + 1
+            owners = set(self._sessions[p]['apiKey'] for p in path
+                         if p in self._sessions)
+        if api_key in self.throttled_keys:
+            return 429, {}, b''
+        if owners - set([api_key]):
+            return 403, {}, b''
+
+        try:
+            return self._route(method.upper(), path, query, host)
+        except KeyError as e:
+            return self._validation_errors(
+                str(e).strip("'"), 'Missing required parameter')
+
+    def _route(self, method, path, query, host):
+        if len(path) < 2 or path[0] != 'apiservices':
+            return 404, {}, b''
+        service = path[1]
+        if service == 'pricing':
+            return self._flights(method, path[2:], query, host)
+        if service in ('hotels', 'carhire') and path[2] == 'liveprices':
+            return self._live_prices(service, path[4:], query, host)
+        if service == 'hotels' and path[2] == 'autosuggest':
+            return self._json(self._hotels_autosuggest(path[-1]))
+        if service == 'autosuggest':
+            return self._json(self._autosuggest(query['query']))
+        if service == 'reference':
+            return self._json({'Countries': [
+                {'Code': code, 'Name': name} for code, name in COUNTRIES]})
+        if service in BROWSE_SERVICES:
+            return self._json(self._browse(service, path[3:]))
+        return 404, {}, b''
+
+    def _flights(self, method, path, query, host):
+        if method == 'POST':
+            _require(query, FLIGHTS_SESSION_PARAMS)
+            key = self._new_session('flights', query)
+            return 201, {'Location': '%s/apiservices/pricing/uk1/v1.0/%s' % (
+                host, key)}, b''
+        # uk1/v1.0/{session key}[/booking[/{outbound leg};{inbound leg}]]
+        if len(path) == 3:
+            session = self._poll(path[2])
+            if session is None:
+                return 410, {}, b''
+            return self._json(self._flights_results(session))
+        if method == 'PUT':
+            _require(query, ('outboundlegid',))
+            booking = '%s/booking/%s;%s' % (path[2], query['outboundlegid'],
+                                            query.get('inboundlegid', ''))
+            if self._new_booking(path[2], booking) is None:
+                return 410, {}, b''
+            return 201, {'Location': '%s/apiservices/pricing/uk1/v1.0/%s' % (
+                host, booking)}, b''
+        booking = self._poll('/'.join(path[2:5]))
+        if booking is None:
+            return 410, {}, b''
+        return self._json(self._booking_details(booking))
+
+    def _live_prices(self, vertical, path, query, host):
+        if len(path) > 1:
+            if vertical == 'carhire':
+                _require(query, ('userip',))
+            if len(path) != 8:
+                return self._validation_errors(
+                    'path', 'Unexpected number of path parameters')
+            key = self._new_session(vertical, dict(query, path=path))
+            return 201, {'Location': '/apiservices/%s/liveprices/v2/%s' % (
+                vertical, key)}, b''
+        session = self._poll(path[0])
+        if session is None:
+            return 410, {}, b''
+        if vertical == 'hotels':
+            return self._json(self._hotels_results(session))
+        return self._json(self._carhire_results(session))
+
+    def _new_session(self, vertical, query):
+        key = uuid.uuid4().hex
+        with self._lock:
+            self._sessions[key] = {'vertical': vertical, 'query': query,
+                                   'polls': 0, 'key': key,
+                                   'apiKey': query.get('apiKey')}
+        return key
+
+    def _new_booking(self, session_key, key):
+        with self._lock:
+            if session_key not in self._sessions:
+                return None
+            self._sessions.setdefault(key, {
+                'vertical': 'booking', 'polls': 0, 'key': key,
+                'apiKey': self._sessions[session_key]['apiKey']})
+            return key
+
+    def _poll(self, key):
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None:
+                session['polls'] += 1
+            return session and dict(session)
+
+    def _progress(self, session):
+        return min(1.0, float(session['polls']) / self.polls_to_complete)
+
+    def _flights_results(self, session):
+        query = session['query']
+        rnd = random.Random(session['key'])
+        progress = self._progress(session)
+        count = int(self.itineraries * progress)
+        origin, destination = (query['originplace'].split('-')[0],
+                               query['destinationplace'].split('-')[0])
+        places = [origin, destination] + list(HUBS)
+        inbound = query.get('inbounddate')
+        itineraries, legs, segments = [], [], []
+        for n in range(count):
+            outbound_leg = self._leg(rnd, n, 'Outbound', origin, destination,
+                                     query['outbounddate'], places, legs,
+                                     segments)
+            itinerary = {'OutboundLegId': outbound_leg}
+            if inbound:
+                itinerary['InboundLegId'] = self._leg(
+                    rnd, n, 'Inbound', destination, origin, inbound, places,
+                    legs, segments)
+            itinerary['PricingOptions'] = [{
+                'Agents': [rnd.randint(1, len(AGENTS))],
+                'QuoteAgeInMinutes': rnd.randint(0, 60),
+                'Price': round(rnd.uniform(50, 900), 2),
+                'DeeplinkUrl': 'http://partners.api.skyscanner.net/'
+                               'apiservices/deeplink/v2/%s' % n,
+            } for m in range(rnd.randint(1, 3))]
+            itinerary['BookingDetailsLink'] = {
+                'Uri': '/apiservices/pricing/v1.0/%s/booking' %
+                       session['key'],
+                'Body': 'OutboundLegId=%s&InboundLegId=%s' % (
+                    outbound_leg, itinerary.get('InboundLegId', '')),
+                'Method': 'PUT',
+            }
+            itineraries.append(itinerary)
+
+        status = 'UpdatesComplete' if progress >= 1 else 'UpdatesPending'
+        return {
+            'SessionKey': session['key'],
+            'Query': dict((k, v) for k, v in query.items() if k != 'apiKey'),
+            'Status': status,
+            'Itineraries': itineraries,
+            'Legs': legs,
+            'Segments': segments,
+            'Carriers': [{'Id': n + 1, 'Code': code, 'Name': name,
+                          'DisplayCode': code,
+                          'ImageUrl': 'http://s1.apideeplink.com/images/'
+                                      'airlines/%s.png' % code}
+                         for n, (code, name) in enumerate(CARRIERS)],
+            'Agents': [{'Id': n + 1, 'Name': name, 'Type': 'TravelAgent',
+                        'Status': status, 'OptimisedForMobile': True,
+                        'ImageUrl': 'http://s1.apideeplink.com/images/'
+                                    'websites/%s.png' % (n + 1)}
+                       for n, name in enumerate(AGENTS)],
+            'Places': [{'Id': n + 1, 'Code': code, 'Type': 'Airport',
+                        'Name': code}
+                       for n, code in enumerate(places)],
+            'Currencies': [{'Code': query['currency'], 'Symbol': '',
+                            'DecimalDigits': 2}],
+        }
+
+    @staticmethod
+    def _leg(rnd, n, directionality, origin, destination, date, places,
+             legs, segments):
+        stops = [rnd.randint(3, len(places)) for s in range(rnd.randint(
+            0, 2))]
+        stations = [1 if directionality == 'Outbound' else 2] + stops + \
+            [2 if directionality == 'Outbound' else 1]
+        departure = rnd.randint(0, 23 * 60)
+        duration = 0
+        segment_ids, carriers = [], []
+        for origin_id, destination_id in zip(stations, stations[1:]):
+            carrier = rnd.randint(1, len(CARRIERS))
+            flight = rnd.randint(60, 13 * 60)
+            segment_ids.append(len(segments))
+            carriers.append(carrier)
+            segments.append({
+                'Id': len(segments),
+                'OriginStation': origin_id,
+                'DestinationStation': destination_id,
+                'DepartureDateTime': _datetime(date, departure + duration),
+                'ArrivalDateTime': _datetime(date,
+                                             departure + duration + flight),
+                'Carrier': carrier,
+                'OperatingCarrier': carrier,
+                'Duration': flight,
+                'FlightNumber': str(rnd.randint(1, 999)),
+                'JourneyMode': 'Flight',
+                'Directionality': directionality,
+            })
+            duration += flight + 90
+        duration -= 90
+        leg_id = '%s-%s-%s-%s' % (origin, destination, directionality[0], n)
+        legs.append({
+            'Id': leg_id,
+            'SegmentIds': segment_ids,
+            'OriginStation': stations[0],
+            'DestinationStation': stations[-1],
+            'Departure': _datetime(date, departure),
+            'Arrival': _datetime(date, departure + duration),
+            'Duration': duration,
+            'JourneyMode': 'Flight',
+            'Stops': stops,
+            'Carriers': carriers,
+            'OperatingCarriers': carriers,
+            'Directionality': directionality,
+            'FlightNumbers': [{'FlightNumber': segments[i]['FlightNumber'],
+                               'CarrierId': segments[i]['Carrier']}
+                              for i in segment_ids],
+        })
+        return leg_id
+
+    def _booking_details(self, session):
+        leg_ids = session['key'].rsplit('/', 1)[-1]
+        rnd = random.Random(leg_ids)
+        progress = self._progress(session)
+        items = []
+        for n, agent in enumerate(AGENTS):
+            pending = float(n + 1) / len(AGENTS) > progress
+            items.append({
+                'AgentID': n + 1,
+                'Status': 'Pending' if pending else 'Current',
+                'Price': 0 if pending else round(rnd.uniform(50, 900), 2),
+                'Deeplink': '' if pending else
+                'http://partners.api.skyscanner.net/apiservices/deeplink/'
+                'v2/%s/%s' % (leg_ids, n),
+                'SegmentIds': [0],
+            })
+        return {'BookingOptions': [{'BookingItems': items}],
+                'Segments': [], 'Places': [], 'Carriers': [],
+                'Query': {}}
+
+    def _hotels_results(self, session):
+        rnd = random.Random(session['key'])
+        progress = self._progress(session)
+        count = int(self.itineraries * progress)
+        hotels = [{'hotel_id': n + 1, 'name': 'Hotel %s' % (n + 1),
+                   'star_rating': rnd.randint(1, 5),
+                   'popularity': rnd.randint(0, 100)}
+                  for n in range(count)]
+        return {
+            'status': 'COMPLETE' if progress >= 1 else 'PENDING',
+            'hotels': hotels,
+            'hotels_prices': [{'id': h['hotel_id'], 'agent_prices': [{
+                'id': rnd.randint(1, len(AGENTS)),
+                'price_total': round(rnd.uniform(40, 400), 2)}]}
+                for h in hotels],
+            'agents': [{'id': n + 1, 'name': name}
+                       for n, name in enumerate(AGENTS)],
+            'places': [{'place_id': 1, 'name': 'Kuala Lumpur',
+                        'type': 'City'}],
+        }
+
+    def _carhire_results(self, session):
+        rnd = random.Random(session['key'])
+        progress = self._progress(session)
+        websites = [{'id': 'ws%s' % n, 'name': name, 'in_progress':
+                     float(n + 1) / len(AGENTS) > progress}
+                    for n, name in enumerate(AGENTS)]
+        return {
+            'websites': websites,
+            'cars': [{'website_id': w['id'], 'price_all_days':
+                      round(rnd.uniform(20, 300), 2)}
+                     for w in websites if not w['in_progress']
+                     for n in range(3)],
+            'images': [],
+            'car_classes': [],
+        }
+
+    @staticmethod
+    def _browse(service, path):
+        if len(path) < 6:
+            raise KeyError('outbounddate')
+        market, currency, locale, origin, destination, outbound = path[:6]
+        inbound = path[6] if len(path) > 6 else None
+        rnd = random.Random(zlib.crc32('/'.join(path).encode('utf-8')))
+        places = [{'PlaceId': n + 1, 'IataCode': code, 'Name': name,
+                   'Type': 'Station', 'SkyscannerCode': code,
+                   'CityName': city, 'CountryName': country}
+                  for n, (code, name, city, country) in enumerate(PLACES)]
+        quotes = []
+        for n in range(rnd.randint(3, 12)):
+            quote = {
+                'QuoteId': n + 1,
+                'MinPrice': float(rnd.randint(30, 900)),
+                'Direct': rnd.random() > 0.5,
+                'OutboundLeg': _browse_leg(rnd, outbound, places),
+                'QuoteDateTime': '2016-04-20T10:00:00',
+            }
+            if inbound:
+                quote['InboundLeg'] = _browse_leg(rnd, inbound, places)
+            quotes.append(quote)
+        result = {
+            'Quotes': quotes,
+            'Places': places,
+            'Carriers': [{'CarrierId': n + 1, 'Name': name}
+                         for n, (code, name) in enumerate(CARRIERS)],
+            'Currencies': [{'Code': currency, 'Symbol': '',
+                            'DecimalDigits': 2}],
+        }
+        if service == 'browseroutes':
+            result['Routes'] = [{
+                'OriginId': q['OutboundLeg']['OriginId'],
+                'DestinationId': q['OutboundLeg']['DestinationId'],
+                'QuoteIds': [q['QuoteId']],
+                'Price': q['MinPrice'],
+                'QuoteDateTime': q['QuoteDateTime'],
+            } for q in quotes]
+        elif service == 'browsedates':
+            result['Dates'] = {
+                'OutboundDates': _browse_dates(quotes, 'OutboundLeg'),
+                'InboundDates': _browse_dates(quotes, 'InboundLeg'),
+            }
+        elif service == 'browsegrid':
+            dates = _browse_dates(quotes, 'OutboundLeg')
+            result['Dates'] = [[None] + [d['PartialDate'] for d in dates]] + [
+                [d['PartialDate']] + [
+                    {'MinPrice': d['Price'], 'QuoteDateTime':
+                     d['QuoteDateTime']} for e in dates]
+                for d in dates]
+        return result
+
+    @staticmethod
+    def _autosuggest(query):
+        query = query.lower()
+        return {'Places': [{
+            'PlaceId': '%s-sky' % code, 'PlaceName': name,
+            'CountryId': '%s-sky' % country[:2].upper(), 'RegionId': '',
+            'CityId': '%s-sky' % city[:4].upper(), 'CountryName': country,
+        } for code, name, city, country in PLACES
+            if any(n.lower().startswith(query) for n in (code, name, city))]}
+
+    @staticmethod
+    def _hotels_autosuggest(query):
+        query = query.lower()
+        results = [{
+            'display_name': '%s, %s' % (city, country),
+            'individual_id': str(zlib.crc32(city.encode('utf-8'))),
+            'geo_type': 'City', 'localised_geo_type': 'City',
+            'is_bookable': False, 'parent_place_id': 0,
+        } for code, name, city, country in PLACES
+            if city.lower().startswith(query)]
+        return {'results': results, 'places': []}
+
+    @staticmethod
+    def _json(data):
+        return 200, {'Content-Type': 'application/json'}, \
+            json.dumps(data).encode('utf-8')
+
+    @staticmethod
+    def _validation_errors(parameter, message):
+        return 400, {'Content-Type': 'application/json'}, json.dumps({
+            'ValidationErrors': [{'ParameterName': parameter,
+                                  'Message': message}]
+        }).encode('utf-8')
+
+    def _sleep(self):
+        latency = self.latency
+        if isinstance(latency, (tuple, list)):
+            latency = random.uniform(*latency)
+        if latency:
+            time.sleep(latency)
+
+
+def _require(params, keys):
+    for key in keys:
+        if not params.get(key):
+            raise KeyError(key)
+
+
+def _datetime(date, minutes):
+    date = date if len(date) == 10 else '%s-01' % date[:7]
+    days, minutes = divmod(minutes, 24 * 60)
+    return '%s-%02dT%02d:%02d:00' % (date[:7], min(28, int(date[8:]) + days),
+                                     minutes // 60, minutes % 60)
+
+
+def _browse_leg(rnd, partial_date, places):
+    if len(partial_date) == 7:
+        partial_date = '%s-%02d' % (partial_date, rnd.randint(1, 28))
+    elif len(partial_date) != 10:
+        partial_date = '2017-%02d-%02d' % (rnd.randint(1, 12),
+                                           rnd.randint(1, 28))
+    origin, destination = rnd.sample(places, 2)
+    return {'CarrierIds': [rnd.randint(1, len(CARRIERS))],
+            'OriginId': origin['PlaceId'],
+            'DestinationId': destination['PlaceId'],
+            'DepartureDate': '%sT00:00:00' % partial_date}
+
+
+def _browse_dates(quotes, leg):
+    dates = {}
+    for quote in quotes:
+        if leg not in quote:
+            continue
+        date = quote[leg]['DepartureDate'][:10]
+        entry = dates.setdefault(date, {
+            'PartialDate': date, 'QuoteIds': [], 'Price': quote['MinPrice'],
+            'QuoteDateTime': quote['QuoteDateTime']})
+        entry['QuoteIds'].append(quote['QuoteId'])
+        entry['Price'] = min(entry['Price'], quote['MinPrice'])
+    return [dates[d] for d in sorted(dates)]
+
+
+class _ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+
+    daemon_threads = True
+
+
+class FakeServer(object):
+
+    """
+    HTTP server in a background thread serving a FakeSkyscannerAPI.
+
+    :param api - FakeSkyscannerAPI instance to serve, a new one
+                 is created from 'options' if not specified
+    :param host - interface to listen on
+    :param port - port to listen on, any free port by default
+    """
+
+    def __init__(self, api=None, host='127.0.0.1', port=0, **options):
+        self.api = api or FakeSkyscannerAPI(**options)
+        api = self.api
+
+        class Handler(BaseHTTPRequestHandler):
+
+            protocol_version = 'HTTP/1.1'
+            # Buffer the response, so that it is sent in a single write.
+            wbufsize = -1
+
+            def _handle(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                body = self.rfile.read(length) if length else None
+                status, headers, content = api.handle(
+                    self.command,
+                    'http://%s%s' % (self.headers.get('Host'), self.path),
+                    headers=dict(self.headers.items()), body=body)
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            do_GET = do_POST = do_PUT = _handle
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = _ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return 'http://%s:%s' % (host, port)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        kwargs={'poll_interval': 0.05})
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,266 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+from array import array
+
+# Departure time bands of 'outbounddeparttime' and 'inbounddeparttime',
+# in minutes of the day: morning, afternoon and evening.
+TIME_BANDS = {'M': (0, 12 * 60), 'A': (12 * 60, 18 * 60),
+              'E': (18 * 60, 24 * 60)}
+SORT_TYPES = ('price', 'duration', 'carrier', 'outbounddeparttime',
+              'outboundarrivetime', 'inbounddeparttime', 'inboundarrivetime')
+LEGS = ('outbound', 'inbound')
+
+
+def _codes(value):
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return set(value)
+    return set(c.strip() for c in str(value).split(';') if c.strip())
+
+
+def _minutes(value):
+    hours, minutes = str(value).split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def _mask(positions, size):
+    # Bitmask with the bits of the positions set.
+    bits = bytearray(b'0' * size)
+    for n in positions:
+        bits[size - 1 - n] = ord('1')
+    return int(bits.decode('ascii'), 2) if size else 0
+
+
+def _indices(mask):
+    # Positions of the set bits, lowest first.
+    bits = bin(mask)[:1:-1]
+    return [n for n, bit in enumerate(bits) if bit == '1']
+
+
+class _Leg(object):
+
+    """
+    Columns of the outbound or inbound legs of the itineraries.
+    """
+
+    def __init__(self):
+        self.departure = []
+        self.arrival = []
+        self.departure_minutes = array('i')
+        self.duration = array('i')
+        self.stops = array('i')
+        self.origin = []
+        self.destination = []
+
+    def append(self, leg, places):
+        if leg is None:
+            leg = {}
+        departure = leg.get('Departure') or ''
+        self.departure.append(departure)
+        self.arrival.append(leg.get('Arrival') or '')
+        self.departure_minutes.append(
+            _minutes(departure[11:16]) if departure else -1)
+        self.duration.append(leg.get('Duration') or 0)
+        self.stops.append(len(leg.get('Stops') or ()))
+        self.origin.append(places.get(leg.get('OriginStation')))
+        self.destination.append(places.get(leg.get('DestinationStation')))
+
+
+class ItineraryTable(object):
+
+    """
+    Column table of the itineraries of a completed live pricing result,
+    to filter and sort them locally, without polling again.
+
+    Understands the filter and sort parameters of the poll request,
+    see 'Transport.get_additional_params':
+
+     * stops - number of stops, an int or the string of one as given
+               to 'get_additional_params', e.g. 0 or '0' for direct
+               itineraries: itineraries whose leg with the most stops
+               has exactly that many
+     * duration - maximum duration of every leg, in minutes
+     * includecarriers - ';' separated carrier codes,
+                         itineraries with these carriers only
+     * excludecarriers - ';' separated carrier codes,
+                         itineraries without any of these carriers
+     * originairports, destinationairports - ';' separated airport
+                                             codes of the outbound leg
+     * outbounddeparttime, inbounddeparttime - ';' separated bands,
+                                               M(orning), A(fternoon)
+                                               or E(vening), see TIME_BANDS
+     * outbounddepartstarttime, outbounddepartendtime,
+       inbounddepartstarttime, inbounddepartendtime - 'hh:mm'
+     * sorttype - one of SORT_TYPES, sortorder - 'asc' or 'desc'
+
+    Usage:
+
+        table = ItineraryTable(flights_service.get_result(**params).parsed)
+        direct = table.filter(stops=0, sorttype='duration')
+        morning = table.filter(outbounddeparttime='M', sorttype='price')
+    """
+
+    def __init__(self, parsed):
+        """
+        :param parsed - 'parsed' attribute of a JSON live pricing response
+        """
+        places = dict((p.get('Id'), p.get('Code'))
+                      for p in parsed.get('Places') or [])
+        carriers = dict((c.get('Id'), c.get('Code') or c.get('Name'))
+                        for c in parsed.get('Carriers') or [])
+        legs = dict((leg.get('Id'), leg) for leg in parsed.get('Legs') or [])
+
+        self.itineraries = list(parsed.get('Itineraries') or [])
+        self.price = array('d')
+        self.carrier = []
+        self.outbound = _Leg()
+        self.inbound = _Leg()
+        self._masks = {}
+        carrier_positions = {}
+        for n, itinerary in enumerate(self.itineraries):
+            prices = [o['Price'] for o in itinerary.get('PricingOptions') or []
+                      if o.get('Price') is not None]
+            self.price.append(min(prices) if prices else float('inf'))
+            outbound = legs.get(itinerary.get('OutboundLegId'))
+            inbound = legs.get(itinerary.get('InboundLegId'))
+            self.outbound.append(outbound, places)
+            self.inbound.append(inbound, places)
+            codes = [carriers.get(c) for leg in (outbound, inbound)
+                     if leg is not None for c in leg.get('Carriers') or ()]
+            self.carrier.append(codes[0] if codes else '')
+            for code in set(codes):
+                carrier_positions.setdefault(code, []).append(n)
+        self.duration = array('i', (
+            o + i for o, i in zip(self.outbound.duration,
+                                  self.inbound.duration)))
+        self._all = (1 << len(self.itineraries)) - 1
+        self._carrier_masks = dict(
+            (code, _mask(positions, len(self.itineraries)))
+            for code, positions in carrier_positions.items())
+
+    def __len__(self):
+        return len(self.itineraries)
+
+    def filter(self, **params):
+        """
+        Filtered and sorted itineraries, see the class docstring for
+        the params. Other params, e.g. the ones of the search, are ignored.
+        """
+        return [self.itineraries[n] for n in self.select(**params)]
+
+    def select(self, stops=None, duration=None, includecarriers=None,
+               excludecarriers=None, originairports=None,
+               destinationairports=None, sorttype=None, sortorder='asc',
+               **params):
+        """
+        Positions of the filtered and sorted itineraries.
+        """
+        mask = self._all
+        if stops is not None:
+            mask &= self._mask('stops', int(stops), self._stops)
+        if includecarriers:
+            include = _codes(includecarriers)
+            for code, carrier_mask in self._carrier_masks.items():
+                if code not in include:
+                    mask &= ~carrier_mask
+        if excludecarriers:
+            for code in _codes(excludecarriers):
+                mask &= ~self._carrier_masks.get(code, 0)
+        if originairports:
+            mask &= self._any('origin', originairports, self.outbound.origin)
+        if destinationairports:
+            mask &= self._any('destination', destinationairports,
+                              self.outbound.destination)
+        for leg_name in LEGS:
+            bands = params.get('%sdeparttime' % leg_name)
+            if bands:
+                mask &= self._any('%sdeparttime' % leg_name, bands,
+                                  getattr(self, leg_name).departure_minutes,
+                                  self._band)
+
+        selected = _indices(mask)
+        if duration is not None:
+            outbound, inbound = self.outbound.duration, self.inbound.duration
+            duration = int(duration)
+            selected = [n for n in selected
+                        if max(outbound[n], inbound[n]) <= duration]
+        for leg_name in LEGS:
+            selected = self._time_window(
+                selected, getattr(self, leg_name),
+                params.get('%sdepartstarttime' % leg_name),
+                params.get('%sdepartendtime' % leg_name))
+
+        if sorttype:
+            selected.sort(key=self._sort_key(sorttype),
+                          reverse=str(sortorder).lower() == 'desc')
+        return selected
+
+    def _stops(self, n):
+        return max(self.outbound.stops[n], self.inbound.stops[n])
+
+    @staticmethod
+    def _band(minutes):
+        for band, (start, end) in TIME_BANDS.items():
+            if start <= minutes < end:
+                return band
+
+    def _mask(self, name, value, column):
+        # Bitmask of the itineraries with the value in the column,
+        # column being a function of the itinerary position.
+        masks = self._masks.get(name)
+        if masks is None:
+            positions = {}
+            for n in range(len(self.itineraries)):
+                positions.setdefault(column(n), []).append(n)
+            masks = self._masks[name] = dict(
+                (key, _mask(p, len(self.itineraries)))
+                for key, p in positions.items())
+        return masks.get(value, 0)
+
+    def _any(self, name, values, column, transform=None):
+        if transform is None:
+            def key(n):
+                return column[n]
+        else:
+            def key(n):
+                return transform(column[n])
+        mask = 0
+        for value in _codes(values):
+            mask |= self._mask(name, value, key)
+        return mask
+
+    @staticmethod
+    def _time_window(selected, leg, start, end):
+        if start is None and end is None:
+            return selected
+        start = 0 if start is None else _minutes(start)
+        end = 24 * 60 if end is None else _minutes(end)
+        minutes = leg.departure_minutes
+        return [n for n in selected if start <= minutes[n] <= end]
+
+    def _sort_key(self, sorttype):
+        sorttype = sorttype.lower()
+        if sorttype not in SORT_TYPES:
+            raise ValueError('Unknown sort type: %s, possible values are: %s'
+                             % (sorttype, ', '.join(SORT_TYPES)))
+        if sorttype in ('price', 'duration', 'carrier'):
+            return getattr(self, sorttype).__getitem__
+        for leg_name in LEGS:
+            if sorttype.startswith(leg_name):
+                leg = getattr(self, leg_name)
+                return (leg.departure if sorttype.endswith('departtime')
+                        else leg.arrival).__getitem__
@@ -0,0 +1,437 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Append-only store of historical prices.
+
+A store is a directory with three files:
+
+ * prices.log - fixed size records of
+                (route, date, carrier, price, timestamp),
+                in the order they were appended
+ * prices.idx - (route, date, record number) entries of the log,
+                sorted, memory-mapped and binary searched by range queries
+ * names.txt - route and carrier names, the records refer to them by
+               line number
+
+Records appended since the index was last rebuilt are kept in memory
+and merged into the index every 'reindex_every' records and on 'close'.
+"""
+
+import bisect
+import calendar
+import mmap
+import os
+import struct
+import threading
+import time
+from collections import namedtuple
+
+PriceRecord = namedtuple('PriceRecord',
+                         'route date carrier price timestamp')
+
+_RECORD = struct.Struct('<IIIdd')
+_ENTRY = struct.Struct('<IIQ')
+_INDEXED = struct.Struct('<Q')
+
+
+def _date_number(date):
+    # '2017-05-28T00:00:00' -> 20170528, '2017-05' -> 20170500
+    parts = (str(date)[:10].split('-') + ['0', '0'])[:3]
+    return int(parts[0]) * 10000 + int(parts[1]) * 100 + int(parts[2])
+
+
+def _date_string(number):
+    year, rest = divmod(number, 10000)
+    month, day = divmod(rest, 100)
+    if not day:
+        return '%04d-%02d' % (year, month)
+    return '%04d-%02d-%02d' % (year, month, day)
+
+
+def _timestamp(date_time, default):
+    try:
+        return float(calendar.timegm(time.strptime(date_time[:19],
+                                                   '%Y-%m-%dT%H:%M:%S')))
+    except (TypeError, ValueError):
+        return default
+
+
+class PriceHistory(object):
+
+    """
+    Append-only, memory-mapped store of historical prices per route.
+
+    Can be used as a sink of browse quotes and completed live pricing
+    results, see 'history' parameter of the Transport:
+
+        history = PriceHistory('prices')
+        flights_cache_service = FlightsCache('<Your API Key>',
+                                             history=history)
+        ...
+        history.prices('LHR-KUL', start='2017-05-01', end='2017-05-31')
+
+    A store must only be written to by a single process at a time.
+    """
+
+    def __init__(self, path, reindex_every=100000):
+        """
+        :param path - directory of the store, created if it does not exist
+        :param reindex_every - number of appended records after which
+                               they are merged into the sorted index
+        """
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self.path = path
+        self.reindex_every = reindex_every
+        self._lock = threading.RLock()
+        self._log_path = os.path.join(path, 'prices.log')
+        self._index_path = os.path.join(path, 'prices.idx')
+        self._names_path = os.path.join(path, 'names.txt')
+
+        self._names, self._ids = [], {}
+        if os.path.exists(self._names_path):
+            with open(self._names_path, 'rb') as f:
+                for line in f.read().decode('utf-8').split(u'\n')[:-1]:
+                    self._ids[line] = len(self._names)
+                    self._names.append(line)
+        self._names_file = open(self._names_path, 'ab')
+        self._log = open(self._log_path, 'ab')
+        self._log_map = self._index_map = None
+
+        size = os.path.getsize(self._log_path)
+        self._count = size // _RECORD.size
+        if size % _RECORD.size:
+            # Drop a partially written last record.
+            self._log.truncate(self._count * _RECORD.size)
+        self._indexed = 0
+        if os.path.exists(self._index_path):
+            with open(self._index_path, 'rb') as f:
+                header = f.read(_INDEXED.size)
+            if len(header) == _INDEXED.size:
+                self._indexed = _INDEXED.unpack(header)[0]
+            if self._indexed > self._count:
+                # The log was truncated after the index was written,
+                # so the index is rebuilt.
+                self._indexed = 0
+        self._map_index()
+        self._tail = sorted(
+            self._entry(n) for n in range(self._indexed, self._count))
+
+    def append(self, route, date, carrier, price, timestamp=None):
+        """
+        Append a price.
+
+        :param route - route name, e.g. 'LHR-KUL'
+        :param date - departure date, e.g. '2017-05-28' or '2017-05'
+        :param carrier - carrier name
+        :param price - price
+        :param timestamp - when the price was seen, in seconds since
+                           the epoch, default is now
+        """
+        self.extend([(route, date, carrier, price, timestamp)])
+
+    def extend(self, records):
+        """
+        Append (route, date, carrier, price, timestamp) records.
+        """
+        now = time.time()
+        with self._lock:
+            packed, entries = [], []
+            for route, date, carrier, price, timestamp in records:
+                route_id = self._name_id(route)
+                date = _date_number(date)
+                packed.append(_RECORD.pack(
+                    route_id, date, self._name_id(carrier or ''),
+                    float(price), now if timestamp is None else timestamp))
+                entries.append((route_id, date, self._count + len(entries)))
+            if not packed:
+                return 0
+            # Names first, so that records never refer to missing ones.
+            self._names_file.flush()
+            self._log.write(b''.join(packed))
+            self._log.flush()
+            self._count += len(packed)
+            self._tail.extend(entries)
+            self._tail.sort()
+            if len(self._tail) >= self.reindex_every:
+                self.reindex()
+            return len(packed)
+
+    def add_response(self, parsed, timestamp=None):
+        """
+        Append the prices of a parsed JSON response: every quote of
+        a browse cache response and the minimum price per route, date
+        and carrier of a live pricing response.
+        Returns the number of appended records.
+
+        Quotes already in the store, with the same price and quote time,
+        are not appended again, e.g. when a cached response is refreshed.
+
+        :param parsed - 'parsed' attribute of a JSON response
+        :param timestamp - when live prices were seen, default is now
+        """
+        if not isinstance(parsed, dict):
+            return 0
+        with self._lock:
+            records = []
+            if parsed.get('Quotes'):
+                records.extend(self._new_records(
+                    self._quote_records(parsed, timestamp)))
+            if parsed.get('Itineraries'):
+                records.extend(self._itinerary_records(parsed, timestamp))
+            return self.extend(records)
+
+    def prices(self, route, start=None, end=None, carrier=None):
+        """
+        Prices of a route, ordered by departure date.
+
+        :param route - route name
+        :param start - first departure date, inclusive
+        :param end - last departure date, inclusive,
+                     a month, e.g. '2017-05', includes all its days
+        :param carrier - only return prices of this carrier
+        """
+        with self._lock:
+            route_id = self._ids.get(route)
+            carrier_id = None if carrier is None else self._ids.get(carrier)
+            if route_id is None or carrier_id is None and carrier is not None:
+                return []
+            low = (route_id, 0 if start is None else _date_number(start))
+            high = (route_id, 99999999 if end is None
+                    else self._end_date(end), 2 ** 64)
+            numbers = [e[2] for e in self._tail[
+                bisect.bisect_left(self._tail, low):
+                bisect.bisect_right(self._tail, high)]]
+            first = self._search(low)
+            last = self._search(high)
+            numbers.extend(_ENTRY.unpack_from(
+                self._index_map, _INDEXED.size + n * _ENTRY.size)[2]
+                for n in range(first, last))
+
+            self._map_log()
+            result = []
+            for n in numbers:
+                record = _RECORD.unpack_from(self._log_map, n * _RECORD.size)
+                if carrier_id is not None and record[2] != carrier_id:
+                    continue
+                result.append(PriceRecord(
+                    route, _date_string(record[1]), self._names[record[2]],
+                    record[3], record[4]))
+        result.sort(key=lambda r: (r.date, r.timestamp))
+        return result
+
+    def routes(self):
+        """
+        Names of the routes with at least one price.
+        """
+        with self._lock:
+            self._map_log()
+            ids = set(_RECORD.unpack_from(self._log_map,
+                                          n * _RECORD.size)[0]
+                      for n in range(self._count))
+            return sorted(self._names[i] for i in ids)
+
+    def reindex(self):
+        """
+        Merge the records appended since the last reindex into
+        the sorted index.
+        """
+        with self._lock:
+            if not self._tail:
+                return
+            size = self._index_size()
+            if len(self._tail) * 32 < size:
+                # Copy the index between the insertion points.
+                chunks, previous = [], 0
+                for entry in self._tail:
+                    position = self._search(entry, previous)
+                    chunks.append(self._index_bytes(previous, position))
+                    chunks.append(_ENTRY.pack(*entry))
+                    previous = position
+                chunks.append(self._index_bytes(previous, size))
+            else:
+                end = _INDEXED.size + size * _ENTRY.size
+                entries = [_ENTRY.unpack_from(self._index_map, offset)
+                           for offset in range(_INDEXED.size, end,
+                                               _ENTRY.size)]
+                entries.extend(self._tail)
+                entries.sort()
+                chunks = [_ENTRY.pack(*entry) for entry in entries]
+
+            temp_path = self._index_path + '.tmp'
+            with open(temp_path, 'wb') as f:
+                f.write(_INDEXED.pack(self._count))
+                for chunk in chunks:
+                    f.write(chunk)
+            self._close_map('_index_map')
+            _replace(temp_path, self._index_path)
+            self._indexed = self._count
+            self._tail = []
+            self._map_index()
+
+    def close(self):
+        with self._lock:
+            self.reindex()
+            self._close_map('_log_map')
+            self._close_map('_index_map')
+            self._log.close()
+            self._names_file.close()
+
+    def __len__(self):
+        return self._count
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _quote_records(self, parsed, timestamp):
+        places = dict((p.get('PlaceId'), self._place_code(p))
+                      for p in parsed.get('Places') or [])
+        carriers = dict((c.get('CarrierId'), c.get('Name'))
+                        for c in parsed.get('Carriers') or [])
+        now = time.time() if timestamp is None else timestamp
+        for quote in parsed['Quotes']:
+            leg = quote.get('OutboundLeg')
+            if not leg or quote.get('MinPrice') is None:
+                continue
+            carrier_ids = leg.get('CarrierIds') or [None]
+            yield ('%s-%s' % (places.get(leg.get('OriginId')),
+                              places.get(leg.get('DestinationId'))),
+                   leg['DepartureDate'], carriers.get(carrier_ids[0]),
+                   quote['MinPrice'],
+                   _timestamp(quote.get('QuoteDateTime'), now))
+
+    def _new_records(self, records):
+        # Called with the lock held.
+        known = {}
+        for route, date, carrier, price, timestamp in records:
+            key = (route, _date_number(date))
+            if key not in known:
+                known[key] = set(
+                    (r.carrier, r.price, r.timestamp)
+                    for r in self.prices(route, date, date))
+            value = (u'%s' % (carrier or ''), float(price), timestamp)
+            if value not in known[key]:
+                known[key].add(value)
+                yield route, date, carrier, price, timestamp
+
+    def _itinerary_records(self, parsed, timestamp):
+        places = dict((p.get('Id'), p.get('Code') or p.get('Name'))
+                      for p in parsed.get('Places') or [])
+        carriers = dict((c.get('Id'), c.get('Code') or c.get('Name'))
+                        for c in parsed.get('Carriers') or [])
+        legs = dict((leg.get('Id'), leg) for leg in parsed.get('Legs') or [])
+        now = time.time() if timestamp is None else timestamp
+        minimums = {}
+        for itinerary in parsed['Itineraries']:
+            leg = legs.get(itinerary.get('OutboundLegId'))
+            prices = [o['Price'] for o in itinerary.get('PricingOptions') or []
+                      if o.get('Price') is not None]
+            if leg is None or not prices:
+                continue
+            key = ('%s-%s' % (places.get(leg.get('OriginStation')),
+                              places.get(leg.get('DestinationStation'))),
+                   leg['Departure'][:10],
+                   carriers.get((leg.get('Carriers') or [None])[0]))
+            minimums[key] = min(minimums.get(key, min(prices)), min(prices))
+        for (route, date, carrier), price in sorted(minimums.items()):
+            yield route, date, carrier, price, now
+
+    def _name_id(self, name):
+        # Called with the lock held.
+        name = u'%s' % name
+        name_id = self._ids.get(name)
+        if name_id is None:
+            name_id = self._ids[name] = len(self._names)
+            self._names.append(name)
+            self._names_file.write(name.replace(u'\n', u' ')
+                                   .encode('utf-8') + b'\n')
+        return name_id
+
+    @staticmethod
+    def _place_code(place):
+        for field in ('SkyscannerCode', 'IataCode', 'Name'):
+            if place.get(field):
+                return place[field]
+
+    @staticmethod
+    def _end_date(end):
+        number = _date_number(end)
+        return number + 99 if number % 100 == 0 else number
+
+    def _entry(self, n):
+        self._map_log()
+        record = _RECORD.unpack_from(self._log_map, n * _RECORD.size)
+        return record[0], record[1], n
+
+    def _index_size(self):
+        if self._index_map is None:
+            return 0
+        return (len(self._index_map) - _INDEXED.size) // _ENTRY.size
+
+    def _index_bytes(self, start, end):
+        offset = _INDEXED.size
+        return self._index_map[offset + start * _ENTRY.size:
+                               offset + end * _ENTRY.size] \
+            if end > start else b''
+
+    def _search(self, key, low=0):
+        # Position of the first index entry not less than the key.
+        high = self._index_size()
+        while low < high:
+            middle = (low + high) // 2
+            offset = _INDEXED.size + middle * _ENTRY.size
+            if _ENTRY.unpack_from(self._index_map, offset) < key:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _map_log(self):
+        size = self._count * _RECORD.size
+        if self._log_map is not None and len(self._log_map) >= size:
+            return
+        self._close_map('_log_map')
+        if size:
+            with open(self._log_path, 'rb') as f:
+                self._log_map = mmap.mmap(f.fileno(), size,
+                                          access=mmap.ACCESS_READ)
+
+    def _map_index(self):
+        if self._indexed and os.path.exists(self._index_path):
+            with open(self._index_path, 'rb') as f:
+                self._index_map = mmap.mmap(f.fileno(), 0,
+                                            access=mmap.ACCESS_READ)
+
+    def _close_map(self, name):
+        mapped = getattr(self, name)
+        if mapped is not None:
+            mapped.close()
+            setattr(self, name, None)
+
+
+def _replace(source, destination):
+    try:
+        os.replace(source, destination)
+    except AttributeError:
+        # Python 2
+        if os.path.exists(destination):
+            os.remove(destination)
+        os.rename(source, destination)
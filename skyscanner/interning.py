@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import sys
+import threading
+
+
+class FrozenDict(dict):
+
+    """
+    Immutable and hashable dict, safe to share between responses.
+    """
+
+    __slots__ = ()
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError('%s is immutable' % type(self).__name__)
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = \
+        update = _immutable
+
+    def __hash__(self):
+        return hash(frozenset(self.items()))
+
+    def __reduce__(self):
+        return type(self), (dict(self),)
+
+
+def deep_size(value):
+    """
+    Approximate size of a parsed JSON value in bytes.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(v) for v in value)
+    return size
+
+
+class InternTable(object):
+
+    """
+    Table of reference entities (places, carriers, agents) shared between
+    parsed JSON responses, so that identical entities and strings of
+    different responses are kept in memory only once.
+
+    Interned entities are FrozenDict instances with tuples in place
+    of lists, so they can not be modified.
+
+    Usage:
+
+        table = InternTable()
+        flights_service = Flights('<Your API Key>', intern_table=table)
+        hotels_service = Hotels('<Your API Key>', intern_table=table)
+        ...
+        table.stats()
+    """
+
+    SECTIONS = ('Places', 'Carriers', 'Agents', 'places', 'agents')
+
+    def __init__(self, sections=SECTIONS, max_size=100000):
+        """
+        :param sections - top-level sections of the responses to intern
+        :param max_size - maximum number of entities in the table,
+                          new entities are not interned once it is full
+        """
+        self.sections = tuple(sections)
+        self.max_size = max_size
+        self.hits = 0
+        self.saved_bytes = 0
+        self._entities = {}
+        self._strings = {}
+        self._lock = threading.Lock()
+
+    def intern(self, parsed):
+        """
+        Replace the entities of the parsed response with the shared ones.
+        Returns the same, updated, parsed response.
+        """
+        if not isinstance(parsed, dict):
+            return parsed
+        with self._lock:
+            for section in self.sections:
+                items = parsed.get(section)
+                if isinstance(items, list):
+                    parsed[section] = [self._entity(item) for item in items]
+        return parsed
+
+    def stats(self):
+        """
+        Number of shared entities and strings, number of duplicate
+        entities replaced and estimated bytes saved by that.
+        """
+        with self._lock:
+            return {'entities': len(self._entities),
+                    'strings': len(self._strings),
+                    'hits': self.hits,
+                    'saved_bytes': self.saved_bytes}
+
+    def clear(self):
+        with self._lock:
+            self._entities.clear()
+            self._strings.clear()
+
+    def _entity(self, item):
+        new_strings = {}
+        frozen = self._freeze(item, new_strings)
+        shared = self._entities.get(frozen)
+        if shared is not None:
+            self.hits += 1
+            self.saved_bytes += deep_size(item)
+            return shared
+        if len(self._entities) < self.max_size:
+            self._entities[frozen] = frozen
+            # Only strings of the stored entities are kept,
+            # so that they are bounded by 'max_size' too.
+            self._strings.update(new_strings)
+        return frozen
+
+    def _freeze(self, value, new_strings):
+        if isinstance(value, dict):
+            return FrozenDict((self._freeze(k, new_strings),
+                               self._freeze(v, new_strings))
+                              for k, v in value.items())
+        if isinstance(value, (list, tuple)):
+            return tuple(self._freeze(v, new_strings) for v in value)
+        if isinstance(value, type(u'')):
+            shared = self._strings.get(value)
+            if shared is None:
+                shared = new_strings.setdefault(value, value)
+            return shared
+        return value
@@ -0,0 +1,220 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from urllib.parse import urlsplit
+except ImportError:
+    from urlparse import urlsplit
+
+
+class ApiKeyPool(object):
+
+    """
+    Spreads requests across several API keys.
+
+    Every key has its own rate budget, a token bucket of 'rate' requests
+    per second, and requests go to the healthy key with the most budget
+    left. A key answered with 429 'Too many requests' cools down,
+    for longer on consecutive 429s, and gets no new traffic meanwhile.
+
+    Sessions are tied to the key that created them, so the poll and
+    booking URLs of a session are pinned to that key.
+
+    Usage:
+
+        pool = ApiKeyPool(['<Key 1>', '<Key 2>', '<Key 3>'], rate=1)
+        flights_service = Flights(key_pool=pool)
+        ...
+        pool.stats()
+    """
+
+    def __init__(self, keys, rate=None, cooldown=60, max_cooldown=600,
+                 max_pins=100000, clock=time.time):
+        """
+        :param keys - API keys, or {API key: requests per second}
+                      for keys with different quotas
+        :param rate - requests per second of every key, None for no limit
+        :param cooldown - seconds a key gets no new traffic for
+                          after a 429 response, doubled on consecutive ones
+        :param max_cooldown - longest cooldown, in seconds
+        :param max_pins - number of sessions whose keys are remembered,
+                          the least recently used ones are forgotten
+        :param clock - function returning current time in seconds
+        """
+        rates = keys if isinstance(keys, dict) else \
+            OrderedDict((key, rate) for key in keys)
+        if not rates:
+            raise ValueError('At least one API key must be specified.')
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_pins = max_pins
+        self.clock = clock
+        now = clock()
+        self._keys = OrderedDict(
+            (key, _Key(key, key_rate, now)) for key, key_rate in rates.items())
+        self._pins = OrderedDict()
+        self._lock = threading.Condition(threading.Lock())
+
+    @property
+    def keys(self):
+        return list(self._keys)
+
+    def acquire(self, url=None, context=None):
+        """
+        Wait for a key with some rate budget left and take a request
+        from its budget. Returns the key.
+
+        :param url - URL of the request, pinned URLs use their key
+        :param context - skyscanner.skyscanner.SearchContext
+                         of the request, waiting is given up when its
+                         budget is spent or it is cancelled
+        """
+        with self._lock:
+            pinned = self._pinned(url)
+            # Pinned requests can not move to another key,
+            # so they only wait for its rate budget.
+            keys = list(self._keys.values()) if pinned is None else \
+                [self._keys[pinned]]
+            while True:
+                now = self.clock()
+                ready = [k for k in keys if k.ready(now, pinned is not None)]
+                if ready:
+                    key = max(ready, key=lambda k: (k.tokens, -k.requests))
+                    key.take()
+                    return key.key
+                if context is not None:
+                    # Wakes up regularly to notice cancellation.
+                    context.timeout(None)
+                self._lock.wait(self._next_wake_up(
+                    now, keys, pinned is not None, context))
+
+    def report(self, key, status_code):
+        """
+        Record the response to a request sent with a key,
+        429 responses put the key in cooldown.
+        """
+        with self._lock:
+            entry = self._keys.get(key)
+            if entry is None:
+                return
+            if status_code == 429:
+                entry.throttled += 1
+                entry.consecutive += 1
+                cooldown = min(self.max_cooldown,
+                               self.cooldown * 2 ** (entry.consecutive - 1))
+                entry.cooling_until = self.clock() + cooldown
+            elif status_code is not None and status_code < 500:
+                entry.consecutive = 0
+            self._lock.notify_all()
+
+    def pin(self, url, key):
+        """
+        Pin the URL of a session, and the URLs under it, to a key.
+        """
+        with self._lock:
+            path = _path(url)
+            self._pins.pop(path, None)
+            self._pins[path] = key
+            while len(self._pins) > self.max_pins:
+                self._pins.popitem(last=False)
+
+    def key_for(self, url):
+        """
+        Key the URL is pinned to, None if it is not pinned.
+        """
+        with self._lock:
+            return self._pinned(url)
+
+    def stats(self):
+        """
+        {key: {'requests', 'throttled', 'cooling_down'}}
+        """
+        with self._lock:
+            now = self.clock()
+            return dict((k.key, {'requests': k.requests,
+                                 'throttled': k.throttled,
+                                 'cooling_down': k.cooling_until > now})
+                        for k in self._keys.values())
+
+    def _pinned(self, url):
+        # Called with the lock held. Looks up the path and its parents,
+        # e.g. booking URLs are under the URL of their session.
+        if url is None or not self._pins:
+            return None
+        path = _path(url)
+        while path:
+            key = self._pins.get(path)
+            if key is not None:
+                self._pins[path] = self._pins.pop(path)
+                return key
+            path = path.rpartition('/')[0]
+        return None
+
+    @staticmethod
+    def _next_wake_up(now, keys, pinned, context):
+        delays = [k.wait(now, pinned) for k in keys]
+        if context is not None:
+            delays.append(0.1)
+            remaining = context.remaining()
+            if remaining is not None:
+                delays.append(remaining)
+        return max(0.0, min(delays))
+
+
+class _Key(object):
+
+    def __init__(self, key, rate, now):
+        self.key = key
+        self.rate = rate
+        self.tokens = float(max(1, rate or 1))
+        self.updated = now
+        self.cooling_until = 0
+        self.consecutive = 0
+        self.requests = 0
+        self.throttled = 0
+
+    def ready(self, now, pinned=False):
+        if not pinned and self.cooling_until > now:
+            return False
+        return self._refill(now) >= 1
+
+    def take(self):
+        self.requests += 1
+        if self.rate:
+            self.tokens -= 1
+
+    def wait(self, now, pinned=False):
+        # Seconds until the key is ready.
+        delays = [0 if pinned else self.cooling_until - now]
+        if self.rate and self.tokens < 1:
+            delays.append((1 - self.tokens) / self.rate)
+        return max(delays)
+
+    def _refill(self, now):
+        if self.rate:
+            refill = (now - self.updated) * self.rate
+            self.tokens = min(float(max(1, self.rate)), self.tokens + refill)
+            self.updated = now
+        return self.tokens
+
+
+def _path(url):
+    return urlsplit(url).path.rstrip('/')
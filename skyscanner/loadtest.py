@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Load driver running concurrent live pricing searches.
+
+By default it starts a local skyscanner.fakeapi.FakeServer to run against:
+
+    python -m skyscanner.loadtest --searches 200 --concurrency 20 \\
+        --latency 0.05 --throttle-rate 0.02
+
+or, to compare HTTP backends under the same workload, with the fake API
+in process instead:
+
+    python -m skyscanner.loadtest --backend stub
+"""
+
+import argparse
+import math
+import threading
+import time
+
+try:
+    from queue import Queue
+except ImportError:
+    from Queue import Queue
+
+from . import backends
+from .fakeapi import FakeServer, FakeSkyscannerAPI
+from .retry import RetryPolicy
+from .scheduler import AdaptiveConcurrency
+from .skyscanner import CarHire, Flights, Hotels
+
+SEARCHES = {
+    'flights': (Flights, dict(
+        country='UK', currency='GBP', locale='en-GB',
+        originplace='SIN-sky', destinationplace='KUL-sky',
+        outbounddate='2017-05-28', inbounddate='2017-05-31', adults=1)),
+    'hotels': (Hotels, dict(
+        market='UK', currency='GBP', locale='en-GB', entityid=27543923,
+        checkindate='2017-05-26', checkoutdate='2017-05-30', guests=1,
+        rooms=1)),
+    'carhire': (CarHire, dict(
+        market='UK', currency='GBP', locale='en-GB', pickupplace='LHR-sky',
+        dropoffplace='LHR-sky', pickupdatetime='2017-05-29T12:00',
+        dropoffdatetime='2017-05-29T18:00', driverage='30',
+        userip='175.156.244.174')),
+}
+
+
+def percentile(values, percent):
+    """
+    Nearest-rank percentile of a sorted list.
+    """
+    if not values:
+        return None
+    rank = int(math.ceil(percent / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+class LoadReport(object):
+
+    """
+    Throughput and latency percentiles of a load test run.
+    """
+
+    PERCENTILES = (50, 90, 95, 99)
+
+    def __init__(self, elapsed, latencies, errors):
+        """
+        :param elapsed - duration of the whole run in seconds
+        :param latencies - {vertical: [seconds of every completed search]}
+        :param errors - {vertical: [exception of every failed search]}
+        """
+        self.elapsed = elapsed
+        self.latencies = dict((k, sorted(v)) for k, v in latencies.items())
+        self.errors = errors
+
+    @property
+    def completed(self):
+        return sum(len(v) for v in self.latencies.values())
+
+    @property
+    def failed(self):
+        return sum(len(v) for v in self.errors.values())
+
+    @property
+    def throughput(self):
+        """
+        Completed searches per second.
+        """
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def percentiles(self, vertical=None):
+        """
+        Latency percentiles in seconds, of a single vertical or overall.
+        """
+        if vertical is None:
+            latencies = sorted(s for v in self.latencies.values() for s in v)
+        else:
+            latencies = self.latencies.get(vertical, [])
+        return dict((p, percentile(latencies, p)) for p in self.PERCENTILES)
+
+    def __str__(self):
+        header = ['vertical', 'ok', 'failed'] + [
+            'p%s' % p for p in self.PERCENTILES]
+        lines = ['{0} searches completed, {1} failed in {2:.2f}s '
+                 '({3:.2f} searches/s)'.format(self.completed, self.failed,
+                                               self.elapsed, self.throughput),
+                 self._row(header)]
+        for vertical in sorted(set(self.latencies) | set(self.errors)):
+            percentiles = self.percentiles(vertical)
+            columns = [vertical, len(self.latencies.get(vertical, [])),
+                       len(self.errors.get(vertical, []))]
+            columns.extend('-' if percentiles[p] is None else
+                           '%.3f' % percentiles[p] for p in self.PERCENTILES)
+            lines.append(self._row(columns))
+        return '\n'.join(lines)
+
+    @staticmethod
+    def _row(columns):
+        return '{0:<10}'.format(columns[0]) + ''.join(
+            '{0:>9}'.format(c) for c in columns[1:])
+
+
+class LoadTest(object):
+
+    """
+    Runs N live pricing searches from a number of concurrent workers.
+
+    :param api_host - API host to run against
+    :param searches - number of searches to run
+    :param concurrency - number of concurrent workers
+    :param verticals - verticals to run searches for, in turns,
+                       see SEARCHES for the possible values
+    :param api_key - API key to use
+    :param service_options - additional Transport arguments
+    :param poll_options - 'poll_session' arguments, by default polls
+                          without the initial delay and 50ms apart
+    """
+
+    def __init__(self, api_host, searches=100, concurrency=10,
+                 verticals=('flights', 'hotels', 'carhire'),
+                 api_key='loadtest', service_options=None,
+                 poll_options=None):
+        self.api_host = api_host
+        self.searches = searches
+        self.concurrency = concurrency
+        self.verticals = tuple(verticals)
+        self.api_key = api_key
+        self.service_options = service_options or {}
+        self.poll_options = dict(initial_delay=0, delay=0.05, tries=20)
+        self.poll_options.update(poll_options or {})
+
+    def run(self):
+        """
+        Run the searches and return a LoadReport.
+        """
+        services = dict(
+            (vertical, SEARCHES[vertical][0](self.api_key,
+                                             api_host=self.api_host,
+                                             **self.service_options))
+            for vertical in self.verticals)
+        tasks = Queue()
+        for n in range(self.searches):
+            tasks.put(self.verticals[n % len(self.verticals)])
+        latencies = dict((vertical, []) for vertical in self.verticals)
+        errors = dict((vertical, []) for vertical in self.verticals)
+
+        def worker():
+            while True:
+                vertical = tasks.get()
+                if vertical is None:
+                    return
+                started = time.time()
+                try:
+                    self.search(services[vertical], SEARCHES[vertical][1])
+                    latencies[vertical].append(time.time() - started)
+                except Exception as e:
+                    errors[vertical].append(e)
+
+        workers = [threading.Thread(target=worker)
+                   for n in range(self.concurrency)]
+        for n in workers:
+            tasks.put(None)
+        started = time.time()
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        return LoadReport(time.time() - started, latencies, errors)
+
+    def search(self, service, params):
+        poll_url = service.create_session(**dict(params))
+        if not isinstance(poll_url, str):
+            raise RuntimeError('Session was not created.')
+        poll_response = service.poll_session(
+            poll_url, **self.poll_options)
+        if not service.is_poll_complete(poll_response):
+            raise RuntimeError('Search did not complete.')
+        return poll_response
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Run concurrent live pricing searches.')
+    parser.add_argument('--searches', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--verticals', default='flights,hotels,carhire')
+    parser.add_argument('--api-host',
+                        help='run against this host instead of a local '
+                             'fake API server')
+    parser.add_argument('--api-key', default='loadtest')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='fake API latency in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='share of fake API requests failing with 500')
+    parser.add_argument('--throttle-rate', type=float, default=0.0,
+                        help='share of fake API requests failing with 429')
+    parser.add_argument('--polls-to-complete', type=int, default=3)
+    parser.add_argument('--adaptive', action='store_true',
+                        help='limit the requests in flight adaptively')
+    parser.add_argument('--backend', default=backends.REQUESTS,
+                        choices=backends.BACKENDS,
+                        help='HTTP backend, "stub" runs the fake API '
+                             'in process')
+    parser.add_argument('--retries', type=int, default=0,
+                        help='retry requests failing with transient errors '
+                             'up to this many times')
+    args = parser.parse_args(argv)
+
+    server = None
+    api_host = args.api_host
+    fake_options = dict(latency=args.latency, error_rate=args.error_rate,
+                        throttle_rate=args.throttle_rate,
+                        polls_to_complete=args.polls_to_complete)
+    if args.backend == backends.STUB:
+        backend = backends.StubBackend(
+            FakeSkyscannerAPI(**fake_options).handle)
+        api_host = api_host or 'http://stub'
+    else:
+        backend = backends.create(args.backend)
+        if api_host is None:
+            server = FakeServer(**fake_options).start()
+            api_host = server.url
+    limiter = AdaptiveConcurrency() if args.adaptive else None
+    retry_policy = RetryPolicy(tries=args.retries + 1) \
+        if args.retries else None
+    try:
+        report = LoadTest(api_host, searches=args.searches,
+                          concurrency=args.concurrency,
+                          verticals=args.verticals.split(','),
+                          api_key=args.api_key,
+                          service_options={'limiter': limiter,
+                                           'backend': backend,
+                                           'retry_policy': retry_policy}
+                          ).run()
+    finally:
+        backend.close()
+        if server is not None:
+            server.stop()
+    print(report)
+    if limiter is not None:
+        print('Adaptive concurrency: {0}'.format(limiter.stats()))
+    if retry_policy is not None:
+        print('Retries: {0}, retry budget exhausted: {1}'.format(
+            retry_policy.retries, retry_policy.exhausted))
+    return report
+
+
+if __name__ == '__main__':
+    main()
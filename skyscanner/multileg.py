@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Combining the results of the one-way searches of a multi-city
+or open-jaw trip, see 'Flights.search_legs'.
+"""
+
+import heapq
+from collections import namedtuple
+
+# Cheapest combination of itineraries of the legs completed so far:
+# total price and one itinerary per leg, None for legs still running.
+Combination = namedtuple('Combination', 'price itineraries')
+
+# Update of a multi-leg search, when one of its legs completes:
+# position of the leg, its response, the cheapest combinations
+# of the completed legs and whether all the legs are completed.
+LegUpdate = namedtuple('LegUpdate', 'leg response combinations complete')
+
+
+def price(itinerary):
+    """
+    Cheapest price of the pricing options of an itinerary,
+    None if it has none.
+    """
+    prices = [o['Price'] for o in itinerary.get('PricingOptions') or ()
+              if o.get('Price') is not None]
+    return min(prices) if prices else None
+
+
+def cheapest_combinations(prices, k):
+    """
+    Index tuples of the 'k' cheapest combinations of one price per list,
+    cheapest first, with their total: [(total, (index, ...))].
+
+    Combinations are visited in the order of their total, from
+    the cheapest items of every list, so that only O(k * len(prices))
+    combinations are looked at.
+
+    :param prices - lists of prices, sorted ascending
+    :param k - number of combinations
+    """
+    if k <= 0 or not prices or not all(prices):
+        return []
+    start = (0,) * len(prices)
+    heap = [(sum(p[0] for p in prices), start)]
+    seen = set([start])
+    result = []
+    while heap and len(result) < k:
+        total, indices = heapq.heappop(heap)
+        result.append((total, indices))
+        for n, index in enumerate(indices):
+            if index + 1 < len(prices[n]):
+                following = indices[:n] + (index + 1,) + indices[n + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (
+                        sum(p[i] for p, i in zip(prices, following)),
+                        following))
+    return result
+
+
+def combine(legs, k):
+    """
+    The 'k' cheapest Combinations of the itineraries of the legs.
+
+    :param legs - itineraries of every leg, None for the legs
+                  whose results are not known yet, which are left out
+    :param k - number of combinations
+    """
+    known = [n for n, itineraries in enumerate(legs)
+             if itineraries is not None]
+    priced = []
+    for n in known:
+        items = [(price(i), i) for i in legs[n]]
+        priced.append(sorted([item for item in items if item[0] is not None],
+                             key=lambda item: item[0]))
+    combinations = []
+    for total, indices in cheapest_combinations(
+            [[p for p, i in items] for items in priced], k):
+        itineraries = [None] * len(legs)
+        for position, index in enumerate(indices):
+            itineraries[known[position]] = priced[position][index][1]
+        combinations.append(Combination(total, tuple(itineraries)))
+    return combinations
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Per-day price calendars of a route, merged from browse dates responses,
+see 'FlightsCache.get_price_calendar'.
+"""
+
+import json
+from datetime import date, datetime, timedelta
+
+
+def to_date(value, last=False):
+    """
+    datetime.date of a date, 'YYYY-MM-DD' or 'YYYY-MM' value,
+    a month being its first day, or its last one with 'last'.
+    """
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    value = str(value)
+    if len(value) == 7:
+        first = datetime.strptime(value, '%Y-%m').date()
+        if not last:
+            return first
+        next_month = (first.replace(day=28) + timedelta(days=4)).replace(
+            day=1)
+        return next_month - timedelta(days=1)
+    return datetime.strptime(value[:10], '%Y-%m-%d').date()
+
+
+def window(start, end=None, days=0):
+    """
+    (first day, last day) of a date window, see 'PriceCalendar'.
+    """
+    first = to_date(start) - timedelta(days=days)
+    last = to_date(start if end is None else end, last=True) + \
+        timedelta(days=days)
+    if last < first:
+        raise ValueError('Window ends before it starts: %s - %s'
+                         % (first, last))
+    return first, last
+
+
+def months(first, last):
+    """
+    'YYYY-MM' partial dates of the months of the window, the minimum set
+    of browse dates requests covering it.
+    """
+    result = []
+    month = first.replace(day=1)
+    while month <= last:
+        result.append(month.strftime('%Y-%m'))
+        month = (month.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return result
+
+
+class PriceCalendar(object):
+
+    """
+    Dense per-day table of the cheapest quotes of a route
+    over a date window.
+
+    Quotes of the merged responses are deduplicated on their legs,
+    keeping the cheapest, and the ones departing out of the window
+    are dropped.
+
+    Usage:
+
+        calendar = flights_cache_service.get_price_calendar(
+            '2017-05', market='UK', currency='GBP', locale='en-GB',
+            originplace='SIN-sky', destinationplace='KUL-sky')
+        for day, price in calendar:
+            print(day, price)
+        day, price = calendar.cheapest()
+    """
+
+    def __init__(self, first, last):
+        """
+        :param first - first day of the window, datetime.date
+        :param last - last day of the window, datetime.date
+        """
+        self.first = first
+        self.last = last
+        self.days = [first + timedelta(days=n)
+                     for n in range((last - first).days + 1)]
+        self.quotes = {}
+        self.places = {}
+        self.carriers = {}
+        self.failed = []
+
+    def add_response(self, parsed):
+        """
+        Merge the parsed JSON response of a browse dates
+        (or browse quotes) request.
+        """
+        for place in parsed.get('Places') or ():
+            self.places.setdefault(place.get('PlaceId'), place)
+        for carrier in parsed.get('Carriers') or ():
+            self.carriers.setdefault(carrier.get('CarrierId'), carrier)
+        for quote in parsed.get('Quotes') or ():
+            departure = (quote.get('OutboundLeg') or {}).get('DepartureDate')
+            price = quote.get('MinPrice')
+            if not departure or price is None:
+                continue
+            day = to_date(departure)
+            if not self.first <= day <= self.last:
+                continue
+            key = json.dumps([quote.get('OutboundLeg'),
+                              quote.get('InboundLeg'),
+                              quote.get('Direct')], sort_keys=True)
+            known = self.quotes.get(key)
+            if known is None or price < known['MinPrice']:
+                self.quotes[key] = quote
+
+    def table(self):
+        """
+        [(day, cheapest quote or None)] for every day of the window.
+        """
+        cheapest = {}
+        for quote in self.quotes.values():
+            day = to_date(quote['OutboundLeg']['DepartureDate'])
+            known = cheapest.get(day)
+            if known is None or quote['MinPrice'] < known['MinPrice']:
+                cheapest[day] = quote
+        return [(day, cheapest.get(day)) for day in self.days]
+
+    def prices(self):
+        """
+        [(day, cheapest price or None)] for every day of the window.
+        """
+        return [(day, quote and quote['MinPrice'])
+                for day, quote in self.table()]
+
+    def cheapest(self):
+        """
+        (day, price) of the cheapest day, None if there are no quotes.
+        """
+        priced = [(price, day) for day, price in self.prices()
+                  if price is not None]
+        if not priced:
+            return None
+        price, day = min(priced)
+        return day, price
+
+    def __iter__(self):
+        return iter(self.prices())
+
+    def __len__(self):
+        return len(self.days)
@@ -0,0 +1,162 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import threading
+
+import requests
+
+_NOT_PARSED = object()
+
+
+class LazyResponse(requests.Response):
+
+    """
+    Response whose content is parsed on first access to its 'parsed'
+    attribute, rather than when it is received, and only once.
+
+    Responses whose content is never read, e.g. when only their status
+    or headers are, are not decoded at all. An invalid content raises
+    ValueError when 'parsed' is first read.
+
+    Usage:
+
+        flights_service = Flights('<Your API Key>', lazy=True)
+        resp = flights_service.get_markets('en-GB')
+        resp.status_code    # nothing parsed yet
+        resp.section('Countries')
+    """
+
+    def __init__(self, response, parse):
+        """
+        :param response - requests.Response to wrap, its attributes are
+                          taken over
+        :param parse - function of the response returning
+                       its parsed content
+        """
+        self.__dict__.update(response.__dict__)
+        self._parse = parse
+        self._parsed = _NOT_PARSED
+        self._parse_lock = threading.Lock()
+        self._on_parsed = []
+
+    @property
+    def parsed(self):
+        if self._parsed is _NOT_PARSED:
+            with self._parse_lock:
+                if self._parsed is _NOT_PARSED:
+                    try:
+                        self._parsed = self._parse(self)
+                    except Exception:
+                        # The parse function may have set 'parsed' already.
+                        self._parsed = _NOT_PARSED
+                        raise
+                    callbacks, self._on_parsed = self._on_parsed, []
+                    for callback in callbacks:
+                        callback(self._parsed)
+        return self._parsed
+
+    @parsed.setter
+    def parsed(self, value):
+        self._parsed = value
+
+    @property
+    def is_parsed(self):
+        """
+        Whether the content has been parsed already.
+        """
+        return self._parsed is not _NOT_PARSED
+
+    def when_parsed(self, callback):
+        """
+        Call 'callback' with the parsed content once the response
+        is parsed, right away if it is already, without parsing it.
+
+        :param callback - function of the parsed content
+        """
+        with self._parse_lock:
+            if self._parsed is _NOT_PARSED:
+                self._on_parsed.append(callback)
+                return
+        callback(self._parsed)
+
+    @property
+    def status(self):
+        """
+        'Status' (or 'status') of a live pricing response, None if none.
+        """
+        parsed = self.parsed
+        if parsed is None:
+            return None
+        if isinstance(parsed, dict):
+            return parsed.get('Status', parsed.get('status'))
+        element = parsed.find('./Status')
+        return None if element is None else element.text
+
+    def section(self, name):
+        """
+        Items of a list section of the response, e.g. 'Itineraries':
+        dicts of a JSON response, elements of an XML one.
+        Empty when the response has no such section.
+        """
+        parsed = self.parsed
+        if parsed is None:
+            return []
+        if isinstance(parsed, dict):
+            return parsed.get(name) or []
+        return parsed.findall('./%s/*' % name)
+
+    @property
+    def itineraries(self):
+        return self.section('Itineraries')
+
+    @property
+    def legs(self):
+        return self.section('Legs')
+
+    @property
+    def segments(self):
+        return self.section('Segments')
+
+    @property
+    def carriers(self):
+        return self.section('Carriers')
+
+    @property
+    def agents(self):
+        return self.section('Agents')
+
+    @property
+    def places(self):
+        return self.section('Places')
+
+    @property
+    def quotes(self):
+        return self.section('Quotes')
+
+    def __getstate__(self):
+        # Parsed before pickling, the parse function may not be picklable.
+        state = requests.Response.__getstate__(self)
+        state['parsed'] = self.parsed
+        return state
+
+    def __setstate__(self, state):
+        parsed = state.pop('parsed', None)
+        requests.Response.__setstate__(self, state)
+        self._parse = None
+        self._parsed = parsed
+        self._parse_lock = threading.Lock()
+        self._on_parsed = []
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import random
+import threading
+import time
+
+import requests
+
+try:
+    from urllib3.exceptions import NewConnectionError
+except ImportError:
+    from requests.packages.urllib3.exceptions import NewConnectionError
+
+
+class RetryBudget(object):
+
+    """
+    Limits retries to a share of the requests, so that retries
+    can not multiply the load on an API that is already failing.
+
+    Every request adds 'ratio' of a retry to the budget, up to
+    'max_retries', and every retry takes one. 'min_per_second' retries
+    per second are allowed anyway, for services sending few requests.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1.0, max_retries=10,
+                 clock=time.time):
+        """
+        :param ratio - retries allowed per request
+        :param min_per_second - retries allowed per second
+                                whatever the number of requests
+        :param max_retries - largest number of retries saved up
+        :param clock - function returning current time in seconds
+        """
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_retries = max_retries
+        self.clock = clock
+        self._balance = 0.0
+        self._reserve = float(min_per_second)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def deposit(self):
+        """
+        Record a request.
+        """
+        with self._lock:
+            self._balance = min(float(self.max_retries),
+                                self._balance + self.ratio)
+
+    def withdraw(self):
+        """
+        Take a retry from the budget, returns False if there is none left.
+        """
+        with self._lock:
+            now = self.clock()
+            refill = (now - self._updated) * self.min_per_second
+            self._reserve = min(float(self.min_per_second),
+                                self._reserve + refill)
+            self._updated = now
+            if self._balance >= 1:
+                self._balance -= 1
+                return True
+            if self._reserve >= 1:
+                self._reserve -= 1
+                return True
+            return False
+
+
+class RetryPolicy(object):
+
+    """
+    Which failed requests are retried, and after how long.
+
+    Idempotent requests (polls, browse and reference GETs) are retried
+    on connection errors, timeouts and the 'statuses' responses.
+    Requests that are not, the ones creating sessions (the flights POST,
+    the hotels and car hire GETs) and the booking PUT, are only retried
+    when the API did not get them: when the connection could not be
+    established, or on the 'safe_statuses' responses.
+
+    Retries are delayed by exponential backoff with full jitter, or by
+    the response's 'Retry-After' header, and limited by a RetryBudget
+    shared by all the services using the policy.
+
+    Usage:
+
+        policy = RetryPolicy(tries=3)
+        flights_service = Flights('<Your API Key>', retry_policy=policy)
+    """
+
+    IDEMPOTENT_METHODS = ('get', 'head', 'options')
+    # Endpoint families whose requests create something on the API side.
+    UNSAFE_FAMILIES = ('session', 'booking')
+
+    def __init__(self, tries=3, statuses=(500, 502, 503, 504),
+                 exceptions=(requests.ConnectionError, requests.Timeout),
+                 safe_statuses=(502, 503), backoff=0.5, max_backoff=10,
+                 budget=None, idempotent_methods=None, rnd=None):
+        """
+        :param tries - number of attempts of a request, retries included
+        :param statuses - response statuses idempotent requests
+                          are retried on
+        :param exceptions - exceptions idempotent requests are retried on
+        :param safe_statuses - response statuses all requests are retried
+                               on, meaning the request was not processed,
+                               e.g. from a gateway
+        :param backoff - delay before the first retry, in seconds,
+                         doubled for every further one
+        :param max_backoff - longest delay, in seconds
+        :param budget - RetryBudget, default is RetryBudget()
+        :param idempotent_methods - methods of the idempotent requests,
+                                    see IDEMPOTENT_METHODS
+        :param rnd - random.Random for the jitter
+        """
+        self.tries = tries
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.safe_statuses = frozenset(safe_statuses)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.budget = RetryBudget() if budget is None else budget
+        self.idempotent_methods = frozenset(
+            self.IDEMPOTENT_METHODS if idempotent_methods is None
+            else idempotent_methods)
+        self.random = rnd or random.Random()
+        self.retries = 0
+        self.exhausted = 0
+        self._lock = threading.Lock()
+
+    def delay(self, method, attempt, error=None, response=None,
+              family='default'):
+        """
+        Seconds to wait before retrying a request,
+        None if it should not be retried.
+
+        :param method - request method, lower case
+        :param attempt - number of the attempt that failed, from 0
+        :param error - exception raised by the attempt
+        :param response - response to the attempt
+        :param family - endpoint family of the request,
+                        see Transport.TIMEOUTS
+        """
+        if attempt == 0:
+            self.budget.deposit()
+        if attempt + 1 >= self.tries or \
+                not self.retryable(method, error, response, family):
+            return None
+        if not self.budget.withdraw():
+            with self._lock:
+                self.exhausted += 1
+            return None
+        retry_after = _retry_after(response)
+        with self._lock:
+            self.retries += 1
+            if retry_after is not None:
+                return min(retry_after, self.max_backoff)
+            return self.random.uniform(
+                0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    def retryable(self, method, error=None, response=None,
+                  family='default'):
+        """
+        Whether a failed request can be retried, budget aside.
+        """
+        idempotent = method in self.idempotent_methods and \
+            family not in self.UNSAFE_FAMILIES
+        if error is not None:
+            if not isinstance(error, self.exceptions):
+                return False
+            return idempotent or _not_sent(error)
+        if response is None:
+            return False
+        if response.status_code in self.safe_statuses:
+            return True
+        return idempotent and response.status_code in self.statuses
+
+
+def _not_sent(error):
+    # Whether the request failed before reaching the API.
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+def _retry_after(response):
+    value = response.headers.get('Retry-After') \
+        if response is not None else None
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
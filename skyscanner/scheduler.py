@@ -0,0 +1,335 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+import itertools
+import threading
+import time
+from collections import defaultdict
+
+INTERACTIVE, BATCH = 'interactive', 'batch'
+
+
+class RequestScheduler(object):
+
+    """
+    Shares the request budget of an API key between priority classes.
+
+    Requests wait for a slot, limited by the number of requests in flight
+    and the number of requests per second, and the slots are granted
+    by weighted fair queuing: while classes compete, each of them gets
+    a share of the requests proportional to its weight.
+
+    Polls of the preemptible classes are not granted a slot at all
+    while a request of another class is waiting, so that a background
+    sweep polling many sessions never delays an interactive search.
+
+    Usage:
+
+        scheduler = RequestScheduler(concurrency=8, rate=10)
+        flights_service = Flights('<Your API Key>', scheduler=scheduler)
+        sweep_service = Flights('<Your API Key>', scheduler=scheduler,
+                                priority='batch')
+    """
+
+    WEIGHTS = {INTERACTIVE: 8, BATCH: 1}
+
+    def __init__(self, concurrency=None, rate=None, weights=None,
+                 preemptible=(BATCH,), clock=time.time):
+        """
+        :param concurrency - maximum number of requests in flight,
+                             None for no limit
+        :param rate - maximum number of requests per second,
+                      None for no limit
+        :param weights - {priority class: weight}, see WEIGHTS
+        :param preemptible - priority classes whose polls wait
+                             while requests of other classes are waiting
+        :param clock - function returning current time in seconds
+        """
+        self.concurrency = concurrency
+        self.rate = rate
+        self.weights = dict(self.WEIGHTS)
+        self.weights.update(weights or {})
+        self.preemptible = frozenset(preemptible)
+        self.clock = clock
+        self.granted = defaultdict(int)
+        self.in_flight = 0
+        self._virtual_time = 0.0
+        self._finish = defaultdict(float)
+        self._queue = []
+        self._sequence = itertools.count()
+        self._tokens = float(max(1, rate or 1))
+        self._updated = clock()
+        self._lock = threading.Condition(threading.Lock())
+
+    def acquire(self, priority=INTERACTIVE, poll=False, context=None):
+        """
+        Wait for a request slot.
+
+        :param priority - priority class of the request
+        :param poll - whether the request is a poll,
+                      polls of the preemptible classes can be delayed
+        :param context - skyscanner.skyscanner.SearchContext
+                         of the request, waiting is given up when its
+                         budget is spent or it is cancelled
+        """
+        if priority not in self.weights:
+            raise ValueError('Unknown priority class: %s' % priority)
+        with self._lock:
+            finish = max(self._virtual_time, self._finish[priority]) + \
+                1.0 / self.weights[priority]
+            self._finish[priority] = finish
+            ticket = [finish, next(self._sequence), priority,
+                      poll and priority in self.preemptible, False]
+            self._queue.append(ticket)
+            try:
+                while True:
+                    self._dispatch()
+                    if ticket[4]:
+                        return
+                    if context is not None:
+                        # Wakes up regularly to notice cancellation.
+                        context.timeout(None)
+                    self._lock.wait(self._next_wake_up(context))
+            except BaseException:
+                if ticket[4]:
+                    self._release()
+                else:
+                    self._queue.remove(ticket)
+                raise
+
+    def release(self):
+        """
+        Free a slot acquired with 'acquire'.
+        """
+        with self._lock:
+            self._release()
+
+    def slot(self, priority=INTERACTIVE, poll=False, context=None):
+        """
+        Context manager acquiring and releasing a slot,
+        see 'acquire' for the params.
+        """
+        return _Slot(self, priority, poll, context)
+
+    def waiting(self, priority=None):
+        """
+        Number of requests waiting for a slot, of a class or overall.
+        """
+        with self._lock:
+            return sum(1 for ticket in self._queue
+                       if priority in (None, ticket[2]))
+
+    def _release(self):
+        # Called with the lock held.
+        self.in_flight -= 1
+        self._dispatch()
+        self._lock.notify_all()
+
+    def _dispatch(self):
+        # Called with the lock held.
+        # Grants slots to the waiting requests with the earliest finish
+        # tags, skipping preemptible polls while other requests wait.
+        granted = False
+        while self._queue and self._available():
+            urgent = [t for t in self._queue if not t[3]]
+            ticket = min(urgent or self._queue)
+            self._queue.remove(ticket)
+            ticket[4] = True
+            weight = self.weights[ticket[2]]
+            self._virtual_time = max(self._virtual_time,
+                                     ticket[0] - 1.0 / weight)
+            self.in_flight += 1
+            self.granted[ticket[2]] += 1
+            if self.rate:
+                self._tokens -= 1
+            granted = True
+        if granted:
+            self._lock.notify_all()
+
+    def _available(self):
+        if self.concurrency is not None and \
+                self.in_flight >= self.concurrency:
+            return False
+        if self.rate:
+            now = self.clock()
+            refill = (now - self._updated) * self.rate
+            self._tokens = min(float(max(1, self.rate)),
+                               self._tokens + refill)
+            self._updated = now
+            return self._tokens >= 1
+        return True
+
+    def _next_wake_up(self, context):
+        delays = []
+        if self.rate and self._tokens < 1:
+            delays.append((1 - self._tokens) / self.rate)
+        if context is not None:
+            delays.append(0.1)
+            remaining = context.remaining()
+            if remaining is not None:
+                delays.append(remaining)
+        return min(delays) if delays else None
+
+
+class _Slot(object):
+
+    def __init__(self, scheduler, priority, poll, context):
+        self.scheduler = scheduler
+        self.args = (priority, poll, context)
+
+    def __enter__(self):
+        self.scheduler.acquire(*self.args)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.scheduler.release()
+
+
+class AdaptiveConcurrency(object):
+
+    """
+    Limit of requests in flight adapted to the API's feedback (AIMD).
+
+    While responses are healthy the limit grows additively, by about one
+    request per round of 'limit' responses. It is cut multiplicatively
+    on a 429 'Too many requests' response, a failed request or a latency
+    spike, at most once per round: responses to requests sent before
+    the last cut do not cut it again.
+
+    The current limit is exposed as the 'limit' metric.
+
+    Usage:
+
+        limiter = AdaptiveConcurrency(initial=4, maximum=32)
+        sweep_service = Flights('<Your API Key>', limiter=limiter)
+        ...
+        limiter.limit
+    """
+
+    def __init__(self, initial=4, minimum=1, maximum=64, increase=1.0,
+                 decrease=0.5, latency_tolerance=2.0, warmup=10,
+                 clock=time.time):
+        """
+        :param initial - initial limit
+        :param minimum - lowest limit
+        :param maximum - highest limit
+        :param increase - limit increase per round of healthy responses
+        :param decrease - factor the limit is multiplied by when cut
+        :param latency_tolerance - latency spike threshold, relative to
+                                   the average latency of healthy responses,
+                                   None to ignore latency
+        :param warmup - number of healthy responses the average latency
+                        is taken over before spikes are detected
+        :param clock - function returning current time in seconds
+        """
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.warmup = warmup
+        self.clock = clock
+        self.in_flight = 0
+        self.throttled = 0
+        self.spikes = 0
+        self.failures = 0
+        self.cuts = 0
+        self.average_latency = None
+        self._limit = float(min(max(initial, minimum), maximum))
+        self._samples = 0
+        self._last_cut = clock()
+        self._lock = threading.Condition(threading.Lock())
+
+    @property
+    def limit(self):
+        """
+        Current number of requests allowed in flight.
+        """
+        return int(self._limit)
+
+    def acquire(self, context=None):
+        """
+        Wait until a request can be sent.
+        Returns the time it is sent at, to be passed to 'release'.
+
+        :param context - skyscanner.skyscanner.SearchContext
+                         of the request, waiting is given up when its
+                         budget is spent or it is cancelled
+        """
+        with self._lock:
+            while self.in_flight >= int(self._limit):
+                if context is not None:
+                    context.timeout(None)
+                    self._lock.wait(0.1)
+                else:
+                    self._lock.wait()
+            self.in_flight += 1
+            return self.clock()
+
+    def release(self, started, status_code=None, failed=False):
+        """
+        Record the outcome of a request sent after 'acquire'.
+
+        :param started - value returned by 'acquire'
+        :param status_code - response status code,
+                             None when the request was not sent
+        :param failed - whether the request failed without a response,
+                        e.g. timed out
+        """
+        now = self.clock()
+        latency = now - started
+        with self._lock:
+            self.in_flight -= 1
+            congested = True
+            if status_code is None and not failed:
+                congested = False
+            elif failed:
+                self.failures += 1
+            elif status_code == 429:
+                self.throttled += 1
+            elif self._spike(latency):
+                self.spikes += 1
+            else:
+                congested = False
+                self._sample(latency)
+                step = self.increase / max(self._limit, 1.0)
+                self._limit = min(float(self.maximum), self._limit + step)
+            if congested and started >= self._last_cut:
+                self._limit = max(float(self.minimum),
+                                  self._limit * self.decrease)
+                self._last_cut = now
+                self.cuts += 1
+            self._lock.notify_all()
+
+    def stats(self):
+        with self._lock:
+            return {'limit': int(self._limit), 'in_flight': self.in_flight,
+                    'throttled': self.throttled, 'spikes': self.spikes,
+                    'failures': self.failures, 'cuts': self.cuts}
+
+    def _spike(self, latency):
+        return self.latency_tolerance is not None and \
+            self._samples >= self.warmup and \
+            latency > self.average_latency * self.latency_tolerance
+
+    def _sample(self, latency):
+        self._samples += 1
+        if self.average_latency is None:
+            self.average_latency = latency
+        else:
+            weight = max(0.1, 1.0 / self._samples)
+            self.average_latency += weight * (latency - self.average_latency)
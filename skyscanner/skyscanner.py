@@ -20,17 +20,31 @@ either express or implied. See the License for the specific
 language governing permissions and limitations under the License.
 """
 
+import itertools
+import json
 import logging
 import sys
+import threading
 import time
 
 import requests
 
+from . import multileg, pricecalendar
+from .backends import RequestsBackend
+from .responses import LazyResponse
+from .sniffing import sniff_in_progress, sniff_status
+from .streaming import IncrementalParser, top_itineraries
+
 try:
     import lxml.etree as etree
 except ImportError:
     import xml.etree.ElementTree as etree
 
+try:
+    from queue import Empty, Queue
+except ImportError:
+    from Queue import Empty, Queue
+
 
 def configure_logger(log_level=logging.WARN):
     logger = logging.getLogger(__name__)
@@ -50,6 +64,21 @@ log = configure_logger()
 STRICT, GRACEFUL, IGNORE = 'strict', 'graceful', 'ignore'
 
 
+def parse_content(content, response_format, postprocess=None):
+    """
+    Parse raw response content and apply the optional post-processing.
+
+    Only takes picklable arguments, so that it can be run in a worker
+    process, see 'parse_executor' parameter of the Transport.
+    """
+    parsed = etree.fromstring(content) if response_format == 'xml' \
+        else json.loads(content.decode('utf-8')
+                        if isinstance(content, bytes) else content)
+    if postprocess is not None:
+        parsed = postprocess(parsed)
+    return parsed
+
+
 class ExceededRetries(Exception):
 
     """Is thrown when allowed number of polls were
@@ -69,10 +98,228 @@ class MissingParameter(KeyError):
     pass
 
 
+class BudgetExceeded(ExceededRetries):
+
+    """Is thrown when the time budget of a search is spent
+    before the search is complete."""
+    pass
+
+
+class SearchCancelled(Exception):
+
+    """Is thrown when a search is cancelled before it is complete."""
+    pass
+
+
+class SearchTimeout(Exception):
+
+    """Is thrown when a search is still running after the timeout
+    of waiting for its result."""
+    pass
+
+
+class SearchContext(object):
+
+    """
+    State shared by all the requests of a single search:
+    the time budget the whole search has to fit in, its scheduler
+    priority, its cancellation and the connection pool its requests
+    are sent through.
+
+    Every request of the search is given the remaining time as its
+    timeout and the delays between the polls are cut short to fit it.
+    NOTE that 'requests' applies the read timeout to every socket read,
+    not to the whole response, so a request receiving data slowly can
+    still overrun the budget.
+
+    A search can be cancelled from any thread: the delays between
+    the polls are interrupted, no further requests are sent, the response
+    of an outstanding request is discarded and the pooled connections
+    of the search, if its backend has them, are closed.
+
+    Usage:
+
+        context = SearchContext(budget=10)
+        poll_url = flights_service.create_session(context=context, **params)
+        result = flights_service.poll_session(poll_url, context=context)
+        ...
+        context.cancel()  # e.g. from another thread
+    """
+
+    def __init__(self, budget=None, priority=None, clock=time.time):
+        """
+        :param budget - seconds the search has to complete in,
+                        None for no limit
+        :param priority - scheduler priority class of the search,
+                          default is the priority of the service
+        :param clock - function returning current time in seconds
+        """
+        self.budget = budget
+        self.priority = priority
+        self.clock = clock
+        self.deadline = None if budget is None else clock() + budget
+        self._pools = {}
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        """
+        Seconds left of the budget, None when there is no budget.
+        """
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - self.clock())
+
+    @property
+    def expired(self):
+        return self.remaining() == 0
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Cancel the search and close its connections.
+        """
+        self._cancelled.set()
+        self.close()
+
+    def check(self):
+        """
+        Raise SearchCancelled if the search is cancelled.
+        """
+        if self._cancelled.is_set():
+            raise SearchCancelled('Search is cancelled.')
+
+    def timeout(self, timeout):
+        """
+        Timeout of the next request, cut short to fit the remaining budget.
+
+        :param timeout - requested timeout, seconds or a (connect, read)
+                         tuple, None for no timeout
+        """
+        self.check()
+        remaining = self.remaining()
+        if remaining is None:
+            return timeout
+        if remaining == 0:
+            raise BudgetExceeded(
+                'Search time budget of {0}s is spent.'.format(self.budget))
+        if isinstance(timeout, tuple):
+            return tuple(remaining if t is None else min(t, remaining)
+                         for t in timeout)
+        return remaining if timeout is None else min(timeout, remaining)
+
+    def sleep(self, seconds):
+        """
+        Sleep, but not past the end of the budget
+        and not after the search is cancelled.
+        """
+        remaining = self.remaining()
+        if remaining is not None:
+            seconds = min(seconds, remaining)
+        if seconds > 0:
+            self._cancelled.wait(seconds)
+        self.check()
+
+    def pool(self, backend):
+        """
+        Connection pool of the search for a backend and the calling thread,
+        see 'skyscanner.backends.Backend.pool'. Threads of a search,
+        e.g. of 'get_booking_details', get their own pools, as pools like
+        'requests.Session' are not thread-safe.
+        """
+        key = (backend, threading.current_thread().ident)
+        with self._lock:
+            if key not in self._pools:
+                self._pools[key] = backend.pool()
+            return self._pools[key]
+
+    def close(self):
+        """
+        Close the pooled connections of the search.
+        """
+        with self._lock:
+            pools, self._pools = list(self._pools.values()), {}
+        for pool in pools:
+            if pool is not None:
+                pool.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class SearchHandle(object):
+
+    """
+    Search running in a background thread, see 'Transport.start_search'.
+    """
+
+    def __init__(self, search, context):
+        """
+        :param search - function performing the search,
+                        called with the context
+        :param context - SearchContext of the search
+        """
+        self.context = context
+        self._result = self._error = None
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(search,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def cancel(self):
+        """
+        Cancel the search. Returns promptly, without waiting for
+        an outstanding request.
+        """
+        self.context.cancel()
+
+    @property
+    def cancelled(self):
+        return self.context.cancelled
+
+    def done(self):
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """
+        Wait for the search and return its result, or raise its error.
+        Raises SearchTimeout if the search is still running
+        after 'timeout' seconds.
+        """
+        if not self._done.wait(timeout):
+            raise SearchTimeout(
+                'Search still running after %s seconds.' % timeout)
+        if self._error is not None:
+            raise self._error
+        return self._result
+
+    def _run(self, search):
+        try:
+            self._result = search(self.context)
+        except Exception as e:
+            self._error = e
+        finally:
+            self.context.close()
+            self._done.set()
+
+
 class Transport(object):
 
     """
     Parent class for initialization
+
+    Services are thread-safe: a single instance can be shared by all
+    the threads of a process. Request parameters are never modified,
+    every request has its own response object, searches use their own
+    connection pools per thread, and the shared helpers (cache, intern
+    table, history, scheduler, limiter, key pool, retry policy) lock
+    their state.
     """
     API_HOST = 'https://partners.api.skyscanner.net'
     MARKET_SERVICE_URL = '{api_host}/apiservices/reference/v1.0/countries'\
@@ -80,15 +327,79 @@ class Transport(object):
     LOCATION_AUTOSUGGEST_URL = '{api_host}/apiservices/autosuggest/v1.0'\
         .format(api_host=API_HOST)
     LOCATION_AUTOSUGGEST_PARAMS = ('market', 'currency', 'locale')
+    # Request timeouts, in seconds or (connect, read) tuples, by endpoint
+    # family: 'reference' (markets and autosuggest), 'browse', 'session',
+    # 'poll' and 'booking'. Families not listed use the 'default' one.
+    TIMEOUTS = {'default': (3.05, 30)}
+    # Size of the chunks of the responses parsed as they arrive, in bytes.
+    STREAM_CHUNK_SIZE = 64 * 1024
+    COMPLETE_STATUSES = ('UpdatesComplete', True, 'COMPLETE')
     _SUPPORTED_FORMATS = ('json', 'xml')
 
-    def __init__(self, api_key, response_format='json'):
+    def __init__(self, api_key=None, response_format='json',
+                 parse_executor=None, postprocess=None, api_host=None,
+                 cache=None, intern_table=None, history=None, timeouts=None,
+                 scheduler=None, priority='interactive', limiter=None,
+                 key_pool=None, backend=None, retry_policy=None,
+                 lazy=False):
         """
-        :param api_key - The API key to identify ourselves
+        :param api_key - The API key to identify ourselves,
+                         can be omitted when 'key_pool' is given
         :param response_format - specify preferred format of the response,
                                  default is 'json'
+        :param parse_executor - optional executor, e.g.
+                                concurrent.futures.ProcessPoolExecutor,
+                                to parse response content in,
+                                so that parsing of large responses
+                                does not hold the GIL of the calling process
+        :param postprocess - optional function applied to every parsed
+                             response, its result becomes 'parsed'
+                             attribute of the response. Must be picklable
+                             when used with 'parse_executor' and keep the
+                             status fields checked by 'is_poll_complete'.
+                             NOTE that lxml trees are not picklable,
+                             so XML responses parsed in a process pool
+                             must be post-processed into plain objects.
+        :param api_host - optional API host to use instead of API_HOST,
+                          e.g. a local skyscanner.fakeapi.FakeServer
+        :param cache - optional skyscanner.cache.ResponseCache
+                       for the markets, autosuggest
+                       and browse cache responses
+        :param intern_table - optional skyscanner.interning.InternTable,
+                              can be shared between services,
+                              to deduplicate places, carriers and agents
+                              of parsed JSON responses
+        :param history - optional skyscanner.history.PriceHistory
+                         to append browse quotes and completed
+                         live pricing results of JSON responses to
+        :param timeouts - request timeouts by endpoint family,
+                          overriding the ones of TIMEOUTS, e.g.
+                          {'poll': (3.05, 10), 'browse': 5},
+                          None disables the timeout of a family
+        :param scheduler - optional skyscanner.scheduler.RequestScheduler,
+                           shared between services using the same API key,
+                           to wait for a request slot in
+        :param priority - priority class of the requests in the scheduler,
+                          e.g. 'interactive' or 'batch', can be
+                          overridden per search by its SearchContext
+        :param limiter - optional skyscanner.scheduler.AdaptiveConcurrency
+                         limiting the requests in flight, can be shared
+                         between services
+        :param key_pool - optional skyscanner.keypool.ApiKeyPool
+                          to spread the requests across several API keys,
+                          can be shared between services
+        :param backend - skyscanner.backends.Backend to send the requests
+                         through, default is a RequestsBackend
+        :param retry_policy - optional skyscanner.retry.RetryPolicy
+                              for the requests failing with transient
+                              network errors or 5xx responses,
+                              can be shared between services
+        :param lazy - whether responses are parsed on first access
+                      to their 'parsed' attribute instead of when they
+                      are received, see skyscanner.responses.LazyResponse.
+                      Invalid contents then raise ValueError on access.
         """
-        if not api_key:
+        if not api_key and key_pool is None:
             raise ValueError('API key must be specified.')
         if response_format.lower() not in self._SUPPORTED_FORMATS:
             raise ValueError(
@@ -97,8 +408,30 @@ class Transport(object):
                     ', '.join(self._SUPPORTED_FORMATS)
                 )
             )
-        self.api_key = api_key
+        self.api_key = api_key or key_pool.keys[0]
+        self.key_pool = key_pool
+        self.backend = RequestsBackend() if backend is None else backend
+        self.retry_policy = retry_policy
         self.response_format = response_format.lower()
+        if api_host:
+            self._use_api_host(api_host.rstrip('/'))
+        if parse_executor is not None and postprocess is None and \
+                self.response_format == 'xml':
+            raise ValueError('XML responses parsed in parse_executor '
+                             'require a postprocess function returning '
+                             'picklable objects.')
+        self.parse_executor = parse_executor
+        self.cache = cache
+        self.intern_table = intern_table
+        self.history = history
+        self.postprocess = postprocess
+        self.timeouts = dict(self.TIMEOUTS)
+        self.timeouts.update(timeouts or {})
+        self.scheduler = scheduler
+        self.priority = priority
+        self.limiter = limiter
+        self.lazy = lazy
+        self._plans = {}
 
     def get_additional_params(self, **params):
         """
@@ -132,20 +465,51 @@ class Transport(object):
 
         return additional_params
 
-    def get_result(self, errors=GRACEFUL, **params):
+    def get_result(self, errors=GRACEFUL, budget=None, context=None,
+                   **params):
         """
         Get all results, no filtering, etc. by creating and polling the
         session.
+
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param budget - seconds the whole search has to complete in.
+                        Once it is spent the last poll response is returned,
+                        or BudgetExceeded raised in 'strict' mode.
+        :param context - SearchContext of the search,
+                         created from 'budget' by default
         """
+        if context is None and budget is not None:
+            with SearchContext(budget) as context:
+                return self.get_result(errors=errors, context=context,
+                                       **params)
         additional_params = self.get_additional_params(**params)
         return self.poll_session(
-            self.create_session(**params),
+            self.create_session(context=context, **params),
             errors=errors,
+            context=context,
             **additional_params
         )
 
+    def start_search(self, errors=GRACEFUL, budget=None, priority=None,
+                     **params):
+        """
+        Start 'get_result' in a background thread.
+        Returns a SearchHandle to wait for the result or cancel the search.
+
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param budget - seconds the whole search has to complete in
+        :param priority - scheduler priority class of the search
+        """
+        return SearchHandle(
+            lambda context: self.get_result(errors=errors, context=context,
+                                            **params),
+            SearchContext(budget, priority))
+
     def make_request(self, service_url, method='get', headers=None, data=None,
-                     callback=None, errors=GRACEFUL, **params):
+                     callback=None, errors=GRACEFUL, family='default',
+                     context=None, **params):
         """
         Reusable method for performing requests.
 
@@ -167,15 +531,12 @@ class Transport(object):
                                     this method, it mostly ignores
                                     communication related errors.
                          * None or empty string equals to default
+        :param family - endpoint family the timeout is taken for,
+                        see TIMEOUTS
+        :param context - SearchContext of the search the request is part of
         :param params - additional query parameters for request
         """
-        error_modes = (STRICT, GRACEFUL, IGNORE)
-        error_mode = errors or GRACEFUL
-        if error_mode.lower() not in error_modes:
-            raise ValueError(
-                'Possible values for errors argument are: %s' %
-                ', '.join(error_modes)
-            )
+        error_mode = self._error_mode(errors)
 
         if callback is None:
             callback = self._default_resp_callback
@@ -185,14 +546,120 @@ class Transport(object):
                 'apiKey': self.api_key
             })
 
-        request = getattr(requests, method.lower())
+        return self._send(method.lower(), service_url, headers, data, params,
+                          callback, error_mode, self._timeout(family),
+                          context, family)
 
-        log.debug('* Request URL: %s' % service_url)
-        log.debug('* Request method: %s' % method)
-        log.debug('* Request query params: %s' % params)
-        log.debug('* Request headers: %s' % headers)
+    def prepare(self, service_url, required_keys=(), opt_keys=None,
+                method='get', headers=None, callback=None, errors=GRACEFUL,
+                family='default', stream=False):
+        """
+        Prepare a reusable request plan for an endpoint.
 
-        r = request(service_url, headers=headers, data=data, params=params)
+        :param service_url - base URL of the endpoint
+        :param required_keys - params that make up the URL path, in order
+        :param opt_keys - optional params appended to the URL path
+        :param method - request method, default is 'get'
+        :param headers - request headers, default is the 'Accept' header
+        :param callback - callback to be applied to every response
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param family - endpoint family the timeout is taken for,
+                        see TIMEOUTS
+        :param stream - whether the callback reads the response content
+                        itself, as it arrives, see 'Response.iter_content'
+        """
+        return RequestPlan(self, service_url, required_keys=required_keys,
+                           opt_keys=opt_keys, method=method, headers=headers,
+                           callback=callback, errors=errors, family=family,
+                           stream=stream)
+
+    def _plan(self, service_url, required_keys=(), opt_keys=None,
+              family='default', errors=GRACEFUL):
+        """
+        Get the cached default plan for an endpoint, preparing it on first use.
+        """
+        key = (service_url, required_keys, opt_keys, family, errors)
+        plan = self._plans.get(key)
+        if plan is None:
+            # All the threads preparing it at the same time get the same.
+            plan = self._plans.setdefault(key, self.prepare(
+                service_url, required_keys, opt_keys, errors=errors,
+                family=family))
+        return plan
+
+    def _cached(self, plan, params, record=False):
+        """
+        Perform the planned request through the cache, if there is one.
+
+        :param record - append the response to the price history,
+                        only when it is actually requested
+        """
+        def fetch():
+            resp = plan(**params)
+            return self._record(resp) if record else resp
+
+        if self.cache is None:
+            return fetch()
+        return self.cache.get(
+            self.cache.key(plan.service_url, self.response_format, **params),
+            fetch)
+
+    def _record(self, resp):
+        """
+        Append the prices of the response to the price history,
+        if there is one. Lazy responses are recorded when,
+        and if, they are parsed.
+        """
+        if self.history is None:
+            return resp
+        if getattr(resp, 'is_parsed', True) is False:
+            resp.when_parsed(self._record_parsed)
+        else:
+            self._record_parsed(getattr(resp, 'parsed', None))
+        return resp
+
+    def _record_parsed(self, parsed):
+        if isinstance(parsed, dict):
+            try:
+                self.history.add_response(parsed)
+            except Exception as e:
+                log.warning('Failed to record price history: %s', e)
+
+    def _send(self, method, service_url, headers, data, params, callback,
+              error_mode, timeout=None, context=None, family='default',
+              stream=False):
+        """
+        Perform the request, retrying it as the retry policy allows,
+        and apply the callback or the error handling.
+        Requests of a search are sent through the connection pool
+        of its context.
+        """
+        attempt = 0
+        while True:
+            try:
+                r = self._attempt(method, service_url, headers, data,
+                                  params, timeout, context, family, stream)
+            except Exception as e:
+                delay = self._retry_delay(method, family, attempt, error=e)
+                if delay is None:
+                    raise
+                log.warning('Retrying %s %s in %.2fs: %s',
+                            method.upper(), service_url, delay, e)
+            else:
+                delay = self._retry_delay(method, family, attempt,
+                                          response=r)
+                if delay is None:
+                    break
+                log.warning('Retrying %s %s in %.2fs: %s response',
+                            method.upper(), service_url, delay,
+                            r.status_code)
+                r.close()
+            attempt += 1
+            if context is None:
+                time.sleep(delay)
+            else:
+                context.sleep(delay)
         try:
             r.raise_for_status()
             return callback(r)
@@ -200,14 +667,95 @@ class Transport(object):
             return self._with_error_handling(r, e, error_mode,
                                              self.response_format)
 
+    def _attempt(self, method, service_url, headers, data, params, timeout,
+                 context, family, stream):
+        key = None
+        if self.key_pool is not None and 'apiKey' in params:
+            key = params['apiKey'] = self.key_pool.acquire(service_url,
+                                                           context)
+        if self.scheduler is None:
+            r = self._limited_request(method, service_url, headers, data,
+                                      params, timeout, context, stream)
+        else:
+            priority = getattr(context, 'priority', None) or self.priority
+            self.scheduler.acquire(priority, family == 'poll', context)
+            try:
+                r = self._limited_request(method, service_url, headers,
+                                          data, params, timeout, context,
+                                          stream)
+            finally:
+                self.scheduler.release()
+        if key is not None:
+            self.key_pool.report(key, r.status_code)
+            if family == 'session' and r.headers.get('location'):
+                # Polls of the session have to use the same key.
+                self.key_pool.pin(r.headers['location'], key)
+        return r
+
+    def _retry_delay(self, method, family, attempt, error=None,
+                     response=None):
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.delay(method, attempt, error, response,
+                                       family)
+
+    def _limited_request(self, method, service_url, headers, data, params,
+                         timeout, context, stream=False):
+        if self.limiter is None:
+            return self._request(method, service_url, headers, data, params,
+                                 timeout, context, stream)
+        started = self.limiter.acquire(context)
+        try:
+            r = self._request(method, service_url, headers, data, params,
+                              timeout, context, stream)
+        except (requests.Timeout, requests.ConnectionError):
+            self.limiter.release(started, failed=True)
+            raise
+        except Exception:
+            self.limiter.release(started)
+            raise
+        self.limiter.release(started, r.status_code)
+        return r
+
+    def _request(self, method, service_url, headers, data, params, timeout,
+                 context, stream=False):
+        pool = None
+        if context is not None:
+            timeout = context.timeout(timeout)
+            pool = context.pool(self.backend)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug('* Request URL: %s', service_url)
+            log.debug('* Request method: %s', method)
+            log.debug('* Request query params: %s', params)
+            log.debug('* Request headers: %s', headers)
+            log.debug('* Request timeout: %s', timeout)
+
+        try:
+            r = self.backend.request(method, service_url, headers=headers,
+                                     data=data, params=params,
+                                     timeout=timeout, stream=stream,
+                                     pool=pool)
+        except (requests.Timeout, requests.ConnectionError):
+            if context is not None:
+                # Connections of a cancelled search are closed under it.
+                context.check()
+                if context.expired:
+                    raise BudgetExceeded(
+                        'Search time budget of {0}s is spent.'.format(
+                            context.budget))
+            raise
+        if context is not None:
+            context.check()
+        return r
+
     def get_markets(self, market):
         """
         Get the list of markets
         https://business.skyscanner.net/portal/en-GB/Documentation/Markets
         """
-        url = "{url}/{market}".format(url=self.MARKET_SERVICE_URL,
-                                      market=market)
-        return self.make_request(url, headers=self._headers())
+        return self._cached(self._plan(self.MARKET_SERVICE_URL, ('market',),
+                                       family='reference'),
+                            {'market': market})
 
     def location_autosuggest(self, **params):
         """
@@ -230,25 +778,21 @@ class Transport(object):
             CarHire/Hotels - {LOCATION_AUTOSUGGEST_URL}/{market}/
                              {currency}/{locale}/{query}?apiKey={apiKey}
         """
-        service_url = "{url}/{params_path}".format(
-            url=self.LOCATION_AUTOSUGGEST_URL,
-            params_path=self._construct_params(
-                params, self.LOCATION_AUTOSUGGEST_PARAMS)
-        )
-        return self.make_request(
-            service_url,
-            headers=self._headers(),
-            **params
-        )
+        errors = params.pop('errors', GRACEFUL)
+        return self._cached(self._plan(self.LOCATION_AUTOSUGGEST_URL,
+                                       self.LOCATION_AUTOSUGGEST_PARAMS,
+                                       family='reference', errors=errors),
+                            params)
 
-    def create_session(self, **params):
+    def create_session(self, context=None, **params):
         """
         Creates a session for polling. Should be implemented by sub-classes
         """
         raise NotImplementedError('Should be implemented by a sub-class.')
 
     def poll_session(self, poll_url, initial_delay=2, delay=1, tries=20,
-                     errors=GRACEFUL, **params):
+                     errors=GRACEFUL, is_complete=None, context=None,
+                     callback=None, stream=False, sniff=True, **params):
         """
         Poll the URL
         :param poll_url - URL to poll,
@@ -259,27 +803,73 @@ class Transport(object):
         :param tries - number of polls to perform
         :param errors - errors handling mode,
                         see corresponding parameter in 'make_request' method
+        :param is_complete - function checking whether a poll response
+                             is complete, default is 'is_poll_complete'
+        :param context - SearchContext of the search. Once its budget
+                         is spent, or it is cancelled, the last poll
+                         response is returned, or BudgetExceeded
+                         or SearchCancelled raised in 'strict' mode.
+        :param callback - callback to be applied to every poll response,
+                          see 'make_request'. By default poll responses
+                          are parsed reusing what did not change since
+                          the previous parsed poll, see
+                          skyscanner.streaming.IncrementalParser
+                          and 'sniff'
+        :param stream - whether the callback reads the response content
+                        as it arrives
+        :param sniff - whether, with the default 'is_complete' and
+                       'callback', the completion of poll responses is read
+                       from their content, see 'sniff_poll_complete',
+                       so that only the returned response is parsed,
+                       and as a whole since no previous poll was
         :param params - additional query params for each poll request
         """
-        time.sleep(initial_delay)
+        sniff = sniff and is_complete is None and callback is None
+        if is_complete is None:
+            is_complete = self.is_poll_complete
+        sleep = time.sleep if context is None else context.sleep
+        if callback is None:
+            parser = IncrementalParser()
+
+            def callback(resp):
+                return self._poll_resp_callback(resp, parser, sniff)
+
+            def finish(resp):
+                # Parses the returned response if its parsing was skipped.
+                if not getattr(resp, 'sniffed', False):
+                    return resp
+                resp.sniffed = False
+                try:
+                    return self._poll_resp_callback(resp, parser)
+                except Exception as e:
+                    return self._with_error_handling(resp, e, errors,
+                                                     self.response_format)
+        else:
+            def finish(resp):
+                return resp
+
+        poll = self.prepare(poll_url, errors=errors, family='poll',
+                            callback=callback, stream=stream)
         poll_response = None
-        for n in range(tries):
-            poll_response = self.make_request(
-                poll_url,
-                headers=self._headers(),
-                errors=errors, **params
-            )
+        try:
+            sleep(initial_delay)
+            for n in range(tries):
+                poll_response = poll(context=context, **params)
 
-            if self.is_poll_complete(poll_response):
-                return poll_response
-            else:
-                time.sleep(delay)
+                if is_complete(poll_response):
+                    return self._record(finish(poll_response))
+                else:
+                    sleep(delay)
+        except (BudgetExceeded, SearchCancelled):
+            if STRICT == errors:
+                raise
+            return finish(poll_response)
 
         if STRICT == errors:
             raise ExceededRetries(
                 "Failed to poll within {0} tries.".format(tries))
         else:
-            return poll_response
+            return finish(poll_response)
 
     def is_poll_complete(self, poll_resp):
         """
@@ -288,7 +878,6 @@ class Transport(object):
         """
         if poll_resp.parsed is None:
             return False
-        success_list = ['UpdatesComplete', True, 'COMPLETE']
         status = None
         if self.response_format == 'xml':
             status = poll_resp.parsed.find('./Status').text
@@ -297,7 +886,18 @@ class Transport(object):
                 'Status', poll_resp.parsed.get('status'))
         if status is None:
             raise RuntimeError('Unable to get poll response status.')
-        return status in success_list
+        return status in self.COMPLETE_STATUSES
+
+    def sniff_poll_complete(self, content):
+        """
+        Reads from the raw content of a poll response whether it is
+        complete, as 'is_poll_complete' does, without parsing it.
+        Returns None when the content does not tell for sure.
+        """
+        status = sniff_status(content, self.response_format)
+        if status is None:
+            return None
+        return status in self.COMPLETE_STATUSES
 
     @staticmethod
     def _with_error_handling(resp, error, mode, response_format):
@@ -373,6 +973,28 @@ class Transport(object):
             log.error(error)
             return safe_parse(resp)
 
+    def _use_api_host(self, api_host):
+        for name in dir(self):
+            if name.endswith('_URL'):
+                url = getattr(self, name)
+                if url.startswith(self.API_HOST):
+                    setattr(self, name, api_host + url[len(self.API_HOST):])
+        self.API_HOST = api_host
+
+    def _timeout(self, family):
+        return self.timeouts.get(family, self.timeouts.get('default'))
+
+    @staticmethod
+    def _error_mode(errors):
+        error_modes = (STRICT, GRACEFUL, IGNORE)
+        error_mode = errors or GRACEFUL
+        if error_mode.lower() not in error_modes:
+            raise ValueError(
+                'Possible values for errors argument are: %s' %
+                ', '.join(error_modes)
+            )
+        return error_mode
+
     def _session_headers(self):
         headers = self._headers()
         headers.update({'Content-Type': 'application/x-www-form-urlencoded'})
@@ -384,9 +1006,23 @@ class Transport(object):
     def _default_resp_callback(self, resp):
         if not resp or not resp.content:
             raise EmptyResponse('Response has no content.')
+        if self.lazy:
+            return LazyResponse(resp, self._parse_content)
+        resp.parsed = self._parse_content(resp)
+        return resp
 
+    def _parse_content(self, resp):
         try:
-            parsed_resp = self._parse_resp(resp, self.response_format)
+            if self.parse_executor is not None:
+                parsed = self.parse_executor.submit(
+                    parse_content, resp.content, self.response_format,
+                    self.postprocess).result()
+            else:
+                parsed = self._parse_resp(resp, self.response_format).parsed
+                if self.postprocess is not None:
+                    parsed = self.postprocess(parsed)
+            if self.intern_table is not None:
+                self.intern_table.intern(parsed)
         except (ValueError, SyntaxError):
             raise ValueError(
                 'Invalid {} in response: {}...'.format(
@@ -395,20 +1031,55 @@ class Transport(object):
                 )
             )
 
-        return parsed_resp
+        return parsed
+
+    def _poll_resp_callback(self, resp, parser, sniff=False):
+        """
+        Default callback of the polls of a session, skipping the parsing
+        of unchanged responses. JSON responses are parsed incrementally,
+        unless they are parsed in 'parse_executor' or post-processed.
+
+        With 'sniff', responses known to be incomplete from their content
+        are not parsed: their 'parsed' attribute is None and their
+        'sniffed' attribute True.
+        """
+        if not resp or not resp.content:
+            raise EmptyResponse('Response has no content.')
+        if sniff and self.sniff_poll_complete(resp.content) is False:
+            resp.parsed = None
+            resp.sniffed = True
+            return resp
+        if parser.unchanged(resp.content):
+            resp.parsed = parser.result
+            return resp
+        if self.response_format != 'json' or \
+                self.parse_executor is not None or \
+                self.postprocess is not None:
+            resp = self._default_resp_callback(resp)
+            parser.remember(resp.content, resp.parsed)
+            return resp
+        try:
+            resp.parsed = parser.parse(resp.content)
+        except ValueError:
+            raise ValueError('Invalid JSON in response: {}...'.format(
+                resp.content[:100]))
+        if self.intern_table is not None:
+            self.intern_table.intern(resp.parsed)
+        return resp
 
     @staticmethod
     def _construct_params(params, required_keys, opt_keys=None):
         """
         Construct params list in order of given keys.
+        The params are left unchanged.
         """
         try:
-            params_list = [params.pop(key) for key in required_keys]
+            params_list = [params[key] for key in required_keys]
         except KeyError as e:
             raise MissingParameter(
                 'Missing expected request parameter: %s' % e)
         if opt_keys:
-            params_list.extend([params.pop(key)
+            params_list.extend([params[key]
                                 for key in opt_keys if key in params])
         return '/'.join(str(p) for p in params_list)
 
@@ -419,6 +1090,70 @@ class Transport(object):
         return resp
 
 
+class RequestPlan(object):
+
+    """
+    Request plan for a single endpoint.
+
+    Everything that does not depend on the call parameters (URL prefix,
+    headers, callback, errors handling mode and the timeout)
+    is resolved once, when the plan is prepared, so that each call only
+    fills in the path and query parameters.
+
+    Usage:
+
+        quotes = flights_cache_service.prepare(
+            FlightsCache.BROWSE_QUOTES_SERVICE_URL,
+            FlightsCache._REQ_PARAMS, FlightsCache._OPT_PARAMS)
+        for route in routes:
+            result = quotes(**route).parsed
+    """
+
+    def __init__(self, transport, service_url, required_keys=(),
+                 opt_keys=None, method='get', headers=None, callback=None,
+                 errors=GRACEFUL, family='default', stream=False):
+        self.transport = transport
+        self.service_url = service_url
+        self.required_keys = tuple(required_keys)
+        self.opt_keys = tuple(opt_keys or ())
+        self.method = method.lower()
+        self.headers = transport._headers() if headers is None else headers
+        self.callback = callback or transport._default_resp_callback
+        self.error_mode = transport._error_mode(errors)
+        self.family = family
+        self.timeout = transport._timeout(family)
+        self.stream = stream
+        self._with_path = bool(self.required_keys or self.opt_keys)
+        self._path_keys = frozenset(self.required_keys + self.opt_keys)
+        self._with_api_key = 'apikey' not in service_url.lower()
+
+    def __call__(self, data=None, context=None, **params):
+        """
+        Perform the request.
+
+        :param data - post data
+        :param context - SearchContext of the search the request is part of
+        :param params - path and additional query parameters for request
+        """
+        service_url = self.service_url
+        if self._with_path:
+            service_url = '%s/%s' % (service_url,
+                                     self.transport._construct_params(
+                                         params, self.required_keys,
+                                         self.opt_keys))
+            # The other params are query params.
+            params = dict((key, value) for key, value in params.items()
+                          if key not in self._path_keys)
+        if self._with_api_key:
+            params['apiKey'] = self.transport.api_key
+
+        return self.transport._send(self.method, service_url,
+                                    self.headers, data, params,
+                                    self.callback, self.error_mode,
+                                    self.timeout, context, self.family,
+                                    self.stream)
+
+
 class Flights(Transport):
 
     """
@@ -432,7 +1167,7 @@ class Flights(Transport):
     PRICING_SESSION_URL = '{api_host}/apiservices/pricing/v1.0'.format(
         api_host=Transport.API_HOST)
 
-    def create_session(self, **params):
+    def create_session(self, context=None, **params):
         """
         Create the session
         date format: YYYY-mm-dd
@@ -443,9 +1178,146 @@ class Flights(Transport):
                                  headers=self._session_headers(),
                                  callback=lambda resp: resp.headers[
                                      'location'],
+                                 family='session',
+                                 context=context,
                                  data=params)
 
-    def request_booking_details(self, poll_url, **params):
+    def get_cheapest_itineraries(self, top=10, errors=GRACEFUL, budget=None,
+                                 context=None, **params):
+        """
+        Get the 'top' cheapest itineraries, by creating and polling
+        the session like 'get_result'.
+
+        Poll responses are parsed as they arrive, keeping only the cheapest
+        itineraries and the legs, segments, carriers, agents and places
+        they reference, so memory and parsing time do not grow with
+        the number of itineraries of the response.
+        Requires 'json' response format.
+
+        :param top - number of itineraries to keep
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param budget - seconds the whole search has to complete in,
+                        see 'get_result'
+        :param context - SearchContext of the search,
+                         created from 'budget' by default
+
+        When the session can not be created and no error is raised,
+        e.g. when it is throttled in 'graceful' mode, the response
+        of the session request is returned.
+        """
+        if self.response_format != 'json':
+            raise ValueError('Cheapest itineraries require JSON responses.')
+        if context is None and budget is not None:
+            with SearchContext(budget) as context:
+                return self.get_cheapest_itineraries(
+                    top=top, errors=errors, context=context, **params)
+        additional_params = self.get_additional_params(**params)
+        poll_url = self.create_session(context=context, **params)
+        if not isinstance(poll_url, str):
+            # The response of the session request that failed
+            # without raising, e.g. a throttled one.
+            return poll_url
+        return self.poll_session(
+            poll_url,
+            errors=errors,
+            context=context,
+            callback=lambda resp: self._top_resp_callback(resp, top),
+            stream=True,
+            **additional_params
+        )
+
+    def search_legs(self, legs, top=10, errors=GRACEFUL, budget=None,
+                    **params):
+        """
+        Search the one-way legs of a multi-city or open-jaw trip
+        concurrently, so that the search takes about as long as its
+        slowest leg.
+
+        Yields a skyscanner.multileg.LegUpdate every time a leg
+        completes, in the order they complete, with the 'top' cheapest
+        combinations of the itineraries of the legs completed so far.
+        Combinations of the last update cover all the legs. Legs still
+        running are cancelled when the generator is closed.
+        A leg that fails without raising, e.g. whose session request is
+        throttled in 'graceful' mode, completes with the failed response
+        and no itineraries, so there are no combinations of all the legs.
+        Requires 'json' response format.
+
+        Usage:
+
+            legs = [{'originplace': 'LHR-sky', 'destinationplace': 'JFK-sky',
+                     'outbounddate': '2017-05-28'},
+                    {'originplace': 'BOS-sky', 'destinationplace': 'LHR-sky',
+                     'outbounddate': '2017-06-04'}]
+            for update in flights_service.search_legs(legs, **params):
+                show(update.combinations)
+
+        :param legs - params of every leg: 'originplace',
+                      'destinationplace', 'outbounddate', ...
+        :param top - number of combinations, and of the cheapest
+                     itineraries kept of every leg, see
+                     'get_cheapest_itineraries'
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param budget - seconds every leg has to complete in,
+                        see 'get_result'
+        :param params - params shared by the legs: 'country', 'currency',
+                        'locale', 'adults', ...
+        """
+        if self.response_format != 'json':
+            raise ValueError('Multi-leg searches require JSON responses.')
+        legs = list(legs)
+        results = Queue()
+        contexts = [SearchContext(budget) for leg in legs]
+
+        def search(n):
+            try:
+                with contexts[n] as context:
+                    results.put((n, self.get_cheapest_itineraries(
+                        top=top, errors=errors, context=context,
+                        **dict(params, **legs[n])), None))
+            except Exception as e:
+                results.put((n, None, e))
+
+        for n in range(len(legs)):
+            thread = threading.Thread(target=search, args=(n,))
+            thread.daemon = True
+            thread.start()
+
+        itineraries = [None] * len(legs)
+        try:
+            for completed in range(1, len(legs) + 1):
+                n, response, error = results.get()
+                if error is not None:
+                    raise error
+                parsed = getattr(response, 'parsed', None)
+                itineraries[n] = (parsed.get('Itineraries') or []) \
+                    if isinstance(parsed, dict) else []
+                yield multileg.LegUpdate(
+                    n, response, multileg.combine(itineraries, top),
+                    completed == len(legs))
+        finally:
+            for context in contexts:
+                context.cancel()
+
+    def _top_resp_callback(self, resp, top):
+        try:
+            chunks = resp.iter_content(self.STREAM_CHUNK_SIZE)
+            first = next(chunks, b'')
+            if not first:
+                raise EmptyResponse('Response has no content.')
+            resp.parsed = top_itineraries(
+                itertools.chain((first,), chunks), top)
+        except ValueError as e:
+            raise ValueError('Invalid JSON in response: {}'.format(e))
+        finally:
+            resp.close()
+        if self.intern_table is not None:
+            self.intern_table.intern(resp.parsed)
+        return resp
+
+    def request_booking_details(self, poll_url, context=None, **params):
         """
         Request for booking details
         URL Format:
@@ -457,8 +1329,106 @@ class Flights(Transport):
                                  headers=self._headers(),
                                  callback=lambda resp: resp.headers[
                                      'location'],
+                                 family='booking',
+                                 context=context,
                                  **params)
 
+    def get_booking_details(self, poll_url, itineraries, workers=4,
+                            errors=GRACEFUL, **poll_params):
+        """
+        Request and poll booking details of several itineraries concurrently.
+
+        Yields (itinerary, booking details response) tuples
+        as soon as the booking details of an itinerary are complete.
+        When the booking request of an itinerary fails without raising,
+        e.g. when it is throttled, the response of that request is
+        yielded instead and the other itineraries are still processed.
+
+        :param poll_url - URL of a session, returned by 'create_session'
+        :param itineraries - itineraries of the session results,
+                             or dicts with 'outboundlegid'
+                             and optional 'inboundlegid' keys
+        :param workers - number of itineraries to process concurrently
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method
+        :param poll_params - 'poll_session' params for the booking polls,
+                             by default polls without the initial delay.
+                             Requests are sent in its 'context', or in
+                             a SearchContext of their own. Either is
+                             cancelled when the generator is closed before
+                             all the itineraries are yielded, or raises.
+        """
+        poll_params.setdefault('initial_delay', 0)
+        context = poll_params.get('context')
+        own_context = context is None
+        if own_context:
+            context = poll_params['context'] = SearchContext()
+        itineraries = list(itineraries)
+        tasks, results = Queue(), Queue()
+        for itinerary in itineraries:
+            tasks.put(itinerary)
+
+        def worker():
+            while not context.cancelled:
+                try:
+                    itinerary = tasks.get_nowait()
+                except Empty:
+                    return
+                try:
+                    legs = dict((key.lower(), value)
+                                for key, value in itinerary.items()
+                                if key.lower() in ('outboundlegid',
+                                                   'inboundlegid') and value)
+                    booking_url = self.request_booking_details(
+                        poll_url, errors=errors, context=context, **legs)
+                    if not isinstance(booking_url, str):
+                        # The failed booking request's response,
+                        # e.g. a throttled one in 'graceful' mode.
+                        results.put((itinerary, booking_url, None))
+                        continue
+                    results.put((itinerary, self.poll_session(
+                        booking_url, errors=errors,
+                        is_complete=self.is_booking_complete,
+                        **poll_params), None))
+                except Exception as e:
+                    results.put((itinerary, None, e))
+
+        for n in range(min(workers, tasks.qsize())):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+
+        completed = False
+        try:
+            for n in range(len(itineraries)):
+                itinerary, booking_response, error = results.get()
+                if error is not None:
+                    raise error
+                yield itinerary, booking_response
+            completed = True
+        finally:
+            if not completed:
+                context.cancel()
+            elif own_context:
+                context.close()
+
+    def is_booking_complete(self, booking_resp):
+        """
+        Checks whether prices of all the booking items are up to date.
+        """
+        if booking_resp.parsed is None:
+            return False
+        if self.response_format == 'xml':
+            statuses = [s.text for s in booking_resp.parsed.findall(
+                './BookingOptions/BookingOptionDto/BookingItems/'
+                'BookingItemDto/Status')]
+        else:
+            statuses = [item.get('Status')
+                        for option in booking_resp.parsed.get(
+                            'BookingOptions', [])
+                        for item in option.get('BookingItems', [])]
+        return bool(statuses) and 'Pending' not in statuses
+
 
 class FlightsCache(Flights):
 
@@ -489,17 +1459,7 @@ class FlightsCache(Flights):
         {outboundPartialDate}/{inboundPartialDate}
         ?apiKey={apiKey}
         """
-        service_url = "{url}/{params_path}".format(
-            url=self.BROWSE_DATES_SERVICE_URL,
-            params_path=self._construct_params(
-                params, self._REQ_PARAMS, self._OPT_PARAMS)
-        )
-
-        return self.make_request(
-            service_url,
-            headers=self._headers(),
-            **params
-        )
+        return self._browse(self.BROWSE_DATES_SERVICE_URL, params)
 
     def get_cheapest_price_by_route(self, **params):
         """
@@ -508,17 +1468,7 @@ class FlightsCache(Flights):
         {outboundPartialDate}/{inboundPartialDate}
         ?apiKey={apiKey}
         """
-        service_url = "{url}/{params_path}".format(
-            url=self.BROWSE_ROUTES_SERVICE_URL,
-            params_path=self._construct_params(
-                params, self._REQ_PARAMS, self._OPT_PARAMS)
-
-        )
-        return self.make_request(
-            service_url,
-            headers=self._headers(),
-            **params
-        )
+        return self._browse(self.BROWSE_ROUTES_SERVICE_URL, params)
 
     def get_cheapest_quotes(self, **params):
         """
@@ -527,16 +1477,7 @@ class FlightsCache(Flights):
         {outboundPartialDate}/{inboundPartialDate}
         ?apiKey={apiKey}
         """
-        service_url = "{url}/{params_path}".format(
-            url=self.BROWSE_QUOTES_SERVICE_URL,
-            params_path=self._construct_params(
-                params, self._REQ_PARAMS, self._OPT_PARAMS)
-        )
-        return self.make_request(
-            service_url,
-            headers=self._headers(),
-            **params
-        )
+        return self._browse(self.BROWSE_QUOTES_SERVICE_URL, params)
 
     def get_grid_prices_by_date(self, **params):
         """
@@ -545,16 +1486,88 @@ class FlightsCache(Flights):
         {outboundPartialDate}/{inboundPartialDate}
         ?apiKey={apiKey}
         """
-        service_url = "{url}/{params_path}".format(
-            url=self.BROWSE_GRID_SERVICE_URL,
-            params_path=self._construct_params(
-                params, self._REQ_PARAMS, self._OPT_PARAMS)
-        )
-        return self.make_request(
-            service_url,
-            headers=self._headers(),
-            **params
-        )
+        return self._browse(self.BROWSE_GRID_SERVICE_URL, params)
+
+    def get_price_calendar(self, start, end=None, days=0, workers=4,
+                           errors=GRACEFUL, **params):
+        """
+        Cheapest price of every day of a date window, from browse dates
+        requests for the months of the window, sent concurrently.
+        Returns a skyscanner.pricecalendar.PriceCalendar.
+        Requires 'json' response format.
+
+        Usage:
+
+            # The whole of May.
+            calendar = flights_cache_service.get_price_calendar(
+                '2017-05', **route)
+            # 3 days either side of the 28th.
+            calendar = flights_cache_service.get_price_calendar(
+                '2017-05-28', days=3, **route)
+
+        :param start - first day of the window, datetime.date, 'YYYY-MM-DD'
+                       or 'YYYY-MM' for a whole month
+        :param end - last day of the window, like 'start',
+                     default is 'start'
+        :param days - days added to both ends of the window
+        :param workers - number of requests to send concurrently
+        :param errors - errors handling mode,
+                        see corresponding parameter in 'make_request' method.
+                        Days of the months whose request failed without
+                        raising, e.g. throttled ones, have no price, and
+                        the months are listed in 'failed' of the calendar.
+        :param params - 'market', 'currency', 'locale', 'originplace',
+                        'destinationplace' and optional 'inbounddate'
+        """
+        if self.response_format != 'json':
+            raise ValueError('Price calendars require JSON responses.')
+        first, last = pricecalendar.window(start, end, days)
+        calendar = pricecalendar.PriceCalendar(first, last)
+        months = pricecalendar.months(first, last)
+        tasks, results = Queue(), Queue()
+        for month in months:
+            tasks.put(month)
+
+        def worker():
+            while True:
+                try:
+                    month = tasks.get_nowait()
+                except Empty:
+                    return
+                try:
+                    results.put((month, self._cached(
+                        self._plan(self.BROWSE_DATES_SERVICE_URL,
+                                   self._REQ_PARAMS, self._OPT_PARAMS,
+                                   family='browse', errors=errors),
+                        dict(params, outbounddate=month), record=True),
+                        None))
+                except Exception as e:
+                    results.put((month, None, e))
+
+        for n in range(min(workers, len(months))):
+            thread = threading.Thread(target=worker)
+            thread.daemon = True
+            thread.start()
+
+        for n in range(len(months)):
+            month, response, error = results.get()
+            if error is not None:
+                raise error
+            parsed = getattr(response, 'parsed', None)
+            if isinstance(parsed, dict):
+                calendar.add_response(parsed)
+            else:
+                calendar.failed.append(month)
+        calendar.failed.sort()
+        return calendar
+
+    def _browse(self, service_url, params):
+        # The errors handling mode is not a query param.
+        errors = params.pop('errors', GRACEFUL)
+        return self._cached(
+            self._plan(service_url, self._REQ_PARAMS, self._OPT_PARAMS,
+                       family='browse', errors=errors),
+            params, record=True)
 
 
 class CarHire(Transport):
@@ -572,7 +1585,7 @@ class CarHire(Transport):
         .format(api_host=Transport.API_HOST)
     LOCATION_AUTOSUGGEST_PARAMS = ('market', 'currency', 'locale', 'query')
 
-    def create_session(self, **params):
+    def create_session(self, context=None, **params):
         """
         Create the session
         date format: YYYY-MM-DDThh:mm
@@ -592,6 +1605,8 @@ class CarHire(Transport):
                                       headers=self._session_headers(),
                                       callback=lambda resp: resp.headers[
                                           'location'],
+                                      family='session',
+                                      context=context,
                                       userip=params['userip'])
 
         return "{url}{path}".format(url=self.API_HOST, path=poll_path)
@@ -608,6 +1623,12 @@ class CarHire(Transport):
             return False
         return all(not bool(w.get('in_progress')) for w in websites)
 
+    def sniff_poll_complete(self, content):
+        in_progress = sniff_in_progress(content, self.response_format)
+        if in_progress is None:
+            return None
+        return not in_progress
+
 
 class Hotels(Transport):
 
@@ -625,7 +1646,7 @@ class Hotels(Transport):
         .format(api_host=Transport.API_HOST)
     LOCATION_AUTOSUGGEST_PARAMS = ('market', 'currency', 'locale', 'query')
 
-    def create_session(self, **params):
+    def create_session(self, context=None, **params):
         """
         Create the session
         date format: YYYY-MM-DDThh:mm
@@ -644,7 +1665,9 @@ class Hotels(Transport):
         poll_path = self.make_request(
             service_url,
             headers=self._session_headers(),
-            callback=lambda resp: resp.headers['location']
+            callback=lambda resp: resp.headers['location'],
+            family='session',
+            context=context
         )
 
         return "{url}{path}".format(url=self.API_HOST, path=poll_path)
@@ -0,0 +1,138 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Reading the completion status of poll responses from their raw content,
+without parsing them.
+
+Every function returns None when the content does not tell for sure,
+in which case the response has to be parsed.
+"""
+
+import json
+import re
+
+# The status is looked for at the start of the content, where the API
+# puts it, before the results.
+SNIFF_LIMIT = 64 * 1024
+
+_decoder = json.JSONDecoder()
+_STATUS_KEYS = {'json': ('Status', 'status'), 'xml': ('Status',)}
+_JSON_TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{}\[\]]')
+_XML_TAG = re.compile(r'<(/?)([^\s/>!?]+)[^>]*?(/?)>|<[!?][^>]*>')
+_COLON = re.compile(r'\s*:\s*')
+
+
+def _patterns(pattern):
+    # The pattern for text and for bytes contents.
+    return {False: re.compile(pattern), True: re.compile(pattern.encode())}
+
+
+_IN_PROGRESS = {
+    'json': _patterns(r'"in_progress"\s*:\s*([^,}\]\s]+)'),
+    'xml': _patterns(r'<WebsiteDto\b([^>]*)>'),
+}
+_IN_PROGRESS_ATTRIBUTE = re.compile(r'\bin_progress\s*=\s*["\']([^"\']*)')
+
+
+def sniff_status(content, response_format, limit=SNIFF_LIMIT):
+    """
+    'Status' (or 'status') member of the top level object of a JSON
+    response, or child of the root element of an XML one, e.g.
+    'UpdatesComplete', None if it is not in the first 'limit' characters.
+
+    :param content - bytes or text content of the response
+    :param response_format - 'json' or 'xml'
+    :param limit - number of characters to look into
+    """
+    keys = _STATUS_KEYS.get(response_format)
+    if keys is None:
+        return None
+    text = content[:limit]
+    if isinstance(text, bytes):
+        text = text.decode('utf-8', 'replace')
+    if response_format == 'json':
+        return _json_status(text, keys)
+    return _xml_status(text, keys)
+
+
+def _json_status(text, keys):
+    depth = 0
+    for token in _JSON_TOKEN.finditer(text):
+        character = token.group()
+        if character in '{[':
+            depth += 1
+        elif character in '}]':
+            depth -= 1
+        elif depth == 1 and character[1:-1] in keys:
+            colon = _COLON.match(text, token.end())
+            if colon is None:
+                # A string value, not a member name.
+                continue
+            try:
+                return _decoder.raw_decode(text, colon.end())[0]
+            except ValueError:
+                return None
+    return None
+
+
+def _xml_status(text, keys):
+    depth = 0
+    for tag in _XML_TAG.finditer(text):
+        closing, name, empty = tag.groups()
+        if name is None or empty:
+            continue
+        if closing:
+            depth -= 1
+            continue
+        if depth == 1 and name in keys:
+            end = text.find('<', tag.end())
+            return text[tag.end():end] if end >= 0 else None
+        depth += 1
+    return None
+
+
+def sniff_in_progress(content, response_format):
+    """
+    Whether any website of a car hire response is in progress,
+    None if it can not be read without parsing, e.g. without websites.
+
+    :param content - bytes or text content of the response
+    :param response_format - 'json' or 'xml'
+    """
+    patterns = _IN_PROGRESS.get(response_format)
+    if patterns is None:
+        return None
+    binary = isinstance(content, bytes)
+    values = patterns[binary].findall(content)
+    if not values:
+        return None
+    in_progress = False
+    for value in values:
+        if binary:
+            value = value.decode('utf-8')
+        if response_format == 'json':
+            try:
+                value = json.loads(value)
+            except ValueError:
+                return None
+        else:
+            # Like 'Element.get', any non-empty attribute is true.
+            match = _IN_PROGRESS_ATTRIBUTE.search(value)
+            value = match.group(1) if match else None
+        in_progress = in_progress or bool(value)
+    return in_progress
@@ -0,0 +1,385 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+Incremental parsing of JSON responses.
+
+The top level object of a response is parsed member by member and its
+list sections (Itineraries, Legs, ...) item by item, from chunks of
+the response content, so that a consumer can keep only what it needs
+instead of materializing the whole response.
+"""
+
+import codecs
+import heapq
+import itertools
+import json
+import re
+
+VALUE, ITEM = 'value', 'item'
+
+_WHITESPACE = ' \t\n\r'
+_decoder = json.JSONDecoder()
+_skip = re.compile(r'[ \t\n\r]*').match
+
+
+def iter_members(chunks):
+    """
+    Parse a JSON object from chunks of its text.
+
+    Yields (name, kind, value) tuples: kind is VALUE for a member that is
+    not a list, and ITEM for every item of a list member, in order.
+    An empty list member yields nothing.
+
+    :param chunks - iterable of bytes or text chunks, e.g.
+                    'requests.Response.iter_content(chunk_size)'
+    """
+    reader = _Reader(chunks)
+    reader.expect('{')
+    if reader.peek() == '}':
+        return
+    while True:
+        name = reader.value()
+        reader.expect(':')
+        if reader.peek() == '[':
+            reader.expect('[')
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield name, ITEM, reader.value()
+                    if reader.expect(',]') == ']':
+                        break
+        else:
+            yield name, VALUE, reader.value()
+        if reader.expect(',}') == '}':
+            return
+
+
+def top_itineraries(chunks, k):
+    """
+    Parse a live pricing response from chunks of its content, keeping
+    only its 'k' cheapest itineraries and the legs, segments, carriers,
+    agents and places they reference.
+
+    Returns a dict shaped like the parsed response, with the itineraries
+    sorted by their cheapest price. Memory used by the itineraries and
+    the legs and segments is bounded by 'k' as long as every section
+    comes after the ones referencing it, as in API responses.
+
+    :param chunks - iterable of bytes or text chunks of the response
+    :param k - number of itineraries to keep
+    """
+    top = _TopItineraries(k)
+    for name, kind, value in iter_members(chunks):
+        if kind == VALUE:
+            top.result[name] = value
+        elif name == 'Itineraries':
+            top.add_itinerary(value)
+        else:
+            top.add(name, value)
+    return top.finish()
+
+
+class _TopItineraries(object):
+
+    """
+    State of 'top_itineraries': the heap of the cheapest itineraries,
+    the items of the other list sections and the ids referenced so far.
+    """
+
+    # Sections filtered while they are parsed, once their references
+    # are known, the others are small and filtered at the end.
+    STREAMED = ('Legs', 'Segments')
+
+    def __init__(self, k):
+        self.k = k
+        self.result = {}
+        self.sections = {}
+        self.refs = {}
+        self.heap = []
+        self.sequence = itertools.count()
+        self.itineraries = False
+        self.resolved = set()
+
+    def add_itinerary(self, itinerary):
+        self.itineraries = True
+        # Max-heap of the cheapest ones, the later one goes on ties.
+        entry = (-_cheapest(itinerary), -next(self.sequence), itinerary)
+        if len(self.heap) < self.k:
+            heapq.heappush(self.heap, entry)
+        elif self.k > 0:
+            heapq.heappushpop(self.heap, entry)
+
+    def add(self, name, item):
+        items = self.sections.get(name)
+        if items is None:
+            # The sections parsed so far are complete.
+            self._resolve()
+            items = self.sections[name] = []
+        wanted = self.refs.get(name)
+        if wanted is None or name not in self.STREAMED or \
+                item.get('Id') in wanted:
+            items.append(item)
+
+    def finish(self):
+        self._resolve()
+        places = self.refs.get('Places')
+        if places is not None:
+            by_id = dict((p.get('Id'), p)
+                         for p in self.sections.get('Places', ()))
+            for place_id in list(places):
+                parent = by_id.get(place_id, {}).get('ParentId')
+                while parent is not None and parent not in places:
+                    places.add(parent)
+                    parent = by_id.get(parent, {}).get('ParentId')
+        for name, items in self.sections.items():
+            wanted = self.refs.get(name)
+            self.result[name] = items if wanted is None else [
+                item for item in items if item.get('Id') in wanted]
+        return self.result
+
+    def _resolve(self):
+        refs = self.refs
+        if self.itineraries and 'Itineraries' not in self.result:
+            self.result['Itineraries'] = [
+                entry[2] for entry in sorted(self.heap, reverse=True)]
+            legs = refs.setdefault('Legs', set())
+            agents = refs.setdefault('Agents', set())
+            for itinerary in self.result['Itineraries']:
+                legs.update(itinerary[key] for key in
+                            ('OutboundLegId', 'InboundLegId')
+                            if key in itinerary)
+                for option in itinerary.get('PricingOptions') or ():
+                    agents.update(option.get('Agents') or ())
+        # Legs reference segments, so resolving them may let segments
+        # parsed before them be resolved too.
+        resolving = True
+        while resolving:
+            resolving = False
+            for name in self.STREAMED:
+                if name in self.resolved or name not in refs or \
+                        name not in self.sections:
+                    continue
+                self.resolved.add(name)
+                resolving = True
+                self._reference(name)
+
+    def _reference(self, name):
+        segments = self.refs.setdefault('Segments', set())
+        carriers = self.refs.setdefault('Carriers', set())
+        places = self.refs.setdefault('Places', set())
+        wanted = self.refs[name]
+        for item in self.sections[name]:
+            if item.get('Id') not in wanted:
+                continue
+            segments.update(item.get('SegmentIds') or ())
+            carriers.update(item.get('Carriers') or ())
+            carriers.update(item.get('OperatingCarriers') or ())
+            places.update(item.get('Stops') or ())
+            for key in ('Carrier', 'OperatingCarrier',
+                        'OriginStation', 'DestinationStation'):
+                if key in item:
+                    (places if key.endswith('Station')
+                     else carriers).add(item[key])
+
+
+class IncrementalParser(object):
+
+    """
+    Parses successive versions of a JSON object, e.g. the poll responses
+    of a session, reusing what did not change since the previous one.
+
+    An unchanged content is not parsed at all. Otherwise every member
+    of the top level object, and every item of its list members, whose
+    text is the same as the one of the previous content at the same
+    place (same member, same index in the list) is taken from
+    the previous result instead of being parsed again, so only new
+    or changed items are parsed.
+
+    NOTE that reused values are shared between the results.
+
+    Usage:
+
+        parser = IncrementalParser()
+        for content in poll_contents:
+            parsed = parser.parse(content)
+    """
+
+    def __init__(self):
+        self.content = None
+        self.result = None
+        self.reused = 0
+        self._text = ''
+        self._spans = {}
+
+    def unchanged(self, content):
+        """
+        Whether the content is the same as the previous one.
+        """
+        return self.content is not None and len(content) == len(
+            self.content) and content == self.content
+
+    def remember(self, content, result):
+        """
+        Remember a content parsed otherwise, to recognize it unchanged.
+        """
+        self.content, self.result = content, result
+        self._text, self._spans = '', {}
+
+    def parse(self, content):
+        """
+        Parse a JSON object, bytes or text.
+        """
+        if self.unchanged(content):
+            self.reused = sum(len(spans) for spans in self._spans.values())
+            return self.result
+        text = content.decode('utf-8') if isinstance(content, bytes) \
+            else content
+        self.reused = 0
+        result, spans = {}, {}
+        character, position = _next(text, 0, '{')
+        if text.startswith('}', position):
+            character, position = _next(text, position, '}')
+        while character != '}':
+            name, position = _decoder.raw_decode(text, position)
+            character, position = _next(text, position, ':')
+            previous = self._spans.get(name, ())
+            new = spans[name] = []
+            if text.startswith('[', position):
+                items = result[name] = []
+                character, position = _next(text, position, '[')
+                if text.startswith(']', position):
+                    character, position = _next(text, position, ']')
+                while character != ']':
+                    value, end = self._value(text, position, previous,
+                                             len(new))
+                    items.append(value)
+                    new.append((position, end, value))
+                    character, position = _next(text, end, ',]')
+            else:
+                value, end = self._value(text, position, previous, 0)
+                result[name] = value
+                new.append((position, end, value))
+                position = end
+            character, position = _next(text, position, ',}')
+        if position != len(text):
+            raise ValueError('Extra data after JSON content at %d'
+                             % position)
+        self.content, self.result = content, result
+        self._text, self._spans = text, spans
+        return result
+
+    def _value(self, text, position, previous, index):
+        # The previous value at the index, if its text did not change,
+        # and the character after it, e.g. for numbers, is a delimiter.
+        if index < len(previous):
+            start, end, value = previous[index]
+            new_end = position + end - start
+            if text[new_end:new_end + 1] in _DELIMITERS and \
+                    text[position:new_end] == self._text[start:end]:
+                self.reused += 1
+                return value, new_end
+        return _decoder.raw_decode(text, position)
+
+
+_DELIMITERS = frozenset(',]}' + _WHITESPACE)
+
+
+def _next(text, position, characters):
+    # Skips whitespace and one of the characters, and the whitespace after
+    # it. Returns the character and the position after it.
+    position = _skip(text, position).end()
+    character = text[position:position + 1]
+    if not character or character not in characters:
+        raise ValueError('Expected %s at %d' % (
+            ' or '.join(characters), position))
+    return character, _skip(text, position + 1).end()
+
+
+def _cheapest(itinerary):
+    prices = [o['Price'] for o in itinerary.get('PricingOptions') or ()
+              if o.get('Price') is not None]
+    return min(prices) if prices else float('inf')
+
+
+class _Reader(object):
+
+    """
+    Text buffer over the chunks, decoding one JSON value at a time.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def peek(self):
+        self._skip()
+        return self.buffer[self.position]
+
+    def expect(self, characters):
+        character = self.peek()
+        if character not in characters:
+            raise ValueError('Expected %s at %d, got %r' % (
+                ' or '.join(characters), self.position, character))
+        self.position += 1
+        return character
+
+    def value(self):
+        self._skip()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buffer, self.position)
+            except ValueError:
+                if not self._read():
+                    raise
+                continue
+            # A value ending with the buffer, e.g. a number,
+            # may go on in the next chunk.
+            if end < len(self.buffer) or not self._read():
+                self.position = end
+                return value
+
+    def _skip(self):
+        while True:
+            while self.position < len(self.buffer) and \
+                    self.buffer[self.position] in _WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return
+            if not self._read():
+                raise ValueError('Unexpected end of JSON content.')
+
+    def _read(self):
+        # Appends the next chunk, dropping what has been parsed already.
+        while not self.eof:
+            try:
+                chunk = next(self.chunks)
+            except StopIteration:
+                self.eof = True
+                chunk = self.decoder.decode(b'', final=True)
+            else:
+                if isinstance(chunk, bytes):
+                    chunk = self.decoder.decode(chunk)
+            if chunk:
+                self.buffer = self.buffer[self.position:] + chunk
+                self.position = 0
+                return True
+        return False
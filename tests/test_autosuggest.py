@@ -0,0 +1,144 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_autosuggest
+----------------------------------
+
+Tests for `skyscanner.autosuggest` module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from skyscanner.autosuggest import AutosuggestIndex
+from skyscanner.fakeapi import FakeServer
+from skyscanner.skyscanner import Flights, Hotels, etree
+
+
+class TestAutosuggestIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.index = AutosuggestIndex()
+        self.index.add_response({
+            'Countries': [{'Code': 'DE', 'Name': 'Germany'},
+                          {'Code': 'GB', 'Name': 'United Kingdom'}],
+        })
+        self.index.add_response({'Places': [
+            {'PlaceId': 'BER-sky', 'PlaceName': 'Berlin Brandenburg'},
+            {'PlaceId': 'TXL-sky', 'PlaceName': 'Berlin Tegel'},
+            {'PlaceId': 'MUC-sky', u'PlaceName': u'München'},
+            {'PlaceId': 'BRN-sky', 'PlaceName': 'Bern'},
+        ]})
+
+    def names(self, query, **kwargs):
+        return [item.get('PlaceName') or item.get('Name')
+                for item in self.index.suggest(query, **kwargs)]
+
+    def test_suggest(self):
+        self.assertEqual(self.names('Bern'), ['Bern'])
+        self.assertEqual(self.names('ber'), ['Berlin Brandenburg', 'Bern',
+                                             'Berlin Tegel'])
+        self.assertEqual(self.names('teg'), ['Berlin Tegel'])
+        self.assertEqual(self.names('txl'), ['Berlin Tegel'])
+        self.assertEqual(self.names('munchen'), [u'München'])
+        self.assertEqual(self.names('king'), ['United Kingdom'])
+        self.assertEqual(self.names('ger', section='Places'), [])
+        self.assertEqual(self.names(''), [])
+        self.assertEqual(self.names('ber', limit=1), ['Berlin Brandenburg'])
+
+    def test_weight(self):
+        self.index.add('Places', {'PlaceId': 'TXL-sky',
+                                  'PlaceName': 'Berlin Tegel'}, weight=5)
+        self.assertEqual(self.names('berl'), ['Berlin Tegel',
+                                              'Berlin Brandenburg'])
+
+    def test_merge(self):
+        self.assertEqual(len(self.names('ber')), 3)
+        self.index.add_response({'Places': [
+            {'PlaceId': 'BRE-sky', 'PlaceName': 'Bremen'},
+            {'PlaceId': 'AMS-sky', 'PlaceName': 'Amsterdam Schiphol'},
+        ]})
+        self.assertEqual(self.names('bre'), ['Bremen'])
+        self.assertEqual(self.names('sch'), ['Amsterdam Schiphol'])
+        self.assertEqual(self.index._terms, sorted(self.index._terms))
+
+    def test_short_query(self):
+        self.assertEqual(self.names('b'), ['Bern', 'Berlin Tegel',
+                                           'Berlin Brandenburg'])
+        self.assertEqual(self.names('b', limit=2), ['Bern', 'Berlin Tegel'])
+        self.assertEqual(self.names('b', section='Countries'), [])
+        self.assertTrue(('b', None) in self.index._short)
+        # Rankings of short queries follow the changes of the index.
+        self.index.add('Places', {'PlaceId': 'BER-sky',
+                                  'PlaceName': 'Berlin Brandenburg'},
+                       weight=5)
+        self.assertEqual(self.names('b'), ['Berlin Brandenburg', 'Bern',
+                                           'Berlin Tegel'])
+        self.index.add('Places', {'PlaceId': 'BSL-sky',
+                                  'PlaceName': 'Basel'}, weight=9)
+        self.assertEqual(self.names('b', limit=1), ['Basel'])
+        self.assertEqual(len(self.names('b', limit=100)), 4)
+
+    def test_xml(self):
+        index = AutosuggestIndex()
+        index.add_response(etree.fromstring(
+            '<AutoSuggestServiceResponseApiDto><Places><PlaceDto>'
+            '<PlaceId>KUL-sky</PlaceId>'
+            '<PlaceName>Kuala Lumpur International</PlaceName>'
+            '</PlaceDto></Places></AutoSuggestServiceResponseApiDto>'))
+        self.assertEqual(index.suggest('kua')[0]['PlaceId'], 'KUL-sky')
+
+    def test_save_load(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'autosuggest.idx')
+            self.index.save(path)
+            index = AutosuggestIndex.load(path)
+        finally:
+            shutil.rmtree(directory)
+        self.assertEqual(len(index), len(self.index))
+        self.assertEqual(index.suggest('ber'), self.index.suggest('ber'))
+
+    def test_lookup(self):
+        with FakeServer() as server:
+            flights_service = Flights('fake', api_host=server.url)
+            hotels_service = Hotels('fake', api_host=server.url)
+            params = dict(market='UK', currency='GBP', locale='en-GB')
+
+            places = self.index.lookup(flights_service, query='Ber', **params)
+            self.assertEqual(len(places), 3)
+            self.assertEqual(server.api.requests, 0)
+
+            places = self.index.lookup(flights_service, query='Kual',
+                                       **params)
+            self.assertEqual(places[0]['PlaceId'], 'KUL-sky')
+            self.assertEqual(server.api.requests, 1)
+            self.index.lookup(flights_service, query='Kua', **params)
+            self.assertEqual(server.api.requests, 1)
+
+            results = self.index.lookup(hotels_service, query='Kual',
+                                        **params)
+            self.assertEqual(results[0]['display_name'],
+                             'Kuala Lumpur, Malaysia')
+            self.assertEqual(server.api.requests, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,216 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_backends
+----------------------------------
+
+Tests for `skyscanner.backends` module.
+"""
+
+import threading
+import unittest
+
+import requests
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from skyscanner import backends
+from skyscanner.fakeapi import FakeServer, FakeSkyscannerAPI
+from skyscanner.skyscanner import STRICT, Flights, SearchContext
+
+
+class TestBackends(unittest.TestCase):
+
+    params = dict(country='UK', currency='GBP', locale='en-GB',
+                  originplace='SIN-sky', destinationplace='KUL-sky',
+                  outbounddate='2017-05-28', inbounddate='2017-05-31',
+                  adults=1)
+
+    def search(self, flights_service):
+        with SearchContext() as context:
+            poll_url = flights_service.create_session(context=context,
+                                                      **self.params)
+            result = flights_service.poll_session(
+                poll_url, initial_delay=0, delay=0, context=context)
+        self.assertTrue(flights_service.is_poll_complete(result))
+        return result
+
+    def test_requests(self):
+        with FakeServer(polls_to_complete=2) as server:
+            flights_service = Flights('fake', api_host=server.url)
+            self.assertTrue(isinstance(flights_service.backend,
+                                       backends.RequestsBackend))
+            result = self.search(flights_service)
+        self.assertEqual(result.headers['Content-Type'], 'application/json')
+
+    def test_stub(self):
+        api = FakeSkyscannerAPI(polls_to_complete=2)
+        flights_service = Flights('fake', api_host='http://stub',
+                                  backend=backends.StubBackend(api.handle))
+        result = self.search(flights_service)
+        self.assertTrue(result.url.startswith('http://stub/'))
+        self.assertEqual(result.headers['content-type'], 'application/json')
+        self.assertEqual(api.requests, 3)
+        with mock.patch('time.sleep'):
+            result = flights_service.get_cheapest_itineraries(
+                top=5, **self.params)
+        self.assertEqual(len(result.parsed['Itineraries']), 5)
+
+        api.throttle_rate = 1
+        result = flights_service.get_markets('en-GB')
+        self.assertEqual((result.status_code, result.reason),
+                         (429, 'Too Many Requests'))
+        self.assertRaises(requests.HTTPError, flights_service.make_request,
+                          flights_service.MARKET_SERVICE_URL + '/en-GB',
+                          errors=STRICT)
+
+    def test_per_thread(self):
+        backend = backends.RequestsBackend(per_thread=True)
+        with mock.patch('requests.Session.get') as get:
+            backend.request('get', 'http://stub/a')
+            backend.request('get', 'http://stub/b')
+        self.assertEqual(get.call_count, 2)
+        self.assertEqual(len(backend._sessions), 1)
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(backend._thread_session()))
+        thread.start()
+        thread.join()
+        self.assertFalse(sessions[0] is backend._thread_session())
+        with mock.patch('requests.Session.close') as close:
+            backend.close()
+        self.assertEqual(close.call_count, 2)
+        self.assertEqual(backend._sessions, [])
+
+    def test_create(self):
+        self.assertTrue(isinstance(backends.create('stub'),
+                                   backends.StubBackend))
+        self.assertRaises(ValueError, backends.create, 'curl')
+        if backends.httpx is None:
+            self.assertRaises(ImportError, backends.create, 'httpx')
+
+
+class FakeHttpx(object):
+
+    # Stands in for the 'httpx' module, which may not be installed.
+
+    class TransportError(Exception):
+        pass
+
+    class TimeoutException(TransportError):
+        pass
+
+    def __init__(self):
+        self.Client = mock.Mock()
+        self.Timeout = mock.Mock(side_effect=lambda *args, **kwargs: (
+            args, kwargs))
+        self.client = self.Client.return_value
+
+    def respond(self, content=b'', chunks=None, status=200,
+                reason='OK'):
+        response = mock.Mock(url='http://stub/a', status_code=status,
+                             content=content, reason_phrase=reason)
+        response.headers.multi_items.return_value = [
+            ('Content-Type', 'application/json'), ('Vary', 'Accept'),
+            ('Vary', 'Accept-Encoding')]
+        response.iter_bytes.return_value = iter(chunks or ())
+        self.client.send.return_value = response
+        return response
+
+
+class TestHttpxBackend(unittest.TestCase):
+
+    def setUp(self):
+        self.httpx = FakeHttpx()
+        patcher = mock.patch.object(backends, 'httpx', self.httpx)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.backend = backends.HttpxBackend(limits='limits')
+
+    def test_request(self):
+        self.httpx.Client.assert_called_once_with(http2=True,
+                                                  limits='limits')
+        self.httpx.respond(b'{"Status": "UpdatesComplete"}')
+        response = self.backend.request(
+            'get', 'http://stub/a', headers={'Accept': 'application/json'},
+            params={'apiKey': 'fake'}, timeout=(1, 5))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.reason, 'OK')
+        self.assertEqual(response.url, 'http://stub/a')
+        self.assertEqual(response.json(), {'Status': 'UpdatesComplete'})
+        self.assertEqual(response.headers['content-type'],
+                         'application/json')
+        self.assertEqual(response.headers['Vary'], 'Accept, Accept-Encoding')
+        self.httpx.Timeout.assert_called_once_with(5, connect=1)
+        args, options = self.httpx.client.build_request.call_args
+        self.assertEqual(args, ('GET', 'http://stub/a'))
+        self.assertEqual(options['params'], {'apiKey': 'fake'})
+        self.assertEqual(options['timeout'], ((5,), {'connect': 1}))
+        self.assertEqual(self.httpx.client.send.call_args[1],
+                         {'stream': False})
+
+        self.backend.request('get', 'http://stub/a', timeout=3)
+        self.httpx.Timeout.assert_called_with(3)
+
+        self.backend.close()
+        self.httpx.client.close.assert_called_once_with()
+
+    def test_stream(self):
+        response = self.httpx.respond(chunks=[b'{"Status": ', b'"Updates',
+                                              b'Complete"}'])
+        resp = self.backend.request('get', 'http://stub/a', stream=True)
+        self.assertEqual(self.httpx.client.send.call_args[1],
+                         {'stream': True})
+        self.assertEqual(response.iter_bytes.call_count, 1)
+        self.assertEqual(resp.raw.read(4), b'{"St')
+        self.assertEqual(b''.join(resp.iter_content(3)),
+                         b'atus": "UpdatesComplete"}')
+        resp.raw.close()
+        response.close.assert_called_once_with()
+
+    def test_errors(self):
+        for error, expected in (
+                (self.httpx.TimeoutException('timed out'), requests.Timeout),
+                (self.httpx.TransportError('refused'),
+                 requests.ConnectionError)):
+            self.httpx.client.send.side_effect = error
+            self.assertRaises(expected, self.backend.request,
+                              'get', 'http://stub/a')
+        self.httpx.client.send.side_effect = None
+
+        def chunks():
+            yield b'{'
+            raise self.httpx.TimeoutException('timed out')
+
+        response = self.httpx.respond()
+        response.iter_bytes.return_value = chunks()
+        resp = self.backend.request('get', 'http://stub/a', stream=True)
+        self.assertRaises(requests.Timeout, resp.raw.read)
+
+        self.httpx.respond(b'', status=503, reason='Service Unavailable')
+        resp = self.backend.request('get', 'http://stub/a')
+        self.assertEqual((resp.status_code, resp.reason),
+                         (503, 'Service Unavailable'))
+        self.assertRaises(requests.HTTPError, resp.raise_for_status)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,224 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_cache
+----------------------------------
+
+Tests for `skyscanner.cache` module.
+"""
+
+import threading
+import unittest
+from functools import partial
+
+from skyscanner.cache import CacheWarmer, ResponseCache
+from skyscanner.fakeapi import FakeServer
+from skyscanner.skyscanner import FlightsCache
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Parsed(object):
+
+    def __init__(self, parsed):
+        self.parsed = parsed
+
+
+class Fetch(object):
+
+    def __init__(self, event=None):
+        self.calls = 0
+        self.event = event
+
+    def __call__(self):
+        if self.event is not None:
+            self.event.wait(5)
+        self.calls += 1
+        return Parsed(self.calls)
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_ttl(self):
+        cache = ResponseCache(ttl=10, clock=self.clock)
+        fetch = Fetch()
+        self.assertEqual(cache.get('k', fetch).parsed, 1)
+        self.clock.now += 5
+        self.assertEqual(cache.get('k', fetch).parsed, 1)
+        self.clock.now += 5
+        self.assertEqual(cache.get('k', fetch).parsed, 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_not_cacheable(self):
+        cache = ResponseCache(ttl=10, clock=self.clock)
+        for n in range(2):
+            cache.get('k', lambda: Parsed(None))
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.misses, 2)
+
+    def test_stale_while_revalidate(self):
+        cache = ResponseCache(ttl=10, max_staleness=20, clock=self.clock)
+        self.assertEqual(cache.get('k', Fetch()).parsed, 1)
+        self.clock.now += 15
+
+        event = threading.Event()
+        fetch = Fetch(event)
+        for n in range(3):
+            # Stale response is returned at once, refreshed only once.
+            self.assertEqual(cache.get('k', fetch).parsed, 1)
+        event.set()
+        cache.join()
+        self.assertEqual(fetch.calls, 1)
+        self.assertEqual(cache.stale_hits, 3)
+        self.assertEqual(cache.get('k', fetch).parsed, 1)
+        self.assertEqual(cache.hits, 1)
+
+    def test_max_staleness(self):
+        cache = ResponseCache(ttl=10, max_staleness=20, clock=self.clock)
+        cache.get('k', Fetch())
+        self.clock.now += 30
+        fetch = Fetch()
+        fetch.calls = 1
+        self.assertEqual(cache.get('k', fetch).parsed, 2)
+        self.assertEqual(cache.stale_hits, 0)
+
+    def test_refresh_error(self):
+        cache = ResponseCache(ttl=10, max_staleness=20, clock=self.clock)
+        cache.get('k', Fetch())
+        self.clock.now += 15
+
+        def fail():
+            raise RuntimeError('Failed')
+
+        self.assertEqual(cache.get('k', fail).parsed, 1)
+        cache.join()
+        self.assertEqual(cache.refresh_errors, 1)
+
+    def test_max_size(self):
+        cache = ResponseCache(ttl=10, max_size=2, clock=self.clock)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get(key, Fetch())
+        self.assertEqual(len(cache), 2)
+        self.assertEqual(cache.get('a', Fetch()).parsed, 1)
+        self.assertEqual(cache.misses, 3)
+
+
+class TestCacheWarmer(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.cache = ResponseCache(ttl=100, clock=self.clock)
+
+    def test_queries(self):
+        fetch = Fetch()
+        warmer = CacheWarmer(self.cache, queries=[
+            partial(self.cache.get, 'k', fetch)], lead=10, clock=self.clock)
+        self.assertEqual(warmer.run_once(), 1)
+        self.assertEqual(fetch.calls, 1)
+
+        self.clock.now += 50
+        self.assertEqual(warmer.run_once(), 0)
+        self.clock.now += 45
+        self.assertEqual(warmer.run_once(), 1)
+        self.assertEqual(fetch.calls, 2)
+        self.assertEqual(self.cache.expires_in('k'), 100)
+
+    def test_learn(self):
+        fetches = dict((key, Fetch()) for key in 'abc')
+        for key, count in (('a', 3), ('b', 1), ('c', 2)):
+            for n in range(count):
+                self.cache.get(key, fetches[key])
+        self.assertEqual(self.cache.hot(2), ['a', 'c'])
+
+        self.clock.now += 95
+        warmer = CacheWarmer(self.cache, learn=2, rate=10, lead=10,
+                             clock=self.clock)
+        self.assertEqual(warmer.run_once(), 2)
+        self.assertEqual([fetches[key].calls for key in 'abc'], [2, 1, 2])
+
+    def test_rate(self):
+        fetch = Fetch()
+        for key in 'abcd':
+            self.cache.get(key, fetch)
+        self.clock.now += 100
+        warmer = CacheWarmer(self.cache, learn=4, rate=2, clock=self.clock)
+        self.assertEqual(warmer.run_once(), 2)
+        self.assertEqual(warmer.run_once(), 0)
+        self.clock.now += 1
+        self.assertEqual(warmer.run_once(), 2)
+        self.assertEqual(warmer.refreshes, 4)
+
+    def test_rate_queries(self):
+        fetches = dict((key, Fetch()) for key in 'abc')
+        warmer = CacheWarmer(self.cache, queries=[
+            partial(self.cache.get, key, fetches[key]) for key in 'abc'],
+            rate=2, clock=self.clock)
+        self.assertEqual(warmer.run_once(), 2)
+        self.assertEqual(warmer.refreshes, 2)
+        self.clock.now += 1
+        self.assertEqual(warmer.run_once(), 1)
+        self.assertEqual(warmer.refreshes, 3)
+        self.assertEqual([fetches[key].calls for key in 'abc'], [1, 1, 1])
+
+    def test_start(self):
+        cache = ResponseCache(ttl=60)
+        with FakeServer() as server:
+            flights_cache_service = FlightsCache('fake', cache=cache,
+                                                 api_host=server.url)
+            warmer = CacheWarmer(cache, queries=[
+                partial(flights_cache_service.get_markets, 'en-GB'),
+                partial(flights_cache_service.location_autosuggest,
+                        market='UK', currency='GBP', locale='en-GB',
+                        query='KUL')], rate=10, interval=0.01).start()
+            warmer.stop()
+            self.assertEqual(warmer.refreshes, 2)
+            flights_cache_service.get_markets('en-GB')
+            self.assertEqual(server.api.requests, 2)
+        self.assertEqual(cache.hits, 1)
+
+
+class TestFlightsCache(unittest.TestCase):
+
+    def test_browse(self):
+        cache = ResponseCache(ttl=60)
+        params = dict(market='GB', currency='GBP', locale='en-GB',
+                      originplace='SIN', destinationplace='KUL',
+                      outbounddate='2017-05', inbounddate='2017-06')
+        with FakeServer() as server:
+            flights_cache_service = FlightsCache('fake', cache=cache,
+                                                 api_host=server.url)
+            first = flights_cache_service.get_cheapest_quotes(**params)
+            second = flights_cache_service.get_cheapest_quotes(**params)
+            flights_cache_service.get_cheapest_price_by_date(**params)
+            self.assertTrue(first is second)
+            self.assertEqual(server.api.requests, 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_concurrency
+----------------------------------
+
+Stress tests of services shared by many threads,
+against a local fake API server.
+"""
+
+import copy
+import threading
+import unittest
+
+from skyscanner.backends import RequestsBackend
+from skyscanner.cache import ResponseCache
+from skyscanner.fakeapi import FakeServer
+from skyscanner.interning import InternTable
+from skyscanner.keypool import ApiKeyPool
+from skyscanner.retry import RetryBudget, RetryPolicy
+from skyscanner.scheduler import AdaptiveConcurrency, RequestScheduler
+from skyscanner.skyscanner import (STRICT, Flights, FlightsCache,
+                                   SearchContext)
+
+THREADS = 16
+ROUNDS = 4
+ORIGINS = ('SIN-sky', 'KUL-sky', 'BKK-sky', 'HKT-sky')
+
+
+def run_threads(target, threads=THREADS):
+    # Runs target(n) in threads started together, returns their errors.
+    errors = []
+    barrier = threading.Event()
+
+    def run(n):
+        barrier.wait()
+        try:
+            target(n)
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=run, args=(n,))
+               for n in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.set()
+    for worker in workers:
+        worker.join(60)
+    return errors
+
+
+class TestConcurrency(unittest.TestCase):
+
+    route = dict(market='UK', currency='GBP', locale='en-GB')
+
+    def setUp(self):
+        self.server = FakeServer(polls_to_complete=2, itineraries=10,
+                                 latency=(0, 0.01)).start()
+        self.addCleanup(self.server.stop)
+
+    def search_params(self, n):
+        return dict(country='UK', currency='GBP', locale='en-GB',
+                    originplace=ORIGINS[n % len(ORIGINS)],
+                    destinationplace=ORIGINS[(n + 1) % len(ORIGINS)],
+                    outbounddate='2017-05-%02d' % (n % 28 + 1), adults=1)
+
+    def test_shared_flights(self):
+        flights_service = Flights(
+            'fake', api_host=self.server.url,
+            backend=RequestsBackend(per_thread=True),
+            intern_table=InternTable(),
+            scheduler=RequestScheduler(concurrency=8),
+            limiter=AdaptiveConcurrency(initial=8),
+            retry_policy=RetryPolicy(budget=RetryBudget(min_per_second=100)))
+        self.addCleanup(flights_service.backend.close)
+        shared = [self.search_params(n) for n in range(THREADS)]
+        expected = copy.deepcopy(shared)
+
+        def search(n):
+            for round in range(ROUNDS):
+                params = shared[n]
+                with SearchContext(budget=30) as context:
+                    poll_url = flights_service.create_session(
+                        context=context, **params)
+                    result = flights_service.poll_session(
+                        poll_url, initial_delay=0, delay=0,
+                        errors=STRICT, context=context)
+                query = result.parsed['Query']
+                # Every thread gets the results of its own search.
+                self.assertEqual(
+                    (query['originplace'], query['outbounddate']),
+                    (params['originplace'], params['outbounddate']))
+                self.assertEqual(len(result.parsed['Itineraries']), 10)
+
+        self.assertEqual(run_threads(search), [])
+        # Request parameters are left unchanged.
+        self.assertEqual(shared, expected)
+        self.assertEqual(self.server.api.requests, THREADS * ROUNDS * 3)
+
+    def test_shared_flights_cache(self):
+        cache = ResponseCache(ttl=60)
+        keys = ['key%s' % n for n in range(3)]
+        service = FlightsCache(key_pool=ApiKeyPool(keys),
+                               api_host=self.server.url, cache=cache)
+        params = dict(self.route, originplace='SIN-sky',
+                      destinationplace='KUL-sky')
+        results = {}
+        lock = threading.Lock()
+
+        def browse(n):
+            for round in range(ROUNDS):
+                month = '2017-%02d' % ((n + round) % 6 + 1)
+                resp = service.get_cheapest_quotes(outbounddate=month,
+                                                   **params)
+                quotes = resp.parsed['Quotes']
+                with lock:
+                    results.setdefault(month, []).append(quotes)
+                calendar = service.get_price_calendar(month, **params)
+                self.assertEqual(len(calendar.failed), 0)
+
+        self.assertEqual(run_threads(browse), [])
+        for month, responses in results.items():
+            # The cached response of the month, whichever thread fetched it.
+            self.assertTrue(all(quotes == responses[0]
+                                for quotes in responses))
+        self.assertEqual(sorted(results), ['2017-%02d' % (n + 1)
+                                           for n in range(6)])
+        self.assertTrue(cache.hits > 0)
+        self.assertEqual(cache.hits + cache.misses, THREADS * ROUNDS * 2)
+        self.assertEqual(self.server.api.requests, cache.misses)
+        self.assertEqual(sum(s['requests'] for s in
+                             service.key_pool.stats().values()),
+                         self.server.api.requests)
+
+    def test_shared_search_context(self):
+        # Threads of a search get their own connection pools.
+        flights_service = Flights('fake', api_host=self.server.url)
+        pools = []
+        with SearchContext() as context:
+            def sessions(n):
+                for round in range(ROUNDS):
+                    flights_service.create_session(context=context,
+                                                   **self.search_params(n))
+                pools.append(context.pool(flights_service.backend))
+
+            self.assertEqual(run_threads(sessions, threads=4), [])
+        self.assertEqual(len(set(id(pool) for pool in pools)), 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_export
+----------------------------------
+
+Tests for `skyscanner.export` module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from skyscanner import export
+from skyscanner.interning import InternTable
+
+PARSED = {
+    'Status': 'UpdatesComplete',
+    'Query': {'Currency': 'GBP'},
+    'Quotes': [
+        {'QuoteId': 1, 'MinPrice': 35.0, 'Direct': True,
+         'OutboundLeg': {'CarrierIds': [1], 'OriginId': 1}},
+        {'QuoteId': 2, 'MinPrice': 72.5, 'Direct': False,
+         'OutboundLeg': {'CarrierIds': [2, 3], 'OriginId': 2}},
+    ],
+    'Places': [{'PlaceId': 1, 'Name': 'Singapore'},
+               {'PlaceId': 2, 'Name': 'Kuala Lumpur'}],
+    'Dates': [[None, '2017-05-01'], ['2017-05-01', {'MinPrice': 1}]],
+    'Currencies': [],
+}
+
+
+class TestExport(unittest.TestCase):
+
+    def test_unknown_format(self):
+        self.assertRaises(ValueError, export.dumps, PARSED, 'xml')
+        self.assertRaises(ValueError, export.loads, b'', 'xml')
+        self.assertRaises(TypeError, export.dumps, [], export.MSGPACK)
+
+    @unittest.skipIf(export.msgpack is None, 'msgpack is not installed')
+    def test_msgpack(self):
+        data = export.dumps(PARSED)
+        self.assertEqual(export.loads(data), PARSED)
+
+        interned = InternTable().intern(dict(PARSED))
+        self.assertEqual(export.loads(export.dumps(interned)), PARSED)
+
+    @unittest.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+    def test_arrow(self):
+        data = export.dumps(PARSED, export.ARROW)
+        buf = export.pyarrow.py_buffer(data)
+        result = export.loads(buf, export.ARROW)
+
+        self.assertEqual(result['Status'], 'UpdatesComplete')
+        self.assertEqual(result['Query'], PARSED['Query'])
+        self.assertEqual(result['Dates'], PARSED['Dates'])
+        self.assertEqual(result['Currencies'], [])
+        self.assertEqual(result['Quotes'].to_pylist(), PARSED['Quotes'])
+        self.assertEqual(result['Places'].num_rows, 2)
+
+        # Numeric columns reference the exported data without copying.
+        prices = result['Quotes'].column('MinPrice').chunk(0)
+        self.assertEqual(prices.to_pylist(), [35.0, 72.5])
+        address = prices.buffers()[1].address
+        self.assertTrue(buf.address <= address < buf.address + buf.size)
+
+        self.assertRaises(ValueError, export.loads, b'x' * 16, export.ARROW)
+
+    @unittest.skipIf(export.pyarrow is None, 'pyarrow is not installed')
+    def test_arrow_file(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'result.arrow')
+            export.write_arrow(path, PARSED)
+            result = export.read_arrow(path)
+            self.assertEqual(result['Quotes'].column('QuoteId').to_pylist(),
+                             [1, 2])
+            del result
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,117 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_filters
+----------------------------------
+
+Tests for `skyscanner.filters` module.
+"""
+
+import unittest
+
+from skyscanner.filters import ItineraryTable
+
+
+def leg(leg_id, origin, destination, departure, arrival, duration, stops,
+        carriers):
+    return {'Id': leg_id, 'OriginStation': origin,
+            'DestinationStation': destination,
+            'Departure': '2017-05-28T%s:00' % departure,
+            'Arrival': '2017-05-28T%s:00' % arrival, 'Duration': duration,
+            'Stops': stops, 'Carriers': carriers}
+
+
+PARSED = {
+    'Itineraries': [
+        {'OutboundLegId': 'o1', 'InboundLegId': 'i1',
+         'PricingOptions': [{'Price': 420.0}, {'Price': 400.0}]},
+        {'OutboundLegId': 'o2', 'InboundLegId': 'i2',
+         'PricingOptions': [{'Price': 350.0}]},
+        {'OutboundLegId': 'o3', 'InboundLegId': 'i3',
+         'PricingOptions': [{'Price': 510.0}]},
+        {'OutboundLegId': 'o4', 'PricingOptions': [{'Price': 200.0}]},
+    ],
+    'Legs': [
+        leg('o1', 1, 2, '08:00', '10:00', 120, [], [1]),
+        leg('i1', 2, 1, '19:00', '21:00', 120, [], [1]),
+        leg('o2', 1, 2, '13:30', '19:30', 360, [3], [2, 3]),
+        leg('i2', 2, 1, '09:00', '15:00', 360, [3], [3]),
+        leg('o3', 4, 2, '22:00', '23:50', 110, [], [3]),
+        leg('i3', 2, 4, '07:00', '09:00', 120, [], [3]),
+        leg('o4', 1, 2, '06:15', '20:15', 840, [3, 5], [2]),
+    ],
+    'Carriers': [{'Id': 1, 'Code': 'MH'}, {'Id': 2, 'Code': 'SQ'},
+                 {'Id': 3, 'Code': 'BA'}],
+    'Places': [{'Id': 1, 'Code': 'SIN'}, {'Id': 2, 'Code': 'KUL'},
+               {'Id': 3, 'Code': 'BKK'}, {'Id': 4, 'Code': 'XSP'},
+               {'Id': 5, 'Code': 'HKG'}],
+}
+
+
+class TestItineraryTable(unittest.TestCase):
+
+    def setUp(self):
+        self.table = ItineraryTable(PARSED)
+
+    def test_columns(self):
+        self.assertEqual(len(self.table), 4)
+        self.assertEqual(list(self.table.price), [400.0, 350.0, 510.0, 200.0])
+        self.assertEqual(list(self.table.duration), [240, 720, 230, 840])
+        self.assertEqual(self.table.carrier, ['MH', 'SQ', 'BA', 'SQ'])
+        self.assertEqual(ItineraryTable({}).select(stops=0), [])
+
+    def test_filters(self):
+        select = self.table.select
+        self.assertEqual(select(), [0, 1, 2, 3])
+        self.assertEqual(select(stops=0), [0, 2])
+        self.assertEqual(select(stops='1'), [1])
+        self.assertEqual(select(duration=360), [0, 1, 2])
+        self.assertEqual(select(includecarriers='BA;SQ'), [1, 2, 3])
+        self.assertEqual(select(includecarriers=['BA']), [2])
+        self.assertEqual(select(excludecarriers='MH;QF'), [1, 2, 3])
+        self.assertEqual(select(originairports='XSP;KUL'), [2])
+        self.assertEqual(select(destinationairports='KUL'), [0, 1, 2, 3])
+        self.assertEqual(select(outbounddeparttime='M'), [0, 3])
+        self.assertEqual(select(outbounddeparttime='A;E'), [1, 2])
+        self.assertEqual(select(inbounddeparttime='E'), [0])
+        self.assertEqual(select(outbounddepartstarttime='07:00',
+                                outbounddepartendtime='14:00'), [0, 1])
+        self.assertEqual(select(inbounddepartendtime='10:00'), [1, 2])
+        self.assertEqual(select(stops=0, excludecarriers='BA'), [0])
+
+    def test_sort(self):
+        select = self.table.select
+        self.assertEqual(select(sorttype='price'), [3, 1, 0, 2])
+        self.assertEqual(select(sorttype='price', sortorder='desc'),
+                         [2, 0, 1, 3])
+        self.assertEqual(select(sorttype='duration'), [2, 0, 1, 3])
+        self.assertEqual(select(sorttype='carrier'), [2, 0, 1, 3])
+        self.assertEqual(select(sorttype='outbounddeparttime'), [3, 0, 1, 2])
+        self.assertEqual(select(sorttype='inboundarrivetime',
+                                excludecarriers='SQ'), [2, 0])
+        self.assertRaises(ValueError, select, sorttype='stops')
+
+    def test_filter(self):
+        itineraries = self.table.filter(stops=0, sorttype='price',
+                                        market='UK', currency='GBP')
+        self.assertEqual([i['OutboundLegId'] for i in itineraries],
+                         ['o1', 'o3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,144 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_history
+----------------------------------
+
+Tests for `skyscanner.history` module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+from functools import partial
+
+from skyscanner.cache import CacheWarmer, ResponseCache
+from skyscanner.fakeapi import FakeServer
+from skyscanner.history import PriceHistory
+from skyscanner.skyscanner import Flights, FlightsCache
+
+
+class TestPriceHistory(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_prices(self):
+        with PriceHistory(self.path, reindex_every=4) as history:
+            history.extend([
+                ('LHR-KUL', '2017-05-03', 'MH', 420.0, 1.0),
+                ('LHR-KUL', '2017-05-01', 'BA', 510.0, 2.0),
+                ('LHR-SIN', '2017-05-02', 'SQ', 390.0, 3.0),
+                ('LHR-KUL', '2017-06-01', 'MH', 450.0, 4.0),
+            ])
+            history.append('LHR-KUL', '2017-05-02T10:00:00', 'BA', 480.0, 5.0)
+            self.assertEqual(len(history), 5)
+
+            prices = history.prices('LHR-KUL', start='2017-05-01',
+                                    end='2017-05')
+            self.assertEqual([(p.date, p.carrier, p.price) for p in prices], [
+                ('2017-05-01', 'BA', 510.0),
+                ('2017-05-02', 'BA', 480.0),
+                ('2017-05-03', 'MH', 420.0)])
+            self.assertEqual(
+                [p.date for p in history.prices('LHR-KUL', carrier='MH')],
+                ['2017-05-03', '2017-06-01'])
+            self.assertEqual(history.prices('LHR-KUL', end='2017-04'), [])
+            self.assertEqual(history.prices('LHR-BKK'), [])
+            self.assertEqual(history.prices('LHR-KUL', carrier='QF'), [])
+            self.assertEqual(history.routes(), ['LHR-KUL', 'LHR-SIN'])
+
+        with PriceHistory(self.path) as history:
+            self.assertEqual(len(history), 5)
+            self.assertEqual(len(history.prices('LHR-KUL')), 4)
+            history.append('LHR-KUL', '2017-05-01', 'MH', 400.0)
+            self.assertEqual(
+                [p.price for p in history.prices('LHR-KUL', '2017-05-01',
+                                                 '2017-05-01')],
+                [510.0, 400.0])
+
+    def test_recovery(self):
+        history = PriceHistory(self.path)
+        history.append('LHR-KUL', '2017-05-01', 'MH', 400.0)
+        history.reindex()
+        history.append('LHR-KUL', '2017-05-02', 'MH', 410.0)
+        history.close()
+
+        # A partially written record is dropped and the stale index,
+        # covering more records than the log holds, is rebuilt.
+        log_path = os.path.join(self.path, 'prices.log')
+        size = os.path.getsize(log_path)
+        with open(log_path, 'r+b') as f:
+            f.truncate(size // 2 + 3)
+        with PriceHistory(self.path) as history:
+            self.assertEqual(len(history), 1)
+            history.append('LHR-KUL', '2017-05-03', 'MH', 420.0)
+            self.assertEqual([p.price for p in history.prices('LHR-KUL')],
+                             [400.0, 420.0])
+
+    def test_add_response(self):
+        params = dict(market='GB', currency='GBP', locale='en-GB',
+                      originplace='SIN', destinationplace='KUL',
+                      outbounddate='2017-05', inbounddate='2017-06')
+        with FakeServer() as server, PriceHistory(self.path) as history:
+            flights_cache_service = FlightsCache(
+                'fake', api_host=server.url, history=history,
+                cache=ResponseCache())
+            quotes = flights_cache_service.get_cheapest_quotes(**params)
+            flights_cache_service.get_cheapest_quotes(**params)
+            self.assertEqual(len(history), len(quotes.parsed['Quotes']))
+            # Warm refreshes of the cached response record no quote again.
+            warmer = CacheWarmer(flights_cache_service.cache, queries=[
+                partial(flights_cache_service.get_cheapest_quotes,
+                        **params)], rate=10,
+                lead=flights_cache_service.cache.ttl)
+            self.assertEqual(warmer.run_once(), 2)
+            self.assertEqual(warmer.run_once(), 1)
+            self.assertEqual(server.api.requests, 3)
+            self.assertEqual(len(history), len(quotes.parsed['Quotes']))
+            quote = quotes.parsed['Quotes'][0]['OutboundLeg']
+            places = dict((p['PlaceId'], p['SkyscannerCode'])
+                          for p in quotes.parsed['Places'])
+            route = '%s-%s' % (places[quote['OriginId']],
+                               places[quote['DestinationId']])
+            self.assertIn(quote['DepartureDate'][:10],
+                          [p.date for p in history.prices(route)])
+
+            flights_service = Flights('fake', api_host=server.url,
+                                      history=history)
+            poll_url = flights_service.create_session(
+                country='UK', currency='GBP', locale='en-GB',
+                originplace='SIN-sky', destinationplace='KUL-sky',
+                outbounddate='2017-05-28', adults=1)
+            result = flights_service.poll_session(
+                poll_url, initial_delay=0, delay=0)
+            prices = history.prices('SIN-KUL', start='2017-05-28',
+                                    end='2017-05-28')
+            self.assertTrue(prices)
+            self.assertEqual(
+                min(p.price for p in prices),
+                min(o['Price'] for i in result.parsed['Itineraries']
+                    for o in i['PricingOptions']))
+
+
+if __name__ == '__main__':
+    unittest.main()
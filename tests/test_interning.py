@@ -0,0 +1,111 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_interning
+----------------------------------
+
+Tests for `skyscanner.interning` module.
+"""
+
+import json
+import pickle
+import unittest
+
+from skyscanner.fakeapi import FakeServer
+from skyscanner.interning import FrozenDict, InternTable
+from skyscanner.skyscanner import Flights, FlightsCache
+
+
+class TestFrozenDict(unittest.TestCase):
+
+    def test_immutable(self):
+        frozen = FrozenDict(a=1)
+        self.assertRaises(TypeError, frozen.__setitem__, 'a', 2)
+        self.assertRaises(TypeError, frozen.update, {'b': 2})
+        self.assertRaises(TypeError, frozen.pop, 'a')
+        self.assertEqual(hash(frozen), hash(FrozenDict(a=1)))
+        self.assertEqual(pickle.loads(pickle.dumps(frozen)), frozen)
+        self.assertEqual(json.dumps(frozen), '{"a": 1}')
+
+
+class TestInternTable(unittest.TestCase):
+
+    def response(self):
+        return json.loads(json.dumps({
+            'Status': 'UpdatesComplete',
+            'Places': [{'Id': 1, 'Code': 'SIN', 'Name': 'Singapore'},
+                       {'Id': 2, 'Code': 'KUL', 'Name': 'Kuala Lumpur'}],
+            'Carriers': [{'Id': 1, 'Code': 'MH', 'Stops': [1, 2]}],
+        }))
+
+    def test_intern(self):
+        table = InternTable()
+        first = table.intern(self.response())
+        second = table.intern(self.response())
+
+        self.assertTrue(first['Places'][0] is second['Places'][0])
+        self.assertTrue(first['Carriers'][0] is second['Carriers'][0])
+        self.assertEqual(first['Carriers'][0]['Stops'], (1, 2))
+        self.assertTrue(isinstance(first['Places'][1], FrozenDict))
+        self.assertEqual(first['Status'], 'UpdatesComplete')
+
+        stats = table.stats()
+        self.assertEqual(stats['entities'], 3)
+        self.assertEqual(stats['hits'], 3)
+        self.assertTrue(stats['saved_bytes'] > 0)
+
+    def test_max_size(self):
+        table = InternTable(max_size=1)
+        first = table.intern(self.response())
+        second = table.intern(self.response())
+        self.assertTrue(first['Places'][0] is second['Places'][0])
+        self.assertFalse(first['Places'][1] is second['Places'][1])
+        self.assertEqual(first['Places'][1], second['Places'][1])
+
+        strings = table.stats()['strings']
+        table.intern({'Places': [{'Id': n, 'Name': 'Place %s' % n}
+                                 for n in range(1000)]})
+        stats = table.stats()
+        self.assertEqual(stats['entities'], 1)
+        # Strings of entities left out of the full table are not kept.
+        self.assertEqual(stats['strings'], strings)
+
+    def test_shared_between_services(self):
+        table = InternTable()
+        params = dict(market='GB', currency='GBP', locale='en-GB',
+                      originplace='SIN', destinationplace='KUL',
+                      outbounddate='2017-05')
+        with FakeServer() as server:
+            first = FlightsCache('fake', api_host=server.url,
+                                 intern_table=table).get_cheapest_quotes(
+                                     **params).parsed
+            second = FlightsCache('fake', api_host=server.url,
+                                  intern_table=table).get_cheapest_quotes(
+                                      **params).parsed
+            markets = Flights('fake', api_host=server.url,
+                              intern_table=table).get_markets('en-GB').parsed
+
+        self.assertTrue(first['Places'][0] is second['Places'][0])
+        self.assertFalse(first['Quotes'][0] is second['Quotes'][0])
+        self.assertFalse(isinstance(markets['Countries'][0], FrozenDict))
+        self.assertEqual(table.stats()['hits'],
+                         len(first['Places']) + len(first['Carriers']))
+
+
+if __name__ == '__main__':
+    unittest.main()
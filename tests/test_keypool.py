@@ -0,0 +1,131 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_keypool
+----------------------------------
+
+Tests for `skyscanner.keypool` module.
+"""
+
+import unittest
+
+from skyscanner.fakeapi import FakeServer
+from skyscanner.keypool import ApiKeyPool
+from skyscanner.skyscanner import (BudgetExceeded, Flights, FlightsCache,
+                                   SearchContext)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestApiKeyPool(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+
+    def test_balancing(self):
+        pool = ApiKeyPool(['a', 'b', 'c'], clock=self.clock)
+        self.assertEqual([pool.acquire() for n in range(6)],
+                         ['a', 'b', 'c', 'a', 'b', 'c'])
+        self.assertRaises(ValueError, ApiKeyPool, [])
+
+    def test_rate(self):
+        pool = ApiKeyPool({'a': 1, 'b': 2}, clock=self.clock)
+        self.assertEqual(sorted(pool.acquire() for n in range(3)),
+                         ['a', 'b', 'b'])
+        with SearchContext(budget=0.05) as context:
+            self.assertRaises(BudgetExceeded, pool.acquire, context=context)
+        self.clock.now += 0.5
+        self.assertEqual(pool.acquire(), 'b')
+
+    def test_cooldown(self):
+        pool = ApiKeyPool(['a', 'b'], cooldown=10, clock=self.clock)
+        pool.report('a', 429)
+        self.assertEqual([pool.acquire() for n in range(3)], ['b'] * 3)
+        self.assertEqual(pool.stats()['a'],
+                         {'requests': 0, 'throttled': 1,
+                          'cooling_down': True})
+        self.clock.now += 10
+        self.assertEqual(pool.acquire(), 'a')
+        # Consecutive 429s double the cooldown.
+        pool.report('a', 429)
+        self.clock.now += 10
+        self.assertEqual(pool.acquire(), 'b')
+        self.clock.now += 10
+        self.assertEqual(pool.acquire(), 'a')
+        pool.report('a', 200)
+        pool.report('a', 429)
+        self.clock.now += 10
+        self.assertEqual(pool.acquire(), 'a')
+
+    def test_pinning(self):
+        pool = ApiKeyPool(['a', 'b'], max_pins=2, clock=self.clock)
+        pool.report('a', 429)
+        pool.pin('http://host/apiservices/pricing/v1.0/s1', 'a')
+        # Pinned URLs stick to their key, even while it cools down.
+        self.assertEqual(pool.acquire('http://host/apiservices/pricing/'
+                                      'v1.0/s1?apiKey=a'), 'a')
+        self.assertEqual(pool.key_for('/apiservices/pricing/v1.0/s1/'
+                                      'booking/o;i'), 'a')
+        self.assertEqual(pool.acquire('http://host/apiservices/pricing/'
+                                      'v1.0/s2'), 'b')
+        pool.pin('/apiservices/pricing/v1.0/s2', 'b')
+        pool.pin('/apiservices/pricing/v1.0/s3', 'b')
+        self.assertEqual(pool.key_for('/apiservices/pricing/v1.0/s1'), None)
+        self.assertEqual(pool.key_for('/apiservices/pricing/v1.0/s2'), 'b')
+
+    def test_services(self):
+        pool = ApiKeyPool(['throttled', 'key1', 'key2'])
+        params = dict(country='UK', currency='GBP', locale='en-GB',
+                      originplace='SIN-sky', destinationplace='KUL-sky',
+                      outbounddate='2017-05-28', inbounddate='2017-05-31',
+                      adults=1)
+        with FakeServer(polls_to_complete=2,
+                        throttled_keys=['throttled']) as server:
+            flights_service = Flights(key_pool=pool, api_host=server.url)
+            flights_cache_service = FlightsCache(key_pool=pool,
+                                                 api_host=server.url)
+            self.assertEqual(flights_service.api_key, 'throttled')
+            flights_service.get_markets('en-GB')
+            for n in range(4):
+                poll_url = flights_service.create_session(**params)
+                result = flights_service.poll_session(
+                    poll_url, initial_delay=0, delay=0)
+                self.assertTrue(flights_service.is_poll_complete(result))
+                flights_cache_service.get_cheapest_quotes(
+                    market='GB', currency='GBP', locale='en-GB',
+                    originplace='SIN', destinationplace='KUL',
+                    outbounddate='2017-05')
+            itinerary = result.parsed['Itineraries'][0]
+            self.assertEqual(len(list(flights_service.get_booking_details(
+                poll_url, [itinerary], delay=0))), 1)
+            requests_by_key = server.api.requests_by_key
+        self.assertEqual(requests_by_key['throttled'], 1)
+        self.assertTrue(requests_by_key['key1'] > 6)
+        self.assertTrue(requests_by_key['key2'] > 6)
+        self.assertRaises(ValueError, Flights)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,179 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_loadtest
+----------------------------------
+
+Tests for `skyscanner.fakeapi` and `skyscanner.loadtest` modules.
+"""
+
+import unittest
+
+from requests import HTTPError
+
+from skyscanner.fakeapi import FakeServer, FakeSkyscannerAPI
+from skyscanner.loadtest import LoadTest, percentile
+from skyscanner.skyscanner import (STRICT, CarHire, Flights, FlightsCache,
+                                   Hotels)
+
+
+class FakeServerTestCase(unittest.TestCase):
+
+    api_key = 'fake'
+    server_options = dict(polls_to_complete=2)
+
+    def setUp(self):
+        self.server = FakeServer(**self.server_options).start()
+
+    def tearDown(self):
+        self.server.stop()
+
+
+class TestFakeServer(FakeServerTestCase):
+
+    def test_flights(self):
+        flights_service = Flights(self.api_key, api_host=self.server.url)
+        poll_url = flights_service.create_session(
+            country='UK',
+            currency='GBP',
+            locale='en-GB',
+            originplace='SIN-sky',
+            destinationplace='KUL-sky',
+            outbounddate='2017-05-28',
+            inbounddate='2017-05-31',
+            adults=1)
+        self.assertTrue(poll_url.startswith(self.server.url))
+
+        first = flights_service.make_request(poll_url).parsed
+        self.assertEqual(first['Status'], 'UpdatesPending')
+        result = flights_service.poll_session(
+            poll_url, initial_delay=0, delay=0).parsed
+        self.assertEqual(result['Status'], 'UpdatesComplete')
+        self.assertTrue(
+            len(first['Itineraries']) < len(result['Itineraries']))
+
+        booking_url = flights_service.request_booking_details(
+            poll_url,
+            outboundlegid=result['Itineraries'][0]['OutboundLegId'],
+            inboundlegid=result['Itineraries'][0]['InboundLegId'])
+        booking = flights_service.make_request(booking_url).parsed
+        self.assertTrue(len(booking['BookingOptions']) > 0)
+
+    def test_hotels_and_carhire(self):
+        hotels_service = Hotels(self.api_key, api_host=self.server.url)
+        poll_url = hotels_service.create_session(
+            market='UK',
+            currency='GBP',
+            locale='en-GB',
+            entityid=27543923,
+            checkindate='2017-05-26',
+            checkoutdate='2017-05-30',
+            guests=1,
+            rooms=1)
+        result = hotels_service.poll_session(poll_url, initial_delay=0,
+                                             delay=0)
+        self.assertTrue(hotels_service.is_poll_complete(result))
+
+        carhire_service = CarHire(self.api_key, api_host=self.server.url)
+        poll_url = carhire_service.create_session(
+            market='UK',
+            currency='GBP',
+            locale='en-GB',
+            pickupplace='LHR-sky',
+            dropoffplace='LHR-sky',
+            pickupdatetime='2017-05-29T12:00',
+            dropoffdatetime='2017-05-29T18:00',
+            driverage='30',
+            userip='175.156.244.174')
+        result = carhire_service.poll_session(poll_url, initial_delay=0,
+                                              delay=0)
+        self.assertTrue(carhire_service.is_poll_complete(result))
+
+    def test_browse(self):
+        flights_cache_service = FlightsCache(self.api_key,
+                                             api_host=self.server.url)
+        result = flights_cache_service.get_cheapest_quotes(
+            market='GB',
+            currency='GBP',
+            locale='en-GB',
+            originplace='SIN',
+            destinationplace='KUL',
+            outbounddate='2017-05',
+            inbounddate='2017-06').parsed
+        self.assertTrue(len(result['Quotes']) > 0)
+        self.assertTrue(len(flights_cache_service.get_markets(
+            'en-GB').parsed['Countries']) > 0)
+
+    def test_validation_errors(self):
+        flights_service = Flights(self.api_key, api_host=self.server.url)
+        try:
+            flights_service.location_autosuggest(
+                market='UK', currency='GBP', locale='en-GB')
+            self.fail('HTTPError was not raised')
+        except HTTPError as e:
+            self.assertEqual(e.response.status_code, 400)
+            self.assertTrue('Missing required parameter' in str(e))
+
+
+class TestFakeSkyscannerAPI(unittest.TestCase):
+
+    def test_throttling(self):
+        api = FakeSkyscannerAPI(throttle_rate=1)
+        status, headers, body = api.handle(
+            'GET', '/apiservices/reference/v1.0/countries/en-GB?apiKey=1')
+        self.assertEqual(status, 429)
+
+    def test_error_rate(self):
+        api = FakeSkyscannerAPI(error_rate=0.5, seed=1)
+        statuses = [api.handle(
+            'GET', '/apiservices/reference/v1.0/countries/en-GB?apiKey=1')[0]
+            for n in range(100)]
+        self.assertTrue(0 < statuses.count(500) < 100)
+        self.assertEqual(statuses.count(500) + statuses.count(200), 100)
+
+
+class TestLoadTest(FakeServerTestCase):
+
+    server_options = dict(polls_to_complete=2, throttle_rate=0.05, seed=1)
+
+    def test_run(self):
+        report = LoadTest(self.server.url, searches=9, concurrency=3,
+                          poll_options=dict(delay=0.01)).run()
+        self.assertEqual(report.completed + report.failed, 9)
+        self.assertTrue(report.completed > 0)
+        self.assertTrue(report.throughput > 0)
+        self.assertTrue(report.percentiles()[50] > 0)
+        self.assertTrue('searches completed' in str(report))
+
+    def test_strict_errors_are_reported(self):
+        self.server.api.throttle_rate = 1
+        report = LoadTest(self.server.url, searches=3, concurrency=3,
+                          verticals=('flights',),
+                          poll_options=dict(errors=STRICT)).run()
+        self.assertEqual(report.failed, 3)
+
+    def test_percentile(self):
+        self.assertEqual(percentile([], 50), None)
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile(values, 100), 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_multileg
+----------------------------------
+
+Tests for `skyscanner.multileg` module.
+"""
+
+import itertools
+import random
+import time
+import unittest
+
+import requests
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from skyscanner.backends import StubBackend
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.multileg import cheapest_combinations, combine
+from skyscanner.skyscanner import Flights, SearchContext
+
+
+def itinerary(*prices):
+    return {'PricingOptions': [{'Price': p} for p in prices]}
+
+
+class TestMultiLeg(unittest.TestCase):
+
+    legs = [{'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+             'outbounddate': '2017-05-28'},
+            {'originplace': 'KUL-sky', 'destinationplace': 'BKK-sky',
+             'outbounddate': '2017-06-02'},
+            {'originplace': 'HKT-sky', 'destinationplace': 'SIN-sky',
+             'outbounddate': '2017-06-09'}]
+    params = dict(country='UK', currency='GBP', locale='en-GB', adults=1)
+
+    def test_cheapest_combinations(self):
+        rnd = random.Random(1)
+        for k in (1, 5, 30):
+            prices = [sorted(rnd.randint(1, 50) for n in range(rnd.randint(
+                1, 6))) for leg in range(3)]
+            expected = sorted(sum(p[i] for p, i in zip(prices, indices))
+                              for indices in itertools.product(
+                                  *[range(len(p)) for p in prices]))[:k]
+            result = cheapest_combinations(prices, k)
+            self.assertEqual([total for total, indices in result], expected)
+            self.assertEqual(len(set(i for t, i in result)), len(result))
+        self.assertEqual(cheapest_combinations([[1], []], 3), [])
+        self.assertEqual(cheapest_combinations([[1]], 0), [])
+
+    def test_combine(self):
+        first = [itinerary(30, 20), itinerary(10), itinerary()]
+        third = [itinerary(5), itinerary(7)]
+        combinations = combine([first, None, third], 3)
+        self.assertEqual([c.price for c in combinations], [15, 17, 25])
+        self.assertEqual(combinations[0].itineraries,
+                         (first[1], None, third[0]))
+        self.assertEqual(combine([None, None], 3), [])
+
+    def test_search_legs(self):
+        api = FakeSkyscannerAPI(polls_to_complete=2, latency=0.2)
+        flights_service = Flights('fake', api_host='http://stub',
+                                  backend=StubBackend(api.handle))
+        started = time.time()
+        with mock.patch.object(SearchContext, 'sleep',
+                               lambda context, seconds: context.check()):
+            updates = list(flights_service.search_legs(self.legs, top=4,
+                                                       **self.params))
+        # A leg takes 3 requests, 0.6s, one after the other they would
+        # take 1.8s.
+        self.assertTrue(time.time() - started < 1.2)
+        self.assertEqual(sorted(u.leg for u in updates), [0, 1, 2])
+        self.assertEqual([u.complete for u in updates], [False, False, True])
+        for n, update in enumerate(updates):
+            done = [u.leg for u in updates[:n + 1]]
+            self.assertEqual(len(update.combinations), 4)
+            for combination in update.combinations:
+                self.assertEqual(
+                    [leg for leg, i in enumerate(combination.itineraries)
+                     if i is not None], sorted(done))
+        prices = [c.price for c in updates[-1].combinations]
+        self.assertEqual(prices, sorted(prices))
+
+    def test_errors(self):
+        api = FakeSkyscannerAPI(polls_to_complete=1, latency=0.05)
+        flights_service = Flights('fake', api_host='http://stub',
+                                  backend=StubBackend(api.handle))
+        legs = self.legs[:2] + [{'originplace': 'HKT-sky'}]
+        with mock.patch.object(SearchContext, 'sleep',
+                               lambda context, seconds: context.check()):
+            self.assertRaises(requests.HTTPError, list,
+                              flights_service.search_legs(legs,
+                                                          **self.params))
+            with mock.patch.object(SearchContext, 'cancel') as cancel:
+                updates = flights_service.search_legs(self.legs,
+                                                      **self.params)
+                next(updates)
+                updates.close()
+            self.assertEqual(cancel.call_count, 3)
+        self.assertRaises(ValueError, next, Flights(
+            'fake', response_format='xml').search_legs(self.legs))
+
+    def test_throttled(self):
+        api = FakeSkyscannerAPI(polls_to_complete=1)
+
+        def handle(method, url, headers, body):
+            # The session of the last leg is throttled.
+            if method == 'POST' and 'HKT-sky' in body:
+                return 429, {}, b''
+            return api.handle(method, url, headers, body)
+
+        flights_service = Flights('fake', api_host='http://stub',
+                                  backend=StubBackend(handle))
+        with mock.patch.object(SearchContext, 'sleep',
+                               lambda context, seconds: context.check()):
+            updates = list(flights_service.search_legs(self.legs,
+                                                       **self.params))
+        self.assertEqual(sorted(u.leg for u in updates), [0, 1, 2])
+        self.assertTrue(updates[-1].complete)
+        throttled = [u for u in updates if u.leg == 2][0]
+        self.assertEqual(throttled.response.status_code, 429)
+        self.assertEqual(throttled.combinations, [])
+        for update in updates:
+            if update.leg != 2:
+                self.assertTrue(flights_service.is_poll_complete(
+                    update.response))
+        self.assertEqual(updates[-1].combinations, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
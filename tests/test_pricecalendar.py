@@ -0,0 +1,128 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_pricecalendar
+----------------------------------
+
+Tests for `skyscanner.pricecalendar` module.
+"""
+
+import json
+import unittest
+from datetime import date
+
+import requests
+
+from skyscanner.backends import StubBackend
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.pricecalendar import PriceCalendar, months, window
+from skyscanner.skyscanner import IGNORE, STRICT, FlightsCache
+
+
+def quote(day, price, carrier=1):
+    return {'MinPrice': price, 'Direct': True,
+            'OutboundLeg': {'CarrierIds': [carrier], 'OriginId': 1,
+                            'DestinationId': 2,
+                            'DepartureDate': '%sT00:00:00' % day}}
+
+
+class TestPriceCalendar(unittest.TestCase):
+
+    route = dict(market='UK', currency='GBP', locale='en-GB',
+                 originplace='SIN-sky', destinationplace='KUL-sky')
+
+    def test_window(self):
+        self.assertEqual(window('2017-02'),
+                         (date(2017, 2, 1), date(2017, 2, 28)))
+        self.assertEqual(window('2016-02', days=1),
+                         (date(2016, 1, 31), date(2016, 3, 1)))
+        self.assertEqual(window(date(2017, 12, 30), '2018-01-02'),
+                         (date(2017, 12, 30), date(2018, 1, 2)))
+        self.assertRaises(ValueError, window, '2017-05-02', '2017-05-01')
+        self.assertEqual(months(*window('2017-05-30', days=3)),
+                         ['2017-05', '2017-06'])
+        self.assertEqual(months(*window('2017-11', '2018-01')),
+                         ['2017-11', '2017-12', '2018-01'])
+
+    def test_merge(self):
+        calendar = PriceCalendar(*window('2017-05-30', days=1))
+        calendar.add_response({'Quotes': [
+            quote('2017-05-28', 10), quote('2017-05-29', 60),
+            quote('2017-05-30', 50), quote('2017-05-30', 40, carrier=2)]})
+        # Overlapping responses, the same quotes with other prices.
+        calendar.add_response({'Quotes': [
+            quote('2017-05-29', 70), quote('2017-05-30', 30),
+            quote('2017-05-31', 80)]})
+        self.assertEqual(len(calendar.quotes), 4)
+        self.assertEqual(calendar.prices(), [
+            (date(2017, 5, 29), 60), (date(2017, 5, 30), 30),
+            (date(2017, 5, 31), 80)])
+        self.assertEqual(calendar.cheapest(), (date(2017, 5, 30), 30))
+        self.assertEqual(PriceCalendar(*window('2017-05-30')).cheapest(),
+                         None)
+
+    def test_get_price_calendar(self):
+        api = FakeSkyscannerAPI()
+        service = FlightsCache('fake', api_host='http://stub',
+                               backend=StubBackend(api.handle))
+        calendar = service.get_price_calendar('2017-05-30', days=3,
+                                              **self.route)
+        self.assertEqual(api.requests, 2)
+        self.assertEqual([day for day, price in calendar], [
+            date(2017, 5, 27), date(2017, 5, 28), date(2017, 5, 29),
+            date(2017, 5, 30), date(2017, 5, 31), date(2017, 6, 1),
+            date(2017, 6, 2)])
+        self.assertEqual(calendar.failed, [])
+
+        expected = {}
+        for month in ('2017-05', '2017-06'):
+            for q in service.get_cheapest_price_by_date(
+                    outbounddate=month, **self.route).parsed['Quotes']:
+                day = q['OutboundLeg']['DepartureDate'][:10]
+                expected[day] = min(expected.get(day, q['MinPrice']),
+                                    q['MinPrice'])
+        self.assertEqual(
+            calendar.prices(),
+            [(day, expected.get(day.strftime('%Y-%m-%d')))
+             for day, price in calendar])
+
+        calendar = service.get_price_calendar('2017-05', '2017-08',
+                                              workers=2, **self.route)
+        self.assertEqual(len(calendar), 31 + 30 + 31 + 31)
+        self.assertEqual(api.requests, 8)
+
+    def test_failures(self):
+        def handler(method, url, headers, body):
+            if '2017-06' in url:
+                return 500, {}, b''
+            return 200, {'Content-Type': 'application/json'}, json.dumps(
+                {'Quotes': [quote('2017-05-31', 10)]}).encode('utf-8')
+
+        service = FlightsCache('fake', api_host='http://stub',
+                               backend=StubBackend(handler))
+        self.assertRaises(requests.HTTPError, service.get_price_calendar,
+                          '2017-05-31', days=1, errors=STRICT, **self.route)
+        calendar = service.get_price_calendar('2017-05-31', days=1,
+                                              errors=IGNORE, **self.route)
+        self.assertEqual(calendar.failed, ['2017-06'])
+        self.assertEqual(calendar.prices()[1:], [
+            (date(2017, 5, 31), 10), (date(2017, 6, 1), None)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_responses
+----------------------------------
+
+Tests for `skyscanner.responses` module.
+"""
+
+import pickle
+import shutil
+import tempfile
+import unittest
+
+import requests
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from skyscanner.backends import StubBackend
+from skyscanner.cache import ResponseCache
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.history import PriceHistory
+from skyscanner.responses import LazyResponse
+from skyscanner.skyscanner import (STRICT, EmptyResponse, Flights,
+                                   FlightsCache, SearchContext, Transport)
+
+
+def stub(content, content_type='application/json'):
+    return StubBackend(lambda method, url, headers, body: (
+        200, {'Content-Type': content_type}, content))
+
+
+class TestLazyResponse(unittest.TestCase):
+
+    def test_markets(self):
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=StubBackend())
+        with mock.patch.object(Flights, '_parse_resp',
+                               side_effect=Transport._parse_resp) as parse:
+            resp = flights_service.get_markets('en-GB')
+            self.assertTrue(isinstance(resp, LazyResponse))
+            self.assertTrue(isinstance(resp, requests.Response))
+            self.assertEqual(resp.status_code, 200)
+            self.assertFalse(resp.is_parsed)
+            self.assertEqual(parse.call_count, 0)
+            countries = resp.section('Countries')
+            self.assertTrue(resp.is_parsed)
+            self.assertTrue(countries)
+            self.assertTrue(resp.parsed['Countries'] is countries)
+            self.assertEqual(resp.section('Quotes'), [])
+            self.assertEqual(parse.call_count, 1)
+
+    def test_search(self):
+        api = FakeSkyscannerAPI(itineraries=5, polls_to_complete=2)
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=StubBackend(api.handle))
+        with SearchContext() as context:
+            result = flights_service.poll_session(
+                flights_service.create_session(
+                    context=context, country='UK', currency='GBP',
+                    locale='en-GB', originplace='SIN-sky',
+                    destinationplace='KUL-sky', outbounddate='2017-05-28',
+                    adults=1),
+                initial_delay=0, delay=0, context=context,
+                callback=flights_service._default_resp_callback)
+        self.assertTrue(isinstance(result, LazyResponse))
+        self.assertEqual(result.status, 'UpdatesComplete')
+        self.assertEqual(len(result.itineraries), 5)
+        for section in (result.legs, result.segments, result.carriers,
+                        result.agents, result.places):
+            self.assertTrue(section)
+
+    def test_invalid(self):
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=stub(b'{"Status": '))
+        resp = flights_service.get_markets('en-GB')
+        self.assertRaises(ValueError, getattr, resp, 'parsed')
+        self.assertFalse(resp.is_parsed)
+        self.assertRaises(ValueError, getattr, resp, 'status')
+
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=stub(b''))
+        resp = flights_service.get_markets('en-GB')
+        self.assertFalse(isinstance(resp, LazyResponse))
+        self.assertEqual(resp.parsed, None)
+        self.assertRaises(EmptyResponse, flights_service.make_request,
+                          flights_service.MARKET_SERVICE_URL, errors=STRICT)
+
+    def test_xml(self):
+        flights_service = Flights(
+            'fake', api_host='http://stub', lazy=True, response_format='xml',
+            backend=stub(b'<R><Status>UpdatesPending</Status><Itineraries>'
+                         b'<ItineraryApiDto/><ItineraryApiDto/>'
+                         b'</Itineraries></R>', 'application/xml'))
+        resp = flights_service.get_markets('en-GB')
+        self.assertEqual(resp.status, 'UpdatesPending')
+        self.assertEqual([e.tag for e in resp.itineraries],
+                         ['ItineraryApiDto', 'ItineraryApiDto'])
+        self.assertEqual(resp.quotes, [])
+
+    def test_pickle(self):
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=stub(b'{"Quotes": [{"a": 1}]}'))
+        resp = pickle.loads(pickle.dumps(
+            flights_service.get_markets('en-GB')))
+        self.assertTrue(resp.is_parsed)
+        self.assertEqual(resp.quotes, [{'a': 1}])
+        self.assertEqual(resp.json(), {'Quotes': [{'a': 1}]})
+
+    def test_cache(self):
+        backend = StubBackend()
+        flights_cache_service = FlightsCache(
+            'fake', api_host='http://stub', lazy=True, backend=backend,
+            cache=ResponseCache())
+        with mock.patch.object(backend, 'request',
+                               side_effect=backend.request) as request:
+            resp = flights_cache_service.get_cheapest_quotes(
+                market='UK', currency='GBP', locale='en-GB',
+                originplace='SIN-sky', destinationplace='KUL-sky',
+                outbounddate='2017-05', inbounddate='2017-06')
+            self.assertFalse(resp.is_parsed)
+            self.assertTrue(flights_cache_service.get_cheapest_quotes(
+                market='UK', currency='GBP', locale='en-GB',
+                originplace='SIN-sky', destinationplace='KUL-sky',
+                outbounddate='2017-05', inbounddate='2017-06') is resp)
+            self.assertFalse(resp.is_parsed)
+            self.assertEqual(request.call_count, 1)
+        self.assertTrue(resp.quotes)
+
+        # An invalid content is cached too and only raises once read.
+        flights_service = Flights('fake', api_host='http://stub', lazy=True,
+                                  backend=stub(b'{"Status": '),
+                                  cache=ResponseCache())
+        resp = flights_service.get_markets('en-GB')
+        self.assertTrue(flights_service.get_markets('en-GB') is resp)
+        self.assertRaises(ValueError, getattr, resp, 'parsed')
+
+    def test_history(self):
+        path = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, path)
+        with PriceHistory(path) as history:
+            flights_cache_service = FlightsCache(
+                'fake', api_host='http://stub', lazy=True,
+                backend=StubBackend(), history=history)
+            resp = flights_cache_service.get_cheapest_quotes(
+                market='UK', currency='GBP', locale='en-GB',
+                originplace='SIN-sky', destinationplace='KUL-sky',
+                outbounddate='2017-05', inbounddate='2017-06')
+            self.assertFalse(resp.is_parsed)
+            self.assertEqual(len(history), 0)
+            self.assertTrue(resp.quotes)
+            self.assertEqual(len(history), len(resp.quotes))
+            resp.section('Places')
+            self.assertEqual(len(history), len(resp.quotes))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_retry
+----------------------------------
+
+Tests for `skyscanner.retry` module.
+"""
+
+import random
+import unittest
+
+import requests
+
+from skyscanner.backends import StubBackend, _response
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.retry import RetryBudget, RetryPolicy
+from skyscanner.skyscanner import Flights
+
+try:
+    from urllib3.exceptions import MaxRetryError, NewConnectionError
+except ImportError:
+    from requests.packages.urllib3.exceptions import (MaxRetryError,
+                                                      NewConnectionError)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def response(status, headers=None):
+    return _response('http://stub/', status, (headers or {}).items())
+
+
+def refused():
+    reason = NewConnectionError(None, 'Connection refused')
+    return requests.ConnectionError(MaxRetryError(None, '/', reason))
+
+
+class TestRetryPolicy(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.policy = RetryPolicy(
+            tries=3, budget=RetryBudget(ratio=0.5, min_per_second=0,
+                                        clock=self.clock),
+            rnd=random.Random(1))
+
+    def test_retryable(self):
+        retryable = self.policy.retryable
+        self.assertTrue(retryable('get', response=response(500)))
+        self.assertTrue(retryable('get', error=requests.ReadTimeout()))
+        self.assertTrue(retryable('get', error=requests.ConnectionError()))
+        self.assertFalse(retryable('get', response=response(400)))
+        self.assertFalse(retryable('get', response=response(429)))
+        self.assertFalse(retryable('get', error=ValueError()))
+        # Requests that are not idempotent are only retried
+        # when the API did not get them.
+        self.assertFalse(retryable('post', response=response(500)))
+        self.assertFalse(retryable('put', error=requests.ReadTimeout()))
+        self.assertFalse(retryable('post', error=requests.ConnectionError()))
+        self.assertTrue(retryable('post', response=response(502)))
+        self.assertTrue(retryable('put', error=requests.ConnectTimeout()))
+        self.assertTrue(retryable('post', error=refused()))
+        self.assertFalse(retryable('get', response=response(500),
+                                   family='session'))
+
+    def test_delay(self):
+        policy = RetryPolicy(tries=4, backoff=1, max_backoff=3,
+                             budget=RetryBudget(min_per_second=100))
+        delays = [policy.delay('get', n, response=response(503))
+                  for n in range(4)]
+        self.assertEqual(delays[3], None)
+        for n, delay in enumerate(delays[:3]):
+            self.assertTrue(0 <= delay <= min(3, 2 ** n))
+        self.assertEqual(policy.delay('get', 0, response=response(
+            503, {'Retry-After': '2'})), 2)
+        self.assertEqual(policy.delay('get', 0, response=response(
+            503, {'Retry-After': '60'})), 3)
+        self.assertEqual(policy.delay('get', 0, response=response(200)),
+                         None)
+
+    def test_budget(self):
+        # Two requests save up one retry.
+        self.assertEqual(self.policy.delay('get', 0, response=response(200)),
+                         None)
+        self.assertTrue(self.policy.delay('get', 0, response=response(500))
+                        is not None)
+        self.assertEqual(self.policy.delay('get', 1, response=response(500)),
+                         None)
+        self.assertEqual((self.policy.retries, self.policy.exhausted), (1, 1))
+
+        budget = RetryBudget(ratio=0, min_per_second=2, clock=self.clock)
+        self.assertEqual([budget.withdraw() for n in range(3)],
+                         [True, True, False])
+        self.clock.now += 0.5
+        self.assertEqual([budget.withdraw() for n in range(2)],
+                         [True, False])
+
+    def test_services(self):
+        api = FakeSkyscannerAPI(polls_to_complete=2)
+        failures = {'POST': [502], 'GET': [500, 'reset'], 'PUT': [500]}
+        requests_made = []
+
+        def handler(method, url, headers=None, body=None):
+            requests_made.append(method)
+            if failures[method]:
+                failure = failures[method].pop(0)
+                if failure == 'reset':
+                    raise requests.ConnectionError('Connection reset')
+                return failure, {}, b''
+            return api.handle(method, url, headers, body)
+
+        policy = RetryPolicy(backoff=0,
+                             budget=RetryBudget(min_per_second=10))
+        flights_service = Flights('fake', api_host='http://stub',
+                                  backend=StubBackend(handler),
+                                  retry_policy=policy)
+        poll_url = flights_service.create_session(
+            country='UK', currency='GBP', locale='en-GB',
+            originplace='SIN-sky', destinationplace='KUL-sky',
+            outbounddate='2017-05-28', inbounddate='2017-05-31', adults=1)
+        result = flights_service.poll_session(poll_url, initial_delay=0,
+                                              delay=0)
+        self.assertTrue(flights_service.is_poll_complete(result))
+        self.assertEqual(requests_made,
+                         ['POST', 'POST', 'GET', 'GET', 'GET', 'GET'])
+        self.assertEqual(policy.retries, 3)
+
+        itinerary = result.parsed['Itineraries'][0]
+        self.assertRaises(requests.HTTPError,
+                          flights_service.request_booking_details, poll_url,
+                          outboundlegid=itinerary['OutboundLegId'])
+        self.assertEqual(requests_made[6:], ['PUT'])
+
+
+if __name__ == '__main__':
+    unittest.main()
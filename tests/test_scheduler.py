@@ -0,0 +1,200 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_scheduler
+----------------------------------
+
+Tests for `skyscanner.scheduler` module.
+"""
+
+import threading
+import time
+import unittest
+
+from skyscanner.fakeapi import FakeServer
+from skyscanner.scheduler import (BATCH, INTERACTIVE, AdaptiveConcurrency,
+                                  RequestScheduler)
+from skyscanner.skyscanner import Flights, SearchCancelled, SearchContext
+
+
+class TestRequestScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.order = []
+        self.threads = []
+
+    def tearDown(self):
+        for thread in self.threads:
+            thread.join(1)
+
+    def enqueue(self, scheduler, priority, poll=False):
+        def request():
+            with scheduler.slot(priority, poll):
+                self.order.append(priority[0].upper() + 'p' * poll)
+
+        waiting = scheduler.waiting()
+        thread = threading.Thread(target=request)
+        thread.start()
+        self.threads.append(thread)
+        while scheduler.waiting() == waiting:
+            time.sleep(0.001)
+
+    def test_weighted_fair_share(self):
+        scheduler = RequestScheduler(concurrency=1,
+                                     weights={INTERACTIVE: 4, BATCH: 1})
+        scheduler.acquire()
+        for n in range(4):
+            self.enqueue(scheduler, BATCH)
+        for n in range(6):
+            self.enqueue(scheduler, INTERACTIVE)
+        scheduler.release()
+        self.tearDown()
+        self.assertEqual(''.join(self.order), 'IIBIIIIBBB')
+        self.assertEqual(dict(scheduler.granted),
+                         {INTERACTIVE: 7, BATCH: 4})
+        self.assertEqual(scheduler.in_flight, 0)
+
+    def test_preemption(self):
+        scheduler = RequestScheduler(concurrency=1,
+                                     weights={INTERACTIVE: 1, BATCH: 1})
+        scheduler.acquire()
+        self.enqueue(scheduler, BATCH, poll=True)
+        self.enqueue(scheduler, BATCH)
+        self.enqueue(scheduler, INTERACTIVE, poll=True)
+        scheduler.release()
+        self.tearDown()
+        # The batch poll, queued first with the earliest finish tag,
+        # waits for all the others.
+        self.assertEqual(self.order, ['B', 'Ip', 'Bp'])
+
+    def test_rate(self):
+        scheduler = RequestScheduler(rate=50)
+        started = time.time()
+        for n in range(60):
+            with scheduler.slot():
+                pass
+        self.assertTrue(time.time() - started >= 0.15)
+
+    def test_cancel(self):
+        scheduler = RequestScheduler(concurrency=1)
+        scheduler.acquire()
+        context = SearchContext()
+        threading.Timer(0.05, context.cancel).start()
+        self.assertRaises(SearchCancelled, scheduler.acquire,
+                          context=context)
+        self.assertEqual(scheduler.waiting(), 0)
+        self.assertRaises(ValueError, scheduler.acquire, 'unknown')
+
+    def test_services(self):
+        scheduler = RequestScheduler(concurrency=2)
+        params = dict(country='UK', currency='GBP', locale='en-GB',
+                      originplace='SIN-sky', destinationplace='KUL-sky',
+                      outbounddate='2017-05-28', adults=1)
+        with FakeServer(polls_to_complete=2, latency=0.01) as server:
+            sweep_service = Flights('fake', api_host=server.url,
+                                    scheduler=scheduler, priority=BATCH)
+            flights_service = Flights('fake', api_host=server.url,
+                                      scheduler=scheduler)
+            sweeps = [sweep_service.start_search(**params)
+                      for n in range(4)]
+            poll_url = flights_service.create_session(**params)
+            result = flights_service.poll_session(poll_url, initial_delay=0,
+                                                  delay=0)
+            self.assertTrue(flights_service.is_poll_complete(result))
+            for sweep in sweeps:
+                sweep.cancel()
+        self.assertTrue(scheduler.granted[BATCH] >= 4)
+        self.assertEqual(scheduler.granted[INTERACTIVE], 3)
+
+
+class Clock(object):
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestAdaptiveConcurrency(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = Clock()
+        self.limiter = AdaptiveConcurrency(initial=4, maximum=6, warmup=4,
+                                           clock=self.clock)
+
+    def respond(self, n=1, latency=0.1, status_code=200):
+        for i in range(n):
+            started = self.limiter.acquire()
+            self.clock.now += latency
+            self.limiter.release(started, status_code)
+
+    def test_additive_increase(self):
+        self.respond(5)
+        self.assertEqual(self.limiter.limit, 5)
+        self.respond(100)
+        self.assertEqual(self.limiter.limit, 6)
+
+    def test_multiplicative_decrease(self):
+        first = self.limiter.acquire()
+        second = self.limiter.acquire()
+        self.clock.now += 0.1
+        self.limiter.release(first, 429)
+        self.assertEqual(self.limiter.limit, 2)
+        # Sent before the cut, so it does not cut the limit again.
+        self.limiter.release(second, 429)
+        self.assertEqual(self.limiter.limit, 2)
+        self.limiter.release(self.limiter.acquire(), failed=True)
+        self.assertEqual(self.limiter.limit, 1)
+        self.assertEqual(self.limiter.stats(), {
+            'limit': 1, 'in_flight': 0, 'throttled': 2, 'spikes': 0,
+            'failures': 1, 'cuts': 2})
+
+    def test_latency_spike(self):
+        self.respond(4, latency=0.1)
+        self.respond(1, latency=0.15)
+        self.assertEqual(self.limiter.limit, 5)
+        self.respond(1, latency=0.5)
+        self.assertEqual(self.limiter.limit, 2)
+        self.assertEqual(self.limiter.spikes, 1)
+
+    def test_acquire(self):
+        limiter = AdaptiveConcurrency(initial=1, maximum=1)
+        started = limiter.acquire()
+        threading.Timer(0.05, limiter.release, (started, 200)).start()
+        limiter.release(limiter.acquire(), 200)
+        self.assertEqual(limiter.in_flight, 0)
+
+        limiter.acquire()
+        context = SearchContext()
+        threading.Timer(0.05, context.cancel).start()
+        self.assertRaises(SearchCancelled, limiter.acquire, context)
+
+    def test_services(self):
+        limiter = AdaptiveConcurrency(initial=8)
+        with FakeServer(throttle_rate=1) as server:
+            flights_service = Flights('fake', api_host=server.url,
+                                      limiter=limiter)
+            flights_service.get_markets('en-GB')
+            flights_service.get_markets('en-GB')
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.throttled, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -28,14 +28,33 @@ Tests for `skyscanner` module.
 """
 
 import json
+import threading
+import time
 import unittest
 from datetime import datetime, timedelta
 
 from requests import HTTPError
 
-from skyscanner.skyscanner import (GRACEFUL, IGNORE, STRICT, CarHire,
-                                   EmptyResponse, Flights, FlightsCache,
-                                   Hotels, MissingParameter, Transport)
+from skyscanner.backends import StubBackend
+from skyscanner.fakeapi import FakeServer, FakeSkyscannerAPI
+from skyscanner.interning import InternTable
+from skyscanner.skyscanner import (GRACEFUL, IGNORE, STRICT,
+                                   BudgetExceeded, CarHire, EmptyResponse,
+                                   Flights, FlightsCache, Hotels,
+                                   MissingParameter, RequestPlan,
+                                   SearchCancelled, SearchContext,
+                                   SearchTimeout, Transport, parse_content)
+from skyscanner.streaming import IncrementalParser
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+try:
+    from concurrent.futures import ProcessPoolExecutor
+except ImportError:
+    ProcessPoolExecutor = None
 
 
 # TODO: Mock responses
@@ -67,13 +86,20 @@ class SkyScannerTestCase(unittest.TestCase):
 
 class FakeResponse(object):
 
-    def __init__(self, status_code=200, content=None):
+    def __init__(self, status_code=200, content=None, headers=None,
+                 **kwargs):
         self.content = content or ''
         self.status_code = status_code
+        self.headers = headers or {}
+        self.__dict__.update(kwargs)
 
     def json(self):
         return json.loads(self.content)
 
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise HTTPError('%s Error' % self.status_code, response=self)
+
 
 class TestTransport(SkyScannerTestCase):
 
@@ -366,6 +392,7 @@ class TestTransport(SkyScannerTestCase):
         params = dict(a=1, b=2, c=3)
         self.assertEqual(
             '1/2/3', Transport._construct_params(params, ('a', 'b'), ('c',)))
+        self.assertEqual(params, dict(a=1, b=2, c=3))
 
         params = dict(a=1, c=3)
         self.assertRaises(MissingParameter,
@@ -374,6 +401,408 @@ class TestTransport(SkyScannerTestCase):
                           )
 
 
+class TestRequestPlan(SkyScannerTestCase):
+
+    def test_prepare(self):
+        transport = Transport(self.api_key, response_format='xml')
+        plan = transport.prepare(Transport.LOCATION_AUTOSUGGEST_URL,
+                                 Transport.LOCATION_AUTOSUGGEST_PARAMS)
+
+        self.assertTrue(isinstance(plan, RequestPlan))
+        self.assertEqual(plan.headers, {'Accept': 'application/xml'})
+        self.assertEqual(plan.error_mode, GRACEFUL)
+        self.assertRaises(ValueError, transport.prepare,
+                          Transport.MARKET_SERVICE_URL, errors='unknown')
+
+    def test_call(self):
+        with mock.patch('requests.get') as get:
+            get.return_value = FakeResponse(content='{"Quotes": []}')
+            flights_cache_service = FlightsCache(self.api_key)
+            for n in range(2):
+                self.result = flights_cache_service.get_cheapest_quotes(
+                    market='GB',
+                    currency='GBP',
+                    locale='en-GB',
+                    originplace='SIN',
+                    destinationplace='KUL',
+                    outbounddate='2017-05',
+                    inbounddate='2017-06',
+                    includecarriers='BA').parsed
+
+                self.assertEqual(self.result, {'Quotes': []})
+
+        self.assertEqual(len(flights_cache_service._plans), 1)
+        self.assertEqual(get.call_count, 2)
+        args, kwargs = get.call_args
+        self.assertEqual(
+            args[0], '%s/GB/GBP/en-GB/SIN/KUL/2017-05/2017-06' %
+            FlightsCache.BROWSE_QUOTES_SERVICE_URL)
+        self.assertEqual(kwargs['params'], {'includecarriers': 'BA',
+                                            'apiKey': self.api_key})
+
+    def test_call_errors(self):
+        with FakeServer(throttle_rate=1) as server:
+            flights_cache_service = FlightsCache(self.api_key,
+                                                 api_host=server.url)
+            params = dict(market='GB', currency='GBP', locale='en-GB',
+                          originplace='SIN', destinationplace='KUL',
+                          outbounddate='2017-05', inbounddate='2017-06')
+            for method in (flights_cache_service.get_cheapest_quotes,
+                           flights_cache_service.get_cheapest_price_by_date,
+                           flights_cache_service.get_cheapest_price_by_route,
+                           flights_cache_service.get_grid_prices_by_date):
+                self.assertRaises(HTTPError, method, errors=STRICT,
+                                  **params)
+            self.assertRaises(HTTPError,
+                              flights_cache_service.location_autosuggest,
+                              market='GB', currency='GBP', locale='en-GB',
+                              query='KUL', errors=STRICT)
+            resp = flights_cache_service.get_cheapest_quotes(**params)
+            self.assertEqual(resp.status_code, 429)
+            self.assertTrue('errors' not in resp.url)
+
+    def test_call_missing_parameter(self):
+        flights_cache_service = FlightsCache(self.api_key)
+        self.assertRaises(MissingParameter,
+                          flights_cache_service.get_cheapest_quotes,
+                          market='GB', currency='GBP', locale='en-GB')
+
+
+def count_itineraries(parsed):
+    return {'Status': parsed['Status'],
+            'Itineraries': len(parsed['Itineraries'])}
+
+
+class TestParseExecutor(SkyScannerTestCase):
+
+    content = '{"Status": "UpdatesComplete", "Itineraries": [{}, {}]}'
+
+    def test_parse_content(self):
+        self.assertEqual(parse_content(self.content, 'json'),
+                         json.loads(self.content))
+        self.assertEqual(parse_content(self.content.encode('utf-8'), 'json',
+                                       count_itineraries),
+                         {'Status': 'UpdatesComplete', 'Itineraries': 2})
+        self.assertEqual(parse_content('<valid>1</valid>', 'xml').text, '1')
+        self.assertRaises(ValueError, parse_content, 'invalid', 'json')
+
+    def test_postprocess(self):
+        t = Transport(self.api_key, postprocess=count_itineraries)
+        self.result = t._default_resp_callback(
+            FakeResponse(content=self.content)).parsed
+        self.assertEqual(self.result['Itineraries'], 2)
+
+    @unittest.skipIf(ProcessPoolExecutor is None,
+                     'concurrent.futures is not available')
+    def test_process_pool(self):
+        executor = ProcessPoolExecutor(max_workers=1)
+        try:
+            t = Transport(self.api_key, parse_executor=executor,
+                          postprocess=count_itineraries)
+            resp = t._default_resp_callback(
+                FakeResponse(content=self.content))
+            self.assertEqual(resp.parsed['Itineraries'], 2)
+            self.assertTrue(t.is_poll_complete(resp))
+            self.assertRaises(ValueError, t._default_resp_callback,
+                              FakeResponse(content='invalid json'))
+        finally:
+            executor.shutdown()
+
+    def test_xml(self):
+        executor = mock.Mock()
+        self.assertRaises(ValueError, Transport, self.api_key,
+                          response_format='xml', parse_executor=executor)
+        t = Transport(self.api_key, response_format='xml',
+                      parse_executor=executor, postprocess=count_itineraries)
+        self.assertTrue(t.parse_executor is executor)
+
+
+class TestPollResponses(SkyScannerTestCase):
+
+    content = '{"Status": "UpdatesComplete", "Itineraries": [{}, {}]}'
+    pending = ('{"Status": "UpdatesPending", '
+               '"Itineraries": [{"Id": 1}, {"Id": 2}]}')
+    updated = ('{"Status": "UpdatesPending", '
+               '"Itineraries": [{"Id": 1}, {"Id": 3}]}')
+
+    def test_poll_resp_callback(self):
+        t = Transport(self.api_key, intern_table=InternTable())
+        parser = IncrementalParser()
+        first = t._poll_resp_callback(FakeResponse(content=self.content),
+                                      parser, sniff=False)
+        self.assertEqual(first.parsed, json.loads(self.content))
+        second = t._poll_resp_callback(FakeResponse(content=self.content),
+                                       parser, sniff=False)
+        self.assertTrue(second.parsed is first.parsed)
+        self.assertRaises(EmptyResponse, t._poll_resp_callback,
+                          FakeResponse(content=''), parser)
+        self.assertRaises(ValueError, t._poll_resp_callback,
+                          FakeResponse(content='{"Status": }'), parser)
+
+        t = Transport(self.api_key, postprocess=count_itineraries)
+        resp = t._poll_resp_callback(FakeResponse(content=self.content),
+                                     IncrementalParser())
+        self.assertEqual(resp.parsed['Itineraries'], 2)
+
+    def test_poll_resp_callback_reuse(self):
+        # Without sniffing every poll is parsed, reusing the unchanged
+        # items of the previous one.
+        t = Transport(self.api_key)
+        parser = IncrementalParser()
+        first = t._poll_resp_callback(FakeResponse(content=self.pending),
+                                      parser, sniff=False)
+        second = t._poll_resp_callback(FakeResponse(content=self.updated),
+                                       parser, sniff=False)
+        self.assertEqual(second.parsed, json.loads(self.updated))
+        self.assertTrue(second.parsed['Itineraries'][0] is
+                        first.parsed['Itineraries'][0])
+        self.assertFalse(second.parsed['Itineraries'][1] is
+                         first.parsed['Itineraries'][1])
+        self.assertEqual(parser.reused, 2)
+
+        # Polls sniffed incomplete are not parsed at all.
+        parser = IncrementalParser()
+        resp = t._poll_resp_callback(FakeResponse(content=self.pending),
+                                     parser, sniff=True)
+        self.assertEqual(resp.parsed, None)
+        self.assertTrue(resp.sniffed)
+        self.assertEqual(parser.content, None)
+
+
+class TestFlightsBooking(SkyScannerTestCase):
+
+    def setUp(self):
+        super(TestFlightsBooking, self).setUp()
+        self.server = FakeServer(polls_to_complete=2).start()
+
+    def tearDown(self):
+        super(TestFlightsBooking, self).tearDown()
+        self.server.stop()
+
+    def test_get_booking_details(self):
+        flights_service = Flights(self.api_key, api_host=self.server.url)
+        poll_url = flights_service.create_session(
+            country='UK',
+            currency='GBP',
+            locale='en-GB',
+            originplace='SIN-sky',
+            destinationplace='KUL-sky',
+            outbounddate='2017-05-28',
+            inbounddate='2017-05-31',
+            adults=1)
+        itineraries = flights_service.poll_session(
+            poll_url, initial_delay=0, delay=0).parsed['Itineraries'][:5]
+
+        results = list(flights_service.get_booking_details(
+            poll_url, itineraries, workers=3, delay=0))
+        self.assertEqual(len(results), 5)
+        for itinerary, booking in results:
+            self.assertTrue(itinerary in itineraries)
+            self.assertTrue(flights_service.is_booking_complete(booking))
+            self.assertTrue(booking.url.endswith('%s;%s?apiKey=%s' % (
+                itinerary['OutboundLegId'], itinerary['InboundLegId'],
+                self.api_key)))
+
+        self.server.api.throttle_rate = 1
+        self.assertRaises(HTTPError, list, flights_service.get_booking_details(
+            poll_url, [{'outboundlegid': 'a'}], errors=STRICT, delay=0))
+
+    def test_get_booking_details_throttled(self):
+        api = FakeSkyscannerAPI(polls_to_complete=2)
+
+        def handle(method, url, headers, body):
+            if method == 'PUT' and 'throttled' in '%s %s' % (url, body):
+                return 429, {}, b''
+            return api.handle(method, url, headers, body)
+
+        flights_service = Flights(self.api_key, api_host='http://stub',
+                                  backend=StubBackend(handle))
+        poll_url = flights_service.create_session(
+            country='UK', currency='GBP', locale='en-GB',
+            originplace='SIN-sky', destinationplace='KUL-sky',
+            outbounddate='2017-05-28', adults=1)
+        itineraries = [{'outboundlegid': 'leg%s' % n} for n in range(3)]
+        itineraries.insert(1, {'outboundlegid': 'throttled'})
+        results = dict(
+            (itinerary['outboundlegid'], booking)
+            for itinerary, booking in flights_service.get_booking_details(
+                poll_url, itineraries, workers=2, delay=0))
+        self.assertEqual(sorted(results), ['leg0', 'leg1', 'leg2',
+                                           'throttled'])
+        self.assertEqual(results['throttled'].status_code, 429)
+        for leg in ('leg0', 'leg1', 'leg2'):
+            self.assertTrue(
+                flights_service.is_booking_complete(results[leg]))
+
+    def test_get_booking_details_closed(self):
+        flights_service = Flights(self.api_key, api_host=self.server.url)
+        poll_url = flights_service.create_session(
+            country='UK', currency='GBP', locale='en-GB',
+            originplace='SIN-sky', destinationplace='KUL-sky',
+            outbounddate='2017-05-28', adults=1)
+        self.server.api.polls_to_complete = 20
+        itineraries = [{'outboundlegid': 'leg%s' % n} for n in range(8)]
+        details = flights_service.get_booking_details(
+            poll_url, itineraries, workers=2, delay=0.01, tries=20)
+        with mock.patch.object(SearchContext, 'cancel',
+                               side_effect=SearchContext.cancel,
+                               autospec=True) as cancel:
+            # Waits for the first booking details, after 20 polls.
+            next(details)
+            details.close()
+        self.assertEqual(cancel.call_count, 1)
+        time.sleep(0.2)
+        requests_sent = self.server.api.requests
+        time.sleep(0.3)
+        # The other workers stopped, instead of polling the 7 others.
+        self.assertEqual(self.server.api.requests, requests_sent)
+        self.assertTrue(requests_sent < 8 * 20)
+
+    def test_get_cheapest_itineraries(self):
+        flights_service = Flights(self.api_key, api_host=self.server.url)
+        params = dict(country='UK', currency='GBP', locale='en-GB',
+                      originplace='SIN-sky', destinationplace='KUL-sky',
+                      outbounddate='2017-05-28', inbounddate='2017-05-31',
+                      adults=1)
+        with mock.patch('time.sleep'):
+            top = flights_service.get_cheapest_itineraries(
+                top=3, **params).parsed
+        self.assertEqual(top['Status'], 'UpdatesComplete')
+        self.assertEqual(len(top['Itineraries']), 3)
+
+        def price(itinerary):
+            return min(o['Price'] for o in itinerary['PricingOptions'])
+
+        poll_url = flights_service.create_session(**params)
+        full = flights_service.poll_session(
+            poll_url, initial_delay=0, delay=0).parsed
+        top = flights_service.poll_session(
+            poll_url, initial_delay=0, delay=0, stream=True,
+            callback=lambda r: flights_service._top_resp_callback(r, 3)
+        ).parsed
+        self.assertEqual(top['Itineraries'],
+                         sorted(full['Itineraries'], key=price)[:3])
+        leg_ids = set(i[key] for i in top['Itineraries']
+                      for key in ('OutboundLegId', 'InboundLegId'))
+        self.assertEqual(set(leg['Id'] for leg in top['Legs']), leg_ids)
+        self.assertEqual(
+            set(s['Id'] for s in top['Segments']),
+            set(s for leg in top['Legs'] for s in leg['SegmentIds']))
+        self.assertTrue(len(top['Places']) <= len(full['Places']))
+
+        xml_service = Flights(self.api_key, response_format='xml')
+        self.assertRaises(ValueError, xml_service.get_cheapest_itineraries,
+                          **params)
+
+    def test_is_booking_complete(self):
+        flights_service = Flights(self.api_key)
+        self.assertFalse(flights_service.is_booking_complete(
+            FakeResponse(parsed=None)))
+        self.assertFalse(flights_service.is_booking_complete(
+            FakeResponse(parsed={'BookingOptions': []})))
+        self.assertFalse(flights_service.is_booking_complete(
+            FakeResponse(parsed={'BookingOptions': [{'BookingItems': [
+                {'Status': 'Current'}, {'Status': 'Pending'}]}]})))
+        self.assertTrue(flights_service.is_booking_complete(
+            FakeResponse(parsed={'BookingOptions': [{'BookingItems': [
+                {'Status': 'Current'}, {'Status': 'Current'}]}]})))
+
+
+class TestSearchContext(SkyScannerTestCase):
+
+    params = dict(country='UK', currency='GBP', locale='en-GB',
+                  originplace='SIN-sky', destinationplace='KUL-sky',
+                  outbounddate='2017-05-28', adults=1)
+
+    def setUp(self):
+        super(TestSearchContext, self).setUp()
+        self.server = FakeServer(polls_to_complete=20).start()
+        self.flights_service = Flights(self.api_key,
+                                       api_host=self.server.url)
+
+    def tearDown(self):
+        super(TestSearchContext, self).tearDown()
+        self.server.stop()
+
+    def test_timeouts(self):
+        flights_cache_service = FlightsCache(
+            self.api_key, timeouts={'browse': 5, 'reference': None})
+        self.assertEqual(flights_cache_service._timeout('poll'), (3.05, 30))
+        with mock.patch('requests.get') as get:
+            get.return_value = FakeResponse(content='{"Quotes": []}')
+            flights_cache_service.get_cheapest_quotes(
+                market='GB', currency='GBP', locale='en-GB',
+                originplace='SIN', destinationplace='KUL',
+                outbounddate='2017-05')
+            self.assertEqual(get.call_args[1]['timeout'], 5)
+            flights_cache_service.get_markets('en-GB')
+            self.assertEqual(get.call_args[1]['timeout'], None)
+
+    def test_context(self):
+        now = [100.0]
+        context = SearchContext(budget=10, clock=lambda: now[0])
+        self.assertEqual(context.timeout((3.05, 30)), (3.05, 10))
+        self.assertEqual(context.timeout(None), 10)
+        now[0] = 110.0
+        self.assertTrue(context.expired)
+        self.assertRaises(BudgetExceeded, context.timeout, 1)
+        self.assertEqual(SearchContext().timeout(1), 1)
+
+    def test_partial_result(self):
+        self.server.api.latency = 0.05
+        context = SearchContext(budget=0.4)
+        poll_url = self.flights_service.create_session(context=context,
+                                                       **self.params)
+        result = self.flights_service.poll_session(
+            poll_url, initial_delay=0, delay=0.05, context=context)
+        self.assertTrue(context.expired)
+        self.assertEqual(result.parsed['Status'], 'UpdatesPending')
+
+        self.assertRaises(BudgetExceeded, self.flights_service.poll_session,
+                          poll_url, initial_delay=0, delay=0.05,
+                          errors=STRICT, context=SearchContext(budget=0.2))
+
+    def test_stalled_request(self):
+        self.server.api.latency = 1
+        started = datetime.now()
+        self.assertRaises(BudgetExceeded, self.flights_service.get_result,
+                          budget=0.2, **self.params)
+        self.assertTrue(datetime.now() - started < timedelta(seconds=0.8))
+
+    def test_cancel_polling(self):
+        context = SearchContext()
+        poll_url = self.flights_service.create_session(context=context,
+                                                       **self.params)
+        timer = threading.Timer(0.2, context.cancel)
+        timer.start()
+        started = datetime.now()
+        result = self.flights_service.poll_session(
+            poll_url, initial_delay=0, delay=5, context=context)
+        self.assertTrue(datetime.now() - started < timedelta(seconds=1))
+        self.assertEqual(result.parsed['Status'], 'UpdatesPending')
+        self.assertTrue(context.cancelled)
+        self.assertRaises(SearchCancelled, self.flights_service.poll_session,
+                          poll_url, initial_delay=0, errors=STRICT,
+                          context=context)
+
+    def test_start_search(self):
+        handle = self.flights_service.start_search(**self.params)
+        self.assertRaises(SearchTimeout, handle.result, timeout=0)
+        time.sleep(0.1)
+        handle.cancel()
+        # Cancelled during the initial delay, before the first poll.
+        self.assertEqual(handle.result(timeout=1), None)
+        self.assertTrue(handle.done() and handle.cancelled)
+        time.sleep(0.1)
+        self.assertEqual(self.server.api.requests, 1)
+
+        self.server.api.latency = 0.5
+        handle = self.flights_service.start_search(**self.params)
+        time.sleep(0.1)
+        handle.cancel()
+        self.assertRaises(SearchCancelled, handle.result)
+
+
 class TestCarHire(SkyScannerTestCase):
 
     def setUp(self):
@@ -0,0 +1,176 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_sniffing
+----------------------------------
+
+Tests for `skyscanner.sniffing` module.
+"""
+
+import json
+import unittest
+
+try:
+    from unittest import mock
+except ImportError:
+    import mock
+
+from skyscanner.backends import StubBackend
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.skyscanner import CarHire, Flights, Hotels
+from skyscanner.sniffing import sniff_in_progress, sniff_status
+from skyscanner.streaming import IncrementalParser
+
+
+class TestSniffing(unittest.TestCase):
+
+    def test_json_status(self):
+        api = FakeSkyscannerAPI(itineraries=10, polls_to_complete=2)
+        session = {'key': 'session', 'polls': 1, 'query': {
+            'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+            'outbounddate': '2017-05-28', 'currency': 'GBP'}}
+        # Agents have a status too, only the top level one counts.
+        for polls, status in ((1, 'UpdatesPending'), (2, 'UpdatesComplete')):
+            session['polls'] = polls
+            content = json.dumps(api._flights_results(session))
+            self.assertEqual(sniff_status(content, 'json'), status)
+            self.assertEqual(sniff_status(content.encode('utf-8'), 'json'),
+                             status)
+        self.assertEqual(sniff_status(json.dumps(
+            api._hotels_results(session)), 'json'), 'COMPLETE')
+        self.assertEqual(sniff_status(
+            '{"Query": {"Status": 1, "a": ["Status"]}, "b": "Status", '
+            '"Status": true}', 'json'), True)
+        self.assertEqual(sniff_status(
+            '{"Query": {"Status": "UpdatesComplete"}}', 'json'), None)
+        self.assertEqual(sniff_status(
+            '{"Itineraries": [], "Status": "UpdatesComplete"}', 'json',
+            limit=20), None)
+        self.assertEqual(sniff_status('{"Status": ', 'json'), None)
+        self.assertEqual(sniff_status('{"Status": 1}', 'csv'), None)
+
+    def test_xml_status(self):
+        content = (b'<?xml version="1.0" encoding="utf-8"?>'
+                   b'<PollSessionResponseDto xmlns:i="http://x">'
+                   b'<SessionKey>key</SessionKey><Query><Status/></Query>'
+                   b'<Status>UpdatesPending</Status><Agents><AgentDto>'
+                   b'<Status>UpdatesComplete</Status></AgentDto></Agents>'
+                   b'</PollSessionResponseDto>')
+        self.assertEqual(sniff_status(content, 'xml'), 'UpdatesPending')
+        self.assertEqual(sniff_status(
+            '<R><Agents><AgentDto><Status>UpdatesComplete</Status>'
+            '</AgentDto></Agents></R>', 'xml'), None)
+
+    def test_in_progress(self):
+        websites = '{"websites": [{"id": "a", "in_progress": %s}, ' \
+                   '{"id": "b", "in_progress": false}], "cars": []}'
+        self.assertEqual(sniff_in_progress(websites % 'true', 'json'), True)
+        self.assertEqual(sniff_in_progress(
+            (websites % 'false').encode('utf-8'), 'json'), False)
+        self.assertEqual(sniff_in_progress('{"websites": []}', 'json'), None)
+        self.assertEqual(sniff_in_progress(
+            '<R><Websites><WebsiteDto in_progress="true"/><WebsiteDto/>'
+            '</Websites></R>', 'xml'), True)
+        self.assertEqual(sniff_in_progress(
+            '<R><Websites><WebsiteDto id="a"/></Websites></R>', 'xml'),
+            False)
+
+    def test_sniff_poll_complete(self):
+        flights = Flights('fake')
+        self.assertEqual(flights.sniff_poll_complete(
+            b'{"Status": "UpdatesComplete"}'), True)
+        self.assertEqual(flights.sniff_poll_complete(
+            b'{"Status": "UpdatesPending"}'), False)
+        self.assertEqual(Hotels('fake').sniff_poll_complete(
+            b'{"status": "PENDING"}'), False)
+        carhire = CarHire('fake')
+        self.assertEqual(carhire.sniff_poll_complete(
+            b'{"websites": [{"in_progress": false}]}'), True)
+        self.assertEqual(carhire.sniff_poll_complete(b'{"websites": []}'),
+                         None)
+
+    def test_poll_session(self):
+        api = FakeSkyscannerAPI(itineraries=10, polls_to_complete=3)
+        session = {'key': 'session', 'polls': 0, 'query': {
+            'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+            'outbounddate': '2017-05-28', 'currency': 'GBP'}}
+        contents = []
+        for polls in (1, 2, 3):
+            session['polls'] = polls
+            contents.append(json.dumps(api._flights_results(session)))
+
+        for sniff, tries, parsed, complete in ((True, 3, 1, True),
+                                               (False, 3, 3, True),
+                                               (True, 2, 1, False)):
+            responses = iter(contents)
+            flights = Flights('fake', backend=StubBackend(
+                lambda method, url, headers, body: (
+                    200, {'Content-Type': 'application/json'},
+                    next(responses).encode('utf-8'))))
+            parse = mock.Mock(side_effect=IncrementalParser().parse)
+            with mock.patch.object(IncrementalParser, 'parse', parse):
+                result = flights.poll_session(
+                    'http://stub/poll', initial_delay=0, delay=0,
+                    tries=tries, sniff=sniff)
+            # Only the returned response is parsed when sniffing.
+            self.assertEqual(parse.call_count, parsed)
+            self.assertEqual(flights.is_poll_complete(result), complete)
+            self.assertEqual(result.parsed, json.loads(contents[tries - 1]))
+
+    def test_incremental(self):
+        api = FakeSkyscannerAPI(itineraries=10, polls_to_complete=3)
+        session = {'key': 'session', 'polls': 0, 'query': {
+            'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+            'outbounddate': '2017-05-28', 'currency': 'GBP'}}
+        contents = []
+        for polls in (1, 2, 3):
+            session['polls'] = polls
+            contents.append(json.dumps(api._flights_results(session)))
+        original = IncrementalParser.parse
+
+        # Unchanged items are reused from the previous parsed poll, that is
+        # when sniffing does not tell whether the poll is complete.
+        for inconclusive, parsed in ((False, 1), (True, 3)):
+            responses = iter(contents)
+            flights = Flights('fake', backend=StubBackend(
+                lambda method, url, headers, body: (
+                    200, {'Content-Type': 'application/json'},
+                    next(responses).encode('utf-8'))))
+            parsers = []
+
+            def parse(parser, content):
+                parsers.append(parser)
+                return original(parser, content)
+
+            with mock.patch.object(IncrementalParser, 'parse', parse):
+                if inconclusive:
+                    with mock.patch.object(Flights, 'sniff_poll_complete',
+                                           return_value=None):
+                        result = flights.poll_session(
+                            'http://stub/poll', initial_delay=0, delay=0)
+                else:
+                    result = flights.poll_session(
+                        'http://stub/poll', initial_delay=0, delay=0)
+            self.assertEqual(len(parsers), parsed)
+            self.assertEqual(parsers[-1].reused > 0, inconclusive)
+            self.assertEqual(result.parsed, json.loads(contents[-1]))
+
+
+if __name__ == '__main__':
+    import sys
+    sys.exit(unittest.main())
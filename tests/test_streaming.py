@@ -0,0 +1,148 @@
+# !/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+__copyright__ = "Copyright (C) 2016 Skyscanner Ltd"
+__license__ = """
+Licensed under the Apache License, Version 2.0 (the "License");
+you may not use this file except in compliance with the License.
+You may obtain a copy of the License at
+http://www.apache.org/licenses/LICENSE-2.0
+
+Unless required by applicable law or agreed to in writing,
+software distributed under the License is distributed on an
+"AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND,
+either express or implied. See the License for the specific
+language governing permissions and limitations under the License.
+"""
+
+"""
+test_streaming
+----------------------------------
+
+Tests for `skyscanner.streaming` module.
+"""
+
+import json
+import unittest
+
+from skyscanner.fakeapi import FakeSkyscannerAPI
+from skyscanner.streaming import (ITEM, VALUE, IncrementalParser,
+                                  iter_members, top_itineraries)
+
+
+def chunked(content, size):
+    return (content[n:n + size] for n in range(0, len(content), size))
+
+
+def price(itinerary):
+    return min(o['Price'] for o in itinerary['PricingOptions'])
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        api = FakeSkyscannerAPI(itineraries=50, polls_to_complete=1)
+        self.parsed = api._flights_results({
+            'key': 'session', 'polls': 1,
+            'query': {'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+                      'outbounddate': '2017-05-28',
+                      'inbounddate': '2017-05-31', 'currency': 'GBP'}})
+        self.content = json.dumps(self.parsed).encode('utf-8')
+
+    def test_iter_members(self):
+        chunks = [b'{"a": 1', b'23, "b": [1, {"c"', b': 2}], "d": [],',
+                  b' "e": {"f": "\xc3', b'\xa9"}, "g": null}']
+        self.assertEqual(list(iter_members(chunks)), [
+            ('a', VALUE, 123), ('b', ITEM, 1), ('b', ITEM, {'c': 2}),
+            ('e', VALUE, {'f': u'\xe9'}), ('g', VALUE, None)])
+        self.assertEqual(list(iter_members([' {} '])), [])
+        for content in ('', '[1]', '{"a": 1', '{"a": [1, 2}'):
+            self.assertRaises(ValueError, list, iter_members([content]))
+
+    def test_top_itineraries(self):
+        expected = sorted(self.parsed['Itineraries'], key=price)[:5]
+        for size in (7, 1000, len(self.content)):
+            top = top_itineraries(chunked(self.content, size), 5)
+            self.assertEqual(top['Itineraries'], expected)
+        self.assertEqual(top['Status'], 'UpdatesComplete')
+        self.assertEqual(top['Currencies'], self.parsed['Currencies'])
+
+        legs = dict((leg['Id'], leg) for leg in self.parsed['Legs'])
+        expected_legs = [legs[i[key]] for i in expected
+                         for key in ('OutboundLegId', 'InboundLegId')]
+        self.assertEqual(sorted(top['Legs'], key=lambda leg: leg['Id']),
+                         sorted(expected_legs, key=lambda leg: leg['Id']))
+        segment_ids = set(s for leg in expected_legs
+                          for s in leg['SegmentIds'])
+        self.assertEqual(set(s['Id'] for s in top['Segments']), segment_ids)
+        carrier_ids = set(s['Carrier'] for s in top['Segments'])
+        self.assertEqual(set(c['Id'] for c in top['Carriers']), carrier_ids)
+        agent_ids = set(a for i in expected for o in i['PricingOptions']
+                        for a in o['Agents'])
+        self.assertEqual(set(a['Id'] for a in top['Agents']), agent_ids)
+        place_ids = set(s[key] for s in top['Segments']
+                        for key in ('OriginStation', 'DestinationStation'))
+        self.assertEqual(set(p['Id'] for p in top['Places']), place_ids)
+
+    def test_section_order(self):
+        # Sections listed before the ones referencing them are filtered
+        # once the whole response is parsed.
+        parsed = dict(self.parsed)
+        parsed['Places'][0]['ParentId'] = 99
+        parsed['Places'].append({'Id': 99, 'Code': 'SIN', 'Type': 'City'})
+        content = json.dumps(parsed, sort_keys=True)
+        top = top_itineraries([content], 3)
+        self.assertEqual(top['Itineraries'],
+                         sorted(parsed['Itineraries'], key=price)[:3])
+        self.assertEqual(len(top['Legs']), 6)
+        self.assertTrue(99 in set(p['Id'] for p in top['Places']))
+
+        top = top_itineraries([content], 0)
+        self.assertEqual(top['Itineraries'], [])
+        self.assertEqual(top['Legs'], [])
+
+
+class TestIncrementalParser(unittest.TestCase):
+
+    def test_parse(self):
+        parser = IncrementalParser()
+        first = {'Status': 'UpdatesPending', 'Query': {'adults': 1},
+                 'Itineraries': [{'Id': 1}, {'Id': 2}], 'Legs': [],
+                 'Prices': [10, 20]}
+        self.assertEqual(parser.parse(json.dumps(first)), first)
+        self.assertEqual(parser.reused, 0)
+
+        second = dict(first, Status='UpdatesComplete',
+                      Itineraries=[{'Id': 1}, {'Id': 3}, {'Id': 4}],
+                      Prices=[10, 205])
+        content = json.dumps(second).encode('utf-8')
+        result = parser.parse(content)
+        self.assertEqual(result, second)
+        # The query, the first itinerary and the first price.
+        self.assertEqual(parser.reused, 3)
+        self.assertTrue(result['Itineraries'][0] is
+                        parser.result['Itineraries'][0])
+
+        self.assertTrue(parser.unchanged(content))
+        self.assertTrue(parser.parse(content) is result)
+        self.assertEqual(parser.parse(u'{ }'), {})
+        for content in ('', '{', '{"a": 1', '{"a": 1} 2', '[1]',
+                        '{"a": [1, }', '{"a" 1}'):
+            self.assertRaises(ValueError, parser.parse, content)
+
+    def test_polls(self):
+        api = FakeSkyscannerAPI(itineraries=50, polls_to_complete=3)
+        session = {'key': 'session', 'polls': 0, 'query': {
+            'originplace': 'SIN-sky', 'destinationplace': 'KUL-sky',
+            'outbounddate': '2017-05-28', 'currency': 'GBP'}}
+        parser = IncrementalParser()
+        for polls in (1, 2, 3):
+            session['polls'] = polls
+            content = json.dumps(api._flights_results(session))
+            self.assertEqual(parser.parse(content), json.loads(content))
+        # Results of later polls extend the earlier ones.
+        self.assertTrue(parser.reused > 100)
+
+
+if __name__ == '__main__':
+    unittest.main()